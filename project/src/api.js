@@ -33,6 +33,59 @@ export const getChatHistory = (room) =>
     .get(`${API}/api/chat/history`, { params: { room } })
     .then((r) => r.data);
 
+// Live chat over Server-Sent Events. The browser reconnects on its own and
+// resumes from the last message id; returns a function that closes the stream.
+export const subscribeChat = (room, { onMessage, onReset, onClosed }) => {
+  const url = `${API}/api/chat/stream?room=${encodeURIComponent(room)}`;
+  const source = new EventSource(url);
+  source.addEventListener("message", (e) => onMessage(JSON.parse(e.data)));
+  source.addEventListener("reset", () => onReset && onReset());
+  source.addEventListener("closed", () => {
+    source.close();
+    onClosed && onClosed();
+  });
+  return () => source.close();
+};
+
+// /chatbot/stream is a POST, so read the SSE body from fetch instead of EventSource
+export const streamChatbot = async (message, { onStatus, onToken, onDone }) => {
+  const res = await fetch(`${API}/chatbot/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ message }),
+  });
+  if (!res.ok || !res.body) {
+    const data = await res.json().catch(() => ({}));
+    throw new Error(data.error || "Server error");
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let end;
+    while ((end = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      let event = "message";
+      let data = "";
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (!data) continue;
+      const payload = JSON.parse(data);
+      if (event === "status") onStatus && onStatus(payload);
+      else if (event === "token") onToken && onToken(payload.text);
+      else if (event === "done") onDone && onDone(payload);
+      else if (event === "error") throw new Error(payload.error);
+    }
+  }
+};
+
 export const getUser = (id) =>
   axios.get(`${API}/api/user`, { params: { id } }).then((r) => r.data);
 
@@ -1,5 +1,5 @@
 import { useState, useEffect, useRef } from "react"; // FIXED: Changed '=> "react"' to 'from "react"'
-import { sendMessage, getChatHistory } from "../api";
+import { sendMessage, getChatHistory, subscribeChat } from "../api";
 import { toast } from "react-hot-toast";
 import "../style/BuyerSellerChat.css";
 
@@ -28,6 +28,11 @@ export default function BuyerSellerChat({
     }
   };
 
+  const addMessage = (msg) =>
+    setMessages((prev) =>
+      prev.some((m) => m.id === msg.id) ? prev : [...prev, msg]
+    );
+
   const handleSend = async () => {
     const textToSend = inputText.trim();
     if (!textToSend) return;
@@ -47,9 +52,9 @@ export default function BuyerSellerChat({
         room: room,
       };
 
-      await sendMessage(payload);
+      const res = await sendMessage(payload);
       setInputText("");
-      loadHistory();
+      if (res?.msg) addMessage(res.msg);
     } catch (error) {
       console.error("Failed to send message:", error);
       toast.error("Failed to send message.");
@@ -62,11 +67,21 @@ export default function BuyerSellerChat({
   };
 
   useEffect(() => {
-    loadHistory();
+    setMessages([]);
     if (!isValidChat) return;
 
-    const interval = setInterval(loadHistory, 3000);
-    return () => clearInterval(interval);
+    // Fall back to polling where EventSource is not available
+    if (typeof EventSource === "undefined") {
+      loadHistory();
+      const interval = setInterval(loadHistory, 3000);
+      return () => clearInterval(interval);
+    }
+
+    // The stream replays the room history first, then pushes new messages
+    return subscribeChat(room, {
+      onMessage: addMessage,
+      onReset: () => setMessages([]),
+    });
   }, [room, user, partnerId]);
 
   // Ref to track previous message count to avoid unnecessary scrolling
@@ -1,6 +1,14 @@
 import React, { useEffect, useRef, useState } from "react";
 import { useLocation } from "react-router-dom";
 import "../style/Chatbot.css";
+import { streamChatbot } from "../api";
+
+const STAGE_LABELS = {
+  classifying: "Reading your question...",
+  retrieving: "Searching farm documents...",
+  summarizing: "Reading matching documents...",
+  answering: "Writing answer...",
+};
 
 export default function ChatBox() {
   const [isOpen, setIsOpen] = useState(true);
@@ -58,25 +66,34 @@ export default function ChatBox() {
     setLoading(true);
     setError("");
 
-    try {
-      const res = await fetch("http://192.168.1.5:5000/chatbot", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ message: text }),
+    // The bot bubble shows progress until the first token, then grows
+    const updateBot = (fields) =>
+      setChatHistory((prev) => {
+        const next = [...prev];
+        next[next.length - 1] = { ...next[next.length - 1], ...fields };
+        return next;
       });
+    setChatHistory((prev) => [
+      ...prev,
+      { sender: "bot", text: "", status: STAGE_LABELS.classifying },
+    ]);
 
-      const data = await res.json();
-
-      if (res.ok) {
-        setChatHistory((prev) => [
-          ...prev,
-          { sender: "bot", text: data.reply },
-        ]);
-      } else {
-        setError(data.error || "Server error");
-      }
-    } catch {
-      setError("Server Unreachable");
+    let answer = "";
+    try {
+      await streamChatbot(text, {
+        onStatus: ({ stage }) =>
+          !answer && updateBot({ status: STAGE_LABELS[stage] || "" }),
+        onToken: (token) => {
+          answer += token;
+          updateBot({ text: answer, status: "" });
+        },
+        onDone: ({ reply }) => updateBot({ text: reply, status: "" }),
+      });
+    } catch (err) {
+      setChatHistory((prev) =>
+        prev[prev.length - 1].text ? prev : prev.slice(0, -1)
+      );
+      setError(err.message === "Failed to fetch" ? "Server Unreachable" : err.message);
     }
 
     setLoading(false);
@@ -112,7 +129,7 @@ export default function ChatBox() {
           <div className="msgs" ref={msgsRef}>
             {chatHistory.map((m, i) => (
               <div key={i} className={`chat-bubble ${m.sender}-bubble`}>
-                {m.text}
+                {m.text || <em>{m.status}</em>}
               </div>
             ))}
 
@@ -35,6 +35,23 @@ export default function Dashboard() {
      WEATHER
   -----------------------------------------*/
 
+  const to12Hour = (timeStr) => {
+    let [hour, minute] = timeStr.split(":");
+    hour = parseInt(hour, 10);
+    const suffix = hour >= 12 ? "PM" : "AM";
+    hour = hour % 12 || 12;
+    return `${hour}:${minute} ${suffix}`;
+  };
+
+  // Items as returned by /api/dashboard: { dt_txt, temp, humidity, rain }
+  const formatForecast = (items) =>
+    items.map((item) => ({
+      time: to12Hour(item.dt_txt.split(" ")[1].slice(0, 5)),
+      temp: item.temp,
+      humidity: item.humidity,
+      rain: item.rain || 0,
+    }));
+
   const fetchWeatherForecast = async (lat, lon) => {
     try {
       const res = await fetch(
@@ -43,25 +60,16 @@ export default function Dashboard() {
       const data = await res.json();
 
       if (res.ok && data.forecast) {
-        const to12Hour = (timeStr) => {
-          let [hour, minute] = timeStr.split(":");
-          hour = parseInt(hour, 10);
-          const suffix = hour >= 12 ? "PM" : "AM";
-          hour = hour % 12 || 12;
-          return `${hour}:${minute} ${suffix}`;
-        };
-
-        const formatted = data.forecast.map((item) => {
-          const time24 = item.dt_txt.split(" ")[1].slice(0, 5);
-          return {
-            time: to12Hour(time24),
-            temp: item.main.temp,
-            humidity: item.main.humidity,
-            rain: item.rain?.["3h"] || 0,
-          };
-        });
-
-        setForecast(formatted);
+        setForecast(
+          formatForecast(
+            data.forecast.map((item) => ({
+              dt_txt: item.dt_txt,
+              temp: item.main.temp,
+              humidity: item.main.humidity,
+              rain: item.rain?.["3h"] || 0,
+            }))
+          )
+        );
       }
     } catch (err) {
       console.log("Forecast error:", err);
@@ -80,32 +88,40 @@ export default function Dashboard() {
     }
   };
 
-  const fetchWeatherAlerts = async (lat, lon) => {
-    try {
-      const res = await fetch(
-        `${BASE_URL}/api/weather/forecast?lat=${lat}&lon=${lon}`
-      );
-      const data = await res.json();
-      if (res.ok) {
-        const alerts = data.alerts || null;
-        setWeatherAlert(alerts ? alerts[0] : null);
-      }
-    } catch (err) {
-      console.log("Weather alert error:", err);
-    }
-  };
-
   /* ----------------------------------------
-      CROPS
+     DASHBOARD (user, crops, schemes, weather and location in one call)
   -----------------------------------------*/
 
-  const fetchCrops = async () => {
+  const loadDashboard = async (lat, lon, fallbackLocation = {}) => {
     try {
-      const res = await fetch(`${BASE_URL}/api/crops/get?userID=${userID}`);
+      const params = new URLSearchParams({ userID });
+      if (lat && lon) {
+        params.set("lat", lat);
+        params.set("lon", lon);
+      }
+      const res = await fetch(`${BASE_URL}/api/dashboard?${params}`);
       const data = await res.json();
-      if (res.ok) setFarmList(data);
+      if (!res.ok) throw new Error(data.error || "Dashboard load failed");
+
+      if (data.crops) setFarmList(data.crops);
+      if (data.schemes) setSchemes(data.schemes);
+      if (data.weather) setWeatherNow(data.weather);
+      if (data.forecast) setForecast(formatForecast(data.forecast));
+
+      const location = data.location || fallbackLocation;
+      const resolvedDistrict = location.district || "";
+      const resolvedState = location.state || data.state || "";
+      if (resolvedDistrict) setDistrict(resolvedDistrict);
+      if (resolvedState) setState(resolvedState);
+
+      // Sections the server gave up on (slow upstream): fetch them on their own
+      if (lat && lon) {
+        if (!data.weather && data.errors?.weather) fetchCurrentWeather(lat, lon);
+        if (!data.forecast && data.errors?.forecast) fetchWeatherForecast(lat, lon);
+      }
     } catch (err) {
-      console.log("Fetch crops error:", err);
+      console.log("Dashboard error:", err);
+      setError("Could not load dashboard. Please try again.");
     }
   };
 
@@ -202,7 +218,6 @@ export default function Dashboard() {
   -----------------------------------------*/
 
   React.useEffect(() => {
-    fetchCrops();
     getLocation();
   }, []);
 
@@ -216,38 +231,6 @@ export default function Dashboard() {
       LOCATION
   -----------------------------------------*/
 
-  const applyLocation = (lat, lon, locationInfo = {}) => {
-    const {
-      district: districtInput,
-      city,
-      county,
-      region,
-      state: stateInput,
-      state_district,
-      suburb,
-    } = locationInfo;
-
-    const resolvedDistrict =
-      districtInput ||
-      city ||
-      suburb ||
-      county ||
-      state_district ||
-      region ||
-      "";
-
-    const resolvedState = stateInput || region || "";
-
-    if (resolvedDistrict) setDistrict(resolvedDistrict);
-    if (resolvedState) setState(resolvedState);
-
-    if (lat && lon) {
-      fetchWeatherAlerts(lat, lon);
-      fetchWeatherForecast(lat, lon);
-      fetchCurrentWeather(lat, lon);
-    }
-  };
-
   const fetchLocationFallback = async () => {
     try {
       // FIX: Use backend proxy to avoid CORS and get better accuracy
@@ -259,17 +242,14 @@ export default function Dashboard() {
       const lat = data.lat;
       const lon = data.lon;
 
-      applyLocation(lat, lon, {
-        district: data.city,
-        region: data.region,
-        state: data.region,
-      });
+      loadDashboard(lat, lon, { district: data.city, state: data.region });
       setError(
         "Using approximate location (IP-based). Enable GPS for accuracy."
       );
     } catch (err) {
       console.log("Fallback location error:", err);
       setError("Unable to determine location. Please enter state manually.");
+      loadDashboard();
     }
   };
 
@@ -281,29 +261,10 @@ export default function Dashboard() {
     }
 
     navigator.geolocation.getCurrentPosition(
-      async (pos) => {
+      (pos) => {
         const { latitude, longitude } = pos.coords;
-        try {
-          // FIX: Use backend proxy to handle User-Agent requirements
-          const res = await fetch(
-            `${BASE_URL}/api/location/reverse?lat=${latitude}&lon=${longitude}`
-          );
-          const data = await res.json();
-
-          applyLocation(latitude, longitude, {
-            district:
-              data.address.city_district ||
-              data.address.suburb ||
-              data.address.county ||
-              data.address.state_district ||
-              data.address.city,
-            state: data.address.state,
-          });
-        } catch (err) {
-          console.log("Reverse geocode error:", err);
-          setError("Cannot fetch precise location, using fallback.");
-          fetchLocationFallback();
-        }
+        // The dashboard endpoint reverse-geocodes server side
+        loadDashboard(latitude, longitude);
       },
       () => {
         setError("Location permission denied, using approximate location.");
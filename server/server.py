@@ -1,23 +1,37 @@
 import os
+import time
 import uuid
-import re
-from datetime import datetime
-from flask import Flask, request, jsonify
+import queue
+import threading
+from datetime import datetime, timezone
+from collections import deque
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from flask_pymongo import PyMongo
+from pymongo import ReturnDocument
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
 from web3 import Web3
 
-# New import for BM25
-from rank_bm25 import BM25Okapi
 import warnings
 
 import pandas as pd
 import numpy as np
 import requests
 
-from src.scheme_engine.engine import recommend_scheme_single, df as schemes_df
+from src.seller_index import SellerIndex, SellerIndexSync
+from src.district_index import DistrictTable
+from src.db_bootstrap import bootstrap as bootstrap_db, normalize_key, normalized_keys
+from src.notification_hub import NotificationHub, format_sse
+from src.chat_store import ChatStore, MongoChatStore
+from src.settlement import SettlementQueue
+from src.weather_cache import OpenWeatherClient, UpstreamError, WeatherCache, geo_bucket
+from src.geocode_cache import NominatimClient, ReverseGeocodeCache, TokenBucket
+from src.http_client import OutboundHTTP, HostPolicy, UpstreamUnavailable
+from src.model_registry import models as model_registry
+from src.scheme_engine.engine import recommend_schemes, recommend_schemes_batch, get_index as get_scheme_index, cache_stats as scheme_cache_stats
 
 
 warnings.filterwarnings("ignore")
@@ -32,12 +46,20 @@ except Exception:
 load_dotenv()
 
 app = Flask(__name__)
-CORS(app, resources={r"*": {"origins": "*"}})
+CORS(app, resources={r"*": {"origins": "*"}}, expose_headers=["X-Total-Count"])
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/krishiMitra")
 app.config["MONGO_URI"] = MONGO_URI
 mongo = PyMongo(app)
 
+# Backfill normalized keys and create indexes without blocking startup.
+# Lookups by those keys also match not-yet-backfilled documents until the
+# backfill is confirmed complete (see normalized_keys).
+if os.getenv("DB_BOOTSTRAP", "1") == "1":
+    threading.Thread(target=bootstrap_db, args=(mongo.db,), daemon=True).start()
+else:
+    threading.Thread(target=normalized_keys.check, args=(mongo.db,), daemon=True).start()
+
 INFURA_URL = os.getenv("INFURA_URL")
 PRIVATE_KEY = os.getenv("PRIVATE_KEY")
 CONTRACT_ADDRESS = os.getenv("CONTRACT_ADDRESS")
@@ -68,48 +90,114 @@ def clean_alphanumeric(t: str) -> str:
             cleaned += char
     return cleaned
 
-def get_web3():
-    if not INFURA_URL:
-        raise RuntimeError("INFURA_URL is not set in environment.")
-    w3 = Web3(Web3.HTTPProvider(INFURA_URL))
-    try:
-        ok = w3.is_connected()
-    except Exception:
-        ok = False
-    if not ok:
-        raise RuntimeError("Cannot connect to blockchain provider.")
-    return w3
+# -------------------------
+# Blockchain settlement
+# -------------------------
 
-def create_blockchain_deal(crop, region, price, farmer_address=None, seller_address=None):
-    if not PRIVATE_KEY or not CONTRACT_ADDRESS:
-        return None
-    try:
-        w3 = get_web3()
-        acct = w3.eth.account.from_key(PRIVATE_KEY)
-        farmer_addr = farmer_address or acct.address
-        seller_addr = seller_address or acct.address
-        contract = w3.eth.contract(address=w3.to_checksum_address(CONTRACT_ADDRESS), abi=ABI)
-        nonce = w3.eth.get_transaction_count(acct.address)
-        gas_price = w3.to_wei("10", "gwei")
-        txn = contract.functions.createDeal(
-            w3.to_checksum_address(farmer_addr),
-            w3.to_checksum_address(seller_addr),
-            str(crop),
-            str(region),
-            int(price)
-        ).build_transaction({
-            "from": acct.address,
-            "nonce": nonce,
-            "gas": 300000,
-            "gasPrice": gas_price,
-        })
-        signed = acct.sign_transaction(txn)
-        tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
-        return tx_hash.hex()
-    except Exception:
-        return None
+SETTLEMENT_WORKERS = int(os.getenv("SETTLEMENT_WORKERS", "1"))
+SETTLEMENT_POLL_INTERVAL = float(os.getenv("SETTLEMENT_POLL_INTERVAL", "5"))
+SETTLEMENT_RPC_TIMEOUT = float(os.getenv("SETTLEMENT_RPC_TIMEOUT", "10"))
+# A process owns the settlements it works on for this long and renews the
+# lease while it runs; other processes only resume jobs whose lease expired
+SETTLEMENT_LEASE = float(os.getenv("SETTLEMENT_LEASE", "300"))
+SETTLEMENT_OWNER = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+
+_settlement = None
+_settlement_lock = threading.Lock()
+
+def save_settlement_status(rid: str, fields: dict):
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if fields.get("status") == "pending":
+        update = {"settlement": {**fields, "owner": SETTLEMENT_OWNER,
+                                 "lease_until": time.time() + SETTLEMENT_LEASE, "updated_at": now}}
+    else:
+        update = {f"settlement.{k}": v for k, v in fields.items()}
+        update["settlement.updated_at"] = now
+    if fields.get("tx_hash"):
+        update["tx_hash"] = fields["tx_hash"]
+    mongo.db.requests.update_one({"id": rid}, {"$set": update})
+
+def claim_settlement():
+    """
+    Atomically take over one pending or submitted settlement whose owner's
+    lease expired (or that predates leases), so only one process resumes it.
+    """
+    now = time.time()
+    return mongo.db.requests.find_one_and_update(
+        {
+            "settlement.status": {"$in": ["pending", "submitted"]},
+            "$or": [
+                {"settlement.lease_until": {"$lt": now}},
+                {"settlement.lease_until": {"$exists": False}},
+            ],
+        },
+        {"$set": {"settlement.owner": SETTLEMENT_OWNER, "settlement.lease_until": now + SETTLEMENT_LEASE}},
+        return_document=ReturnDocument.AFTER,
+    )
 
-CHATS = []
+def resume_settlements(settlement) -> int:
+    resumed = 0
+    while True:
+        req = claim_settlement()
+        if req is None:
+            return resumed
+        if req["settlement"]["status"] == "submitted":
+            settlement.track(req["id"], req["settlement"]["tx_hash"])
+        else:
+            settlement.enqueue(req["id"], req.get("crop"), req.get("region"), req.get("price"))
+        resumed += 1
+
+def settlement_lease_loop(settlement):
+    """Renew the leases of our own jobs, and pick up jobs of processes that died."""
+    while True:
+        time.sleep(SETTLEMENT_LEASE / 3)
+        try:
+            mongo.db.requests.update_many(
+                {"settlement.owner": SETTLEMENT_OWNER, "settlement.status": {"$in": ["pending", "submitted"]}},
+                {"$set": {"settlement.lease_until": time.time() + SETTLEMENT_LEASE}},
+            )
+            resumed = resume_settlements(settlement)
+            if resumed:
+                print(f"[INFO] Resumed {resumed} settlements with expired leases")
+        except Exception as e:
+            print(f"[WARN] Settlement lease renewal failed: {e}")
+
+def get_settlement_queue():
+    """
+    The shared settlement queue (one Web3 client, account and contract), or
+    None if the chain is not configured. On first use it claims the pending
+    or submitted jobs whose lease expired (their process is gone) and
+    resumes them; a background thread keeps our own leases alive.
+    """
+    global _settlement
+    if not INFURA_URL or not PRIVATE_KEY or not CONTRACT_ADDRESS:
+        return None
+    if _settlement is None:
+        with _settlement_lock:
+            if _settlement is None:
+                w3 = Web3(Web3.HTTPProvider(INFURA_URL, request_kwargs={"timeout": SETTLEMENT_RPC_TIMEOUT}))
+                settlement = SettlementQueue(
+                    w3, PRIVATE_KEY, CONTRACT_ADDRESS, ABI, save_settlement_status,
+                    workers=SETTLEMENT_WORKERS,
+                    poll_interval=SETTLEMENT_POLL_INTERVAL,
+                )
+                resumed = resume_settlements(settlement)
+                threading.Thread(target=settlement_lease_loop, args=(settlement,), daemon=True).start()
+                _settlement = settlement
+                print(f"[INFO] Settlement queue started for {settlement.account.address}, resumed {resumed} jobs")
+    return _settlement
+
+CHAT_RETENTION = int(os.getenv("CHAT_RETENTION", "500"))
+CHAT_PAGE_MAX = 200
+CHAT_STREAM_HEARTBEAT = 15
+# How often an open chat stream re-reads the store for messages sent through other workers
+CHAT_STREAM_POLL = float(os.getenv("CHAT_STREAM_POLL", "2"))
+# "mongo" shares rooms across worker processes; "memory" keeps them in this process only
+if os.getenv("CHAT_STORE", "mongo") == "memory":
+    chat_store = ChatStore(retention=CHAT_RETENTION)
+else:
+    chat_store = MongoChatStore(lambda: mongo.db, retention=CHAT_RETENTION)
+chat_hub = NotificationHub()
 
 rag = None
 if FaissVectorStore is not None and RAGSearch is not None:
@@ -124,81 +212,67 @@ if FaissVectorStore is not None and RAGSearch is not None:
 # Recommendation helpers
 # -------------------------
 
-def preprocess_text_for_bm25(text):
-    t = str(text or "").lower()
-    t = re.sub(r'[^a-z0-9\s]', ' ', t)
-    tokens = [tok for tok in t.split() if tok]
-    return tokens
-
-def build_seller_docs_from_db():
-    sellers_cursor = mongo.db.users.find({"role": {"$regex": "^seller$", "$options": "i"}})
-    sellers = []
-    corpus = []
-    for s in sellers_cursor:
-        seller = {}
-        seller['_id'] = s.get("_id")
-        seller['fpcName'] = s.get("fpcName") or s.get("fpc_name") or s.get("_id")
-        seller['district'] = s.get("district", "")
-        comms = s.get("commodities", [])
-        if isinstance(comms, list):
-            commodities_str = ", ".join([str(x) for x in comms if x])
-        else:
-            commodities_str = str(comms)
-        seller['commodities'] = commodities_str
-        seller['address'] = s.get("address", "") or s.get("Address", "")
-        seller['contact_phone'] = s.get("contact_phone", "") or s.get("Contact_Phone", "")
+SELLER_QUERY = {"role_key": "seller"}
+RECOMMEND_DEFAULT_LIMIT = 20
+RECOMMEND_MAX_LIMIT = 100
+
+DISTRICT_TABLE_PATH = os.getenv("DISTRICT_TABLE_PATH", os.path.join(os.getcwd(), "district_centroids.csv"))
+# Coordinates farther than this from every centroid are an unknown district
+DISTRICT_MAX_KM = float(os.getenv("DISTRICT_MAX_KM", "75"))
+try:
+    district_table = DistrictTable(DISTRICT_TABLE_PATH)
+except Exception as e:
+    print(f"[WARN] District table unavailable ({e}); falling back to name matching")
+    district_table = None
+
+seller_index = SellerIndex(
+    lambda: mongo.db.users.find(normalized_keys.query("users", "role_key", "seller"), {"password": 0}),
+    districts=district_table,
+)
+_seller_sync = None
+_seller_sync_lock = threading.Lock()
+
+def get_seller_index() -> SellerIndex:
+    """The shared seller index; starts its background sync feed on first use."""
+    global _seller_sync
+    if _seller_sync is None:
+        with _seller_sync_lock:
+            if _seller_sync is None:
+                seller_index.ensure_built()
+                # The feed only polls documents with updated_at, which are
+                # written with role_key, so it needs no backfill fallback
+                _seller_sync = SellerIndexSync(
+                    seller_index,
+                    mongo.db.users,
+                    SELLER_QUERY,
+                    poll_interval=float(os.getenv("SELLER_INDEX_POLL_INTERVAL", "10")),
+                    rebuild_interval=float(os.getenv("SELLER_INDEX_REBUILD_INTERVAL", "600")),
+                )
+                _seller_sync.start()
+    return seller_index
+
+def resolve_district_id(data: dict):
+    """
+    District id for the farmer, from an explicit "district_id" (as returned by
+    /api/location/reverse) or from "lat"/"lon". None if neither is usable
+    or the coordinates are outside the table's region.
+    """
+    if district_table is None:
+        return None
+    district_id = data.get("district_id")
+    if district_id is not None:
         try:
-            # Handle rating as string or number
-            rating_value = s.get("rating") or s.get("Rating") or 5
-            seller['rating'] = float(rating_value) if rating_value is not None else 5.0
-        except Exception:
-            seller['rating'] = 5.0
+            district_id = int(district_id)
+        except (TypeError, ValueError):
+            return None
+        return district_id if 0 <= district_id < len(district_table) else None
+    lat, lon = data.get("lat"), data.get("lon")
+    if lat is not None and lon is not None:
         try:
-            # Check for experience field (as stored in MongoDB) or years_of_experience
-            exp_value = s.get("experience") or s.get("years_of_experience") or s.get("Years_of_Experience") or 5
-            seller['years_of_experience'] = float(exp_value) if exp_value is not None else 5.0
-        except Exception:
-            seller['years_of_experience'] = 5.0
-
-        sellers.append(seller)
-
-        doc_text = f"{seller['fpcName']} {seller['district']} {seller['commodities']} {seller['address']}"
-        corpus.append(preprocess_text_for_bm25(doc_text))
-
-    bm25 = BM25Okapi(corpus) if corpus else None
-    return sellers, bm25
-
-def district_similarity_score(farmer_district, seller_district):
-    farmer_district = str(farmer_district or "").lower().strip()
-    seller_district = str(seller_district or "").lower().strip()
-    if not farmer_district or not seller_district:
-        return 0.3
-    if farmer_district == seller_district:
-        return 1.0
-    if farmer_district in seller_district or seller_district in farmer_district:
-        return 0.7
-    return 0.3
-
-def commodity_match_score(query_crops, seller_commodities):
-    query_crops = [c.strip().lower() for c in str(query_crops or "").split(",") if c.strip()]
-    seller_commodities = str(seller_commodities or "").lower()
-    if not query_crops:
-        return 0.5
-    matches = sum(1 for crop in query_crops if crop in seller_commodities)
-    return min(matches / len(query_crops), 1.0)
-
-def normalize_value(val, min_val, max_val):
-    if max_val == min_val:
-        return 0.5
-    try:
-        return (val - min_val) / (max_val - min_val)
-    except Exception:
-        return 0.5
-    
-    
-def is_central_ministry(text: str) -> bool:
-    text = text.lower()
-    return text.startswith("ministry of") or "government of india" in text
+            return district_table.nearest(float(lat), float(lon), max_km=DISTRICT_MAX_KM)
+        except (TypeError, ValueError):
+            return None
+    return None
 
 
 def _normalize_shown_schemes(shown) -> set:
@@ -218,68 +292,112 @@ def _normalize_shown_schemes(shown) -> set:
     return names
 
 
-def get_next_best_scheme(crop: str, state: str, exclude_list):
-    crop = crop.lower().strip()
-    state = state.lower().strip()
-    exclude_names = _normalize_shown_schemes(exclude_list)
+MAX_SCHEMES_PER_PAGE = 20
+MAX_SCHEME_BATCH_PAIRS = 2000
 
+def _scheme_page_size(data) -> int:
     try:
-        engine_res = recommend_scheme_single(crop, state)
-        best_name = (engine_res or {}).get("scheme_name", "")
-    except:
-        engine_res = None
-        best_name = None
-
-    if engine_res and best_name and best_name.lower().strip() not in exclude_names:
-        return engine_res
+        limit = int(data.get("limit", 1))
+    except (TypeError, ValueError):
+        limit = 1
+    return max(1, min(limit, MAX_SCHEMES_PER_PAGE))
 
-    df = schemes_df.copy()
-    df["scheme_name_lower"] = df["scheme_name"].fillna("").str.lower().str.strip()
-    df = df[~df["scheme_name_lower"].isin(exclude_names)]
-
-    if df.empty:
-        return None
 
-    scores = []
+def get_ranked_schemes(crop: str, state: str, exclude_list=None, limit: int = 1, cursor: str = None):
+    """
+    Page through the ranked schemes for (crop, state). A single scoring pass
+    ranks the whole table; already-shown schemes are skipped while walking it.
+    """
+    exclude_names = _normalize_shown_schemes(exclude_list)
+    return recommend_schemes(crop, state, k=limit, exclude=exclude_names, cursor=cursor)
 
-    for _, row in df.iterrows():
-        score = 0
-        desc = str(row.get("description") or "").lower()
-        tags = str(row.get("tags") or "").lower()
-        sm = str(row.get("state_ministry") or "").lower()
-        name = str(row.get("scheme_name") or "").lower()
 
-        if state in sm:
-            score += 8000
-        elif is_central_ministry(sm):
-            score += 3000
-        else:
-            score -= 4000
+# -------------------------
+# End recommendation helpers
+# -------------------------
 
-        if crop in name:
-            score += 500
-        if crop in desc:
-            score += 300
-        if crop in tags:
-            score += 200
+# -------------------------
+# Notification helpers
+# -------------------------
 
-        scores.append((score, row))
+NOTIFICATION_PAGE_LIMIT = 100
+NOTIFICATION_STREAM_HEARTBEAT = 15
+# How often an open stream re-reads Mongo for events published by other workers
+NOTIFICATION_STREAM_POLL = float(os.getenv("NOTIFICATION_STREAM_POLL", "5"))
+NOTIFICATION_STREAM_RETRY_MS = 3000
+
+notification_hub = NotificationHub()
+
+def next_notification_seq() -> int:
+    """Global, monotonically increasing notification cursor (shared by all workers)."""
+    doc = mongo.db.counters.find_one_and_update(
+        {"_id": "notifications"},
+        {"$inc": {"seq": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return int(doc["seq"])
+
+def unread_count(to_key: str) -> int:
+    doc = mongo.db.notification_unread.find_one({"_id": to_key})
+    if doc is not None:
+        return int(doc.get("unread", 0))
+    # First use for this FPC: seed the counter from existing notifications
+    count = mongo.db.notifications.count_documents({**normalized_keys.query("notifications", "to_key", to_key), "read": False})
+    mongo.db.notification_unread.update_one({"_id": to_key}, {"$setOnInsert": {"unread": count}}, upsert=True)
+    return count
+
+def bump_unread(to_key: str, delta: int) -> int:
+    """
+    Apply `delta` to the counter. Callers seed it with unread_count() before
+    changing notifications; a counter that is still missing is seeded from
+    the notifications as they are now, which already include the change.
+    """
+    doc = mongo.db.notification_unread.find_one_and_update(
+        {"_id": to_key},
+        {"$inc": {"unread": delta}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
+        return unread_count(to_key)
+    return max(int(doc.get("unread", 0)), 0)
+
+def request_recipient_key(req) -> str:
+    req = req or {}
+    return req.get("fpc_name_key") or normalize_key(req.get("fpc_name"))
+
+def mark_request_notifications_read(rid: str, req, status: str):
+    to_key = request_recipient_key(req)
+    if to_key:
+        unread_count(to_key)  # seed the counter before the change
+    result = mongo.db.notifications.update_many(
+        {"request_id": rid, "read": False},
+        {"$set": {"read": True}}
+    )
+    if not to_key:
+        return
+    unread = bump_unread(to_key, -result.modified_count) if result.modified_count else unread_count(to_key)
+    notification_hub.publish(to_key, {
+        "event": "read",
+        "id": None,
+        "data": {"request_id": rid, "status": status, "unread": unread},
+    })
 
-    scores.sort(key=lambda x: x[0], reverse=True)
-    best_score, best_row = scores[0]
+def notifications_since(to_key: str, since: int):
+    return list(mongo.db.notifications.find(
+        {"to_key": to_key, "seq": {"$gt": since}},
+        {"_id": 0}
+    ).sort("seq", 1).limit(NOTIFICATION_PAGE_LIMIT))
 
-    return {
-        "scheme_name": best_row["scheme_name"],
-        "state_ministry": best_row["state_ministry"],
-        "description": best_row["description"],
-        "tags": best_row["tags"],
-        "scheme_link": best_row.get("scheme_link", ""),
-        "score": float(best_score),
-    }
+def notification_backlog(to_key: str, since: int):
+    """Every notification after `since`, oldest first, one page at a time."""
+    while True:
+        page = notifications_since(to_key, since)
+        yield from page
+        if len(page) < NOTIFICATION_PAGE_LIMIT:
+            return
+        since = page[-1]["seq"]
 
-# -------------------------
-# End recommendation helpers
-# -------------------------
 
 @app.post("/signUp")
 def signUp():
@@ -295,13 +413,15 @@ def signUp():
 
     clean_uid = clean_alphanumeric(uid)
 
-    if mongo.db.users.find_one({"_id": clean_uid}) or mongo.db.users.find_one({"email": email}):
+    if mongo.db.users.find_one({"$or": [{"_id": clean_uid}, {"email": email}]}, {"_id": 1}):
         return jsonify({"error": "This ID or email is already taken."}), 400
 
     hashed = generate_password_hash(password)
 
     user_doc = {
-        "_id": clean_uid, "email": email, "password": hashed, "role": role, "state": state
+        "_id": clean_uid, "email": email, "password": hashed, "role": role, "state": state,
+        "role_key": normalize_key(role),
+        "updated_at": datetime.now(timezone.utc),
     }
 
     if role.lower() == "seller":
@@ -313,6 +433,7 @@ def signUp():
             return jsonify({"error": "Seller details (FPC, District, Experience, Commodities) are missing."}), 400
         user_doc.update({
             "fpcName": fpc_name,
+            "fpc_name_key": normalize_key(fpc_name),
             "district": district,
             "experience": experience,
             "commodities": [c.strip() for c in commodities if c.strip()],
@@ -320,6 +441,8 @@ def signUp():
 
     try:
         mongo.db.users.insert_one(user_doc)
+        if role.lower() == "seller" and seller_index.built:
+            seller_index.upsert(user_doc)
         return jsonify({"message": "Signup successful", "user": uid}), 201
     except Exception as e:
         print(f"MongoDB Signup Error: {e}")
@@ -364,6 +487,9 @@ def recommend():
     - Commodity matching (base requirement - 20%)
     - Years of experience (moderate priority - 10%)
     - BM25 semantic search (5%)
+
+    Returns one page of sellers ("limit", default 20, and "offset");
+    the total number of matches is in the X-Total-Count header.
     """
     try:
         data = request.get_json() or {}
@@ -375,126 +501,29 @@ def recommend():
         if not district_input:
             district_input = data.get("region", "").strip()
 
-        # Step 1: Get all sellers and build BM25 corpus (only once)
-        all_sellers, bm25_model = build_seller_docs_from_db()
-        
-        if not all_sellers:
-            return jsonify([]), 200
-
-        # Step 2: Filter by commodity (base requirement)
-        crop_keywords = [c.strip().lower() for c in crop_input.split(",") if c.strip()]
-        matched_sellers = []
-        
-        if crop_keywords:
-            # Filter sellers that have at least one matching commodity
-            for seller in all_sellers:
-                seller_commodities_str = str(seller.get("commodities", "")).lower()
-                if any(keyword in seller_commodities_str for keyword in crop_keywords):
-                    matched_sellers.append(seller)
-        else:
-            # If no crop specified, include all sellers
-            matched_sellers = all_sellers
-
-        if not matched_sellers:
-            return jsonify([]), 200
-
-        # Step 3: Calculate BM25 scores
-        query = f"{crop_input} {district_input} {state_input}".strip()
-        tokenized_query = preprocess_text_for_bm25(query)
-        
-        # Get BM25 scores for all sellers in corpus, then map to matched sellers
-        bm25_scores_dict = {}
-        if bm25_model and len(all_sellers) > 0:
-            all_scores = bm25_model.get_scores(tokenized_query)
-            for idx, seller in enumerate(all_sellers):
-                seller_id = seller.get("_id")
-                if seller_id:
-                    bm25_scores_dict[seller_id] = all_scores[idx] if idx < len(all_scores) else 0.0
-
-        # Step 4: Calculate component scores for each matched seller
-        for seller in matched_sellers:
-            seller_id = seller.get("_id")
-            
-            # BM25 score
-            bm25_score = bm25_scores_dict.get(seller_id, 0.0)
-            seller["bm25_score"] = bm25_score
-            
-            # District similarity score
-            seller["district_score"] = district_similarity_score(
-                district_input, 
-                seller.get("district", "")
-            )
-            
-            # Commodity match score
-            seller["commodity_score"] = commodity_match_score(
-                crop_input,
-                seller.get("commodities", "")
-            )
-
-        # Step 5: Normalize scores
-        ratings = [s.get("rating", 5.0) for s in matched_sellers]
-        experiences = [s.get("years_of_experience", 5.0) for s in matched_sellers]
-        bm25_scores = [s.get("bm25_score", 0.0) for s in matched_sellers]
-        
-        min_rating = min(ratings) if ratings else 5.0
-        max_rating = max(ratings) if ratings else 5.0
-        min_exp = min(experiences) if experiences else 5.0
-        max_exp = max(experiences) if experiences else 5.0
-        max_bm25 = max(bm25_scores) if bm25_scores and max(bm25_scores) > 0 else 1.0
-
-        for seller in matched_sellers:
-            seller["rating_norm"] = normalize_value(
-                seller.get("rating", 5.0),
-                min_rating,
-                max_rating
-            )
-            seller["experience_norm"] = normalize_value(
-                seller.get("years_of_experience", 5.0),
-                min_exp,
-                max_exp
-            )
-            seller["bm25_norm"] = (seller.get("bm25_score", 0.0) / max_bm25) if max_bm25 > 0 else 0.5
-
-        # Step 6: Calculate final weighted score
-        # Weights: Rating (40%), District (25%), Commodity (20%), Experience (10%), BM25 (5%)
-        for seller in matched_sellers:
-            seller["final_score"] = (
-                seller.get("rating_norm", 0.5) * 0.40 +
-                seller.get("district_score", 0.3) * 0.25 +
-                seller.get("commodity_score", 0.5) * 0.20 +
-                seller.get("experience_norm", 0.5) * 0.10 +
-                seller.get("bm25_norm", 0.5) * 0.05
-            )
-
-        # Step 7: Sort by final score (descending)
-        matched_sellers.sort(key=lambda x: x.get("final_score", 0.0), reverse=True)
+        # Farmer's real location, if the client resolved it
+        farmer_district_id = resolve_district_id(data)
+        if farmer_district_id is not None and not district_input:
+            district_input = district_table.names[farmer_district_id]
 
-        # Step 8: Prepare output
-        result = []
-        for seller in matched_sellers:
-            commodities = seller.get("commodities", "")
-            if isinstance(commodities, list):
-                commodities_str = ", ".join([str(c) for c in commodities if c])
-            else:
-                commodities_str = str(commodities)
-            
-            match_percentage = round(seller.get("final_score", 0.0) * 100, 1)
-            
-            result.append({
-                "FPC_Name": seller.get("fpcName", seller.get("_id", "")),
-                "District": seller.get("district", ""),
-                "Commodities": commodities_str,
-                "Rating": seller.get("rating", 5.0),
-                "Years_of_Experience": seller.get("years_of_experience", 5.0),
-                "Contact_Phone": seller.get("contact_phone", ""),
-                "Address": seller.get("address", ""),
-                "match_percentage": match_percentage,
-                # Additional fields for backward compatibility
-                "fpc_name": seller.get("fpcName", seller.get("_id", "")),
-                "fpc_id": seller.get("_id", "")
-            })
+        # Pagination (response size stays flat as sellers grow)
+        try:
+            limit = int(data.get("limit", RECOMMEND_DEFAULT_LIMIT))
+            offset = int(data.get("offset", 0))
+        except (TypeError, ValueError):
+            return jsonify({"error": "limit and offset must be integers"}), 400
+        limit = max(1, min(limit, RECOMMEND_MAX_LIMIT))
+        offset = max(0, offset)
+
+        # Commodity filter, vectorized weighted score and top-k all happen in the index
+        result, total = get_seller_index().rank(
+            crop_input, district_input, state_input, limit=limit, offset=offset,
+            farmer_district_id=farmer_district_id,
+        )
 
-        return jsonify(result), 200
+        response = jsonify(result)
+        response.headers["X-Total-Count"] = str(total)
+        return response, 200
 
     except Exception as e:
         print("RECOMMENDATION ERROR:", e)
@@ -502,6 +531,13 @@ def recommend():
         traceback.print_exc()
         return jsonify({"error": "Recommendation failed"}), 500
 
+@app.get("/api/recommend/index/stats")
+def seller_index_stats():
+    """Size and staleness of the in-memory seller index (per worker)."""
+    stats = seller_index.stats()
+    stats["sync_mode"] = _seller_sync.mode if _seller_sync is not None else None
+    return jsonify(stats), 200
+
 # -------------------------
 # Rest of the API (updated create_request + list_requests)
 # -------------------------
@@ -533,12 +569,9 @@ def create_request():
         if seller_user and seller_user.get("fpcName"):
             fpc_name_store = seller_user.get("fpcName")
     else:
-        # try find seller by fpcName (case-insensitive, trim)
+        # find seller by fpcName (case-insensitive, trim) via the normalized key
         if fpc_value:
-            seller_user = mongo.db.users.find_one({"fpcName": {"$regex": f"^{re.escape(fpc_value)}$", "$options": "i"}})
-            if not seller_user:
-                # fallback: partial match
-                seller_user = mongo.db.users.find_one({"fpcName": {"$regex": f"{re.escape(fpc_value)}", "$options": "i"}})
+            seller_user = mongo.db.users.find_one(normalized_keys.query("users", "fpc_name_key", normalize_key(fpc_value)))
             if seller_user:
                 fpc_id = seller_user.get("_id")
                 fpc_name_store = seller_user.get("fpcName", fpc_value)
@@ -556,21 +589,33 @@ def create_request():
         "region": data.get("region"),
         "price": price_int,
         "fpc_name": fpc_name_store,
+        "fpc_name_key": normalize_key(fpc_name_store),
         "fpc_id": fpc_id,
         "status": "pending"
     }
 
     try:
         mongo.db.requests.insert_one(req_doc)
+        to_key = normalize_key(fpc_name_store)
+        unread_count(to_key)  # initialise the counter before this notification exists
         notification_doc = {
             "id": str(uuid.uuid4()),
+            "seq": next_notification_seq(),
             "to": fpc_name_store,
+            "to_key": to_key,
             "msg": f"Farmer {data.get('farmer_name')} wants to connect for {data.get('crop')} in {data.get('region')}",
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "read": False,
             "request_id": request_id
         }
         mongo.db.notifications.insert_one(notification_doc)
+        notification_doc.pop("_id", None)
+        unread = bump_unread(to_key, 1)
+        notification_hub.publish(to_key, {
+            "event": "notification",
+            "id": notification_doc["seq"],
+            "data": {**notification_doc, "unread": unread},
+        })
         return jsonify({"ok": True, "request_id": request_id}), 201
     except Exception as e:
         print(f"MongoDB Request Insert Error: {e}")
@@ -587,8 +632,8 @@ def list_requests():
     if fpc_id:
         q["fpc_id"] = clean_alphanumeric(fpc_id)
     if fpc:
-        # case-insensitive substring match for flexibility
-        q["fpc_name"] = {"$regex": re.escape(fpc.strip()), "$options": "i"}
+        # case-insensitive match on the normalized (indexed) key
+        q.update(normalized_keys.query("requests", "fpc_name_key", normalize_key(fpc)))
     try:
         data = list(mongo.db.requests.find(q, {"_id": 0}))
         return jsonify(data), 200
@@ -601,33 +646,59 @@ def accept_request(rid):
     try:
         result = mongo.db.requests.find_one({"id": rid})
         if result and result["status"] == "pending":
-            tx = create_blockchain_deal(result["crop"], result["region"], result["price"])
+            # Conditional on "pending" so two concurrent accepts settle once
             update_result = mongo.db.requests.update_one(
-                {"id": rid},
-                {"$set": {"status": "accepted", "tx_hash": tx}}
-            )
-            mongo.db.notifications.update_many(
-                {"request_id": rid},
-                {"$set": {"read": True}}
+                {"id": rid, "status": "pending"},
+                {"$set": {"status": "accepted", "tx_hash": None}}
             )
+            mark_request_notifications_read(rid, result, "accepted")
             if update_result.modified_count > 0:
-                return jsonify({"ok": True, "tx_hash": tx}), 200
+                settlement_status = None
+                try:
+                    settlement = get_settlement_queue()
+                except Exception as e:
+                    print(f"[ERROR] Settlement queue unavailable: {e}")
+                    save_settlement_status(rid, {"status": "failed", "error": str(e)})
+                    settlement, settlement_status = None, "failed"
+                if settlement is not None:
+                    settlement.enqueue(rid, result["crop"], result["region"], result["price"])
+                    settlement_status = "pending"
+                return jsonify({"ok": True, "tx_hash": None, "settlement": settlement_status}), 200
     except Exception as e:
         print(f"Accept error: {e}")
         return jsonify({"ok": False, "error": str(e)}), 500
     return jsonify({"ok": False}), 404
 
+@app.get("/api/request/<rid>/settlement")
+def request_settlement(rid):
+    """Settlement progress of an accepted request: pending, submitted, confirmed or failed."""
+    req = mongo.db.requests.find_one({"id": rid}, {"_id": 0, "status": 1, "settlement": 1, "tx_hash": 1})
+    if not req:
+        return jsonify({"ok": False, "error": "Request not found"}), 404
+    return jsonify({
+        "ok": True,
+        "request_id": rid,
+        "status": req.get("status"),
+        "settlement": req.get("settlement"),
+        "tx_hash": req.get("tx_hash"),
+    }), 200
+
+@app.get("/api/settlement/stats")
+def settlement_stats():
+    settlement = _settlement
+    if settlement is None:
+        return jsonify({"enabled": bool(INFURA_URL and PRIVATE_KEY and CONTRACT_ADDRESS), "started": False}), 200
+    return jsonify({"enabled": True, "started": True, **settlement.stats()}), 200
+
 @app.post("/api/reject/<rid>")
 def reject_request(rid):
     try:
+        req = mongo.db.requests.find_one({"id": rid}, {"fpc_name": 1, "fpc_name_key": 1})
         update_result = mongo.db.requests.update_one(
             {"id": rid, "status": "pending"},
             {"$set": {"status": "rejected"}}
         )
-        mongo.db.notifications.update_many(
-            {"request_id": rid},
-            {"$set": {"read": True}}
-        )
+        mark_request_notifications_read(rid, req, "rejected")
         if update_result.modified_count > 0:
             return jsonify({"ok": True}), 200
     except Exception as e:
@@ -643,25 +714,54 @@ def delete_request(rid):
             return jsonify({"ok": False, "error": "Request not found"}), 404
         farmer_id = req.get("farmer_id")
         fpc_id = req.get("fpc_id")
+        to_key = request_recipient_key(req)
+        if to_key:
+            unread_count(to_key)  # seed the counter before the change
         mongo.db.requests.delete_one({"id": rid})
+        deleted_unread = mongo.db.notifications.delete_many({"request_id": rid, "read": False}).deleted_count
         mongo.db.notifications.delete_many({"request_id": rid})
+        if deleted_unread and to_key:
+            bump_unread(to_key, -deleted_unread)
         room1 = f"{farmer_id}_{fpc_id}" if farmer_id and fpc_id else None
         room2 = f"{fpc_id}_{farmer_id}" if farmer_id and fpc_id else None
-        global CHATS
-        CHATS = [m for m in CHATS if not (m.get("room") == room1 or m.get("room") == room2)]
+        chat_store.delete_rooms(room1, room2)
+        for room in (room1, room2):
+            if room:
+                chat_hub.publish(room, {"event": "closed", "id": None, "data": {"room": room}})
         return jsonify({"ok": True}), 200
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
 
 @app.get("/api/notifications")
 def notifications():
+    """
+    Notifications for an FPC. Without "since" returns the full list (newest
+    first). With "since=<seq>" returns only newer items, oldest first, as
+    {"notifications": [...], "cursor": <last seq>, "unread": <count>}.
+    """
     fpc_name_input = request.args.get("fpc_name")
     if not fpc_name_input:
         return jsonify([]), 200
-    normalized = fpc_name_input.strip()
+    normalized = normalize_key(fpc_name_input)
+    since = request.args.get("since")
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return jsonify({"error": "since must be an integer cursor"}), 400
+        try:
+            notifs = notifications_since(normalized, since)
+            return jsonify({
+                "notifications": notifs,
+                "cursor": notifs[-1]["seq"] if notifs else since,
+                "unread": unread_count(normalized),
+            }), 200
+        except Exception as e:
+            print(f"Notification fetch error: {e}")
+            return jsonify({"error": "Failed to fetch notifications"}), 500
     try:
         notifs = list(mongo.db.notifications.find(
-            {"to": {"$regex": f"{re.escape(normalized)}", "$options": "i"}},
+            normalized_keys.query("notifications", "to_key", normalized),
             {"_id": 0}
         ).sort("timestamp", -1))
         return jsonify(notifs), 200
@@ -669,6 +769,94 @@ def notifications():
         print(f"Notification fetch error: {e}")
         return jsonify({"error": "Failed to fetch notifications"}), 500
 
+@app.get("/api/notifications/stream")
+def notifications_stream():
+    """
+    Server-Sent Events feed of new notifications for an FPC. Resumes after
+    the Last-Event-ID header (or "since" param) with the whole backlog;
+    sends an "unread" event first, then "notification" and "read" events
+    as they happen. Events from this worker are pushed at once; those from
+    other workers arrive within NOTIFICATION_STREAM_POLL seconds.
+    """
+    fpc_name_input = request.args.get("fpc_name")
+    if not fpc_name_input:
+        return jsonify({"error": "fpc_name required"}), 400
+    key = normalize_key(fpc_name_input)
+    since = request.headers.get("Last-Event-ID") or request.args.get("since")
+    try:
+        since = int(since) if since is not None else None
+    except ValueError:
+        return jsonify({"error": "since must be an integer cursor"}), 400
+
+    # Subscribe before reading the backlog so nothing falls in between
+    sub = notification_hub.subscribe(key)
+    try:
+        unread = unread_count(key)
+    except Exception:
+        notification_hub.unsubscribe(key, sub)
+        raise
+
+    def stream():
+        # The hub only carries events published by this worker; other
+        # workers' notifications and read-state changes are picked up by
+        # re-reading the seq cursor and the unread counter every poll.
+        last_seq = since
+        sent_unread = unread
+        try:
+            yield f"retry: {NOTIFICATION_STREAM_RETRY_MS}\n\n"
+            yield format_sse({"unread": unread}, event_type="unread")
+            if last_seq is None:
+                # Fresh connection: only what arrives from now on
+                last_seq = int((mongo.db.counters.find_one({"_id": "notifications"}) or {}).get("seq", 0))
+            else:
+                for n in notification_backlog(key, last_seq):
+                    last_seq = n["seq"]
+                    yield format_sse(n, event_id=n["seq"], event_type="notification")
+            next_poll = time.monotonic() + NOTIFICATION_STREAM_POLL
+            last_sent = time.monotonic()
+            while True:
+                try:
+                    event = sub.get(timeout=max(0.0, next_poll - time.monotonic()))
+                except queue.Empty:
+                    event = None
+                if event is None:
+                    next_poll = time.monotonic() + NOTIFICATION_STREAM_POLL
+                    try:
+                        for n in notification_backlog(key, last_seq):
+                            last_seq = n["seq"]
+                            last_sent = time.monotonic()
+                            yield format_sse(n, event_id=n["seq"], event_type="notification")
+                        current = unread_count(key)
+                    except Exception as e:
+                        print(f"[WARN] Notification stream poll failed: {e}")
+                        current = sent_unread
+                    if current != sent_unread:
+                        sent_unread = current
+                        last_sent = time.monotonic()
+                        yield format_sse({"unread": current}, event_type="unread")
+                    elif time.monotonic() - last_sent >= NOTIFICATION_STREAM_HEARTBEAT:
+                        last_sent = time.monotonic()
+                        yield ": keep-alive\n\n"
+                    continue
+                if event["id"] is not None:
+                    if event["id"] <= last_seq:
+                        continue
+                    last_seq = event["id"]
+                sent_unread = event["data"].get("unread", sent_unread)
+                last_sent = time.monotonic()
+                yield format_sse(event["data"], event_id=event["id"], event_type=event["event"])
+        finally:
+            notification_hub.unsubscribe(key, sub)
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@app.get("/api/notifications/stats")
+def notifications_stats():
+    return jsonify(notification_hub.stats()), 200
+
 @app.post("/api/chat/send")
 def send_message():
     data = request.get_json() or {}
@@ -686,17 +874,119 @@ def send_message():
         "text": text,
         "room": room,
     }
-    CHATS.append(msg)
+    chat_store.append(room, msg, on_append=lambda m: chat_hub.publish(room, {
+        "event": "message", "id": m["id"], "seq": m["seq"], "data": m,
+    }))
     return jsonify({"ok": True, "msg": msg}), 201
 
 @app.get("/api/chat/history")
 def chat_history():
+    """
+    Messages for a room, oldest first. Optional "before"/"after" take a
+    message id and "limit" caps the page; without them the full retained
+    history is returned as before.
+    """
     room = request.args.get("room")
     if not room:
         return jsonify({"ok": False, "error": "room required"}), 400
-    messages = [m for m in CHATS if m.get("room") == room]
+    limit = request.args.get("limit")
+    try:
+        limit = min(max(int(limit), 1), CHAT_PAGE_MAX) if limit else None
+    except ValueError:
+        return jsonify({"ok": False, "error": "invalid limit"}), 400
+    try:
+        messages = chat_store.history(
+            room,
+            before=request.args.get("before"),
+            after=request.args.get("after"),
+            limit=limit,
+        )
+    except KeyError:
+        return jsonify({"ok": False, "error": "unknown or expired message id"}), 404
     return jsonify(messages), 200
 
+@app.get("/api/chat/stream")
+def chat_stream():
+    """
+    Server-Sent Events feed of a room's messages. Replays the retained
+    history after the Last-Event-ID header (or "after" param, a message id),
+    or all of it on a fresh connection, then pushes each message as
+    /api/chat/send accepts it. An id that has been evicted gets a "reset"
+    event followed by the full retained history.
+
+    Hub events only wake the stream up; messages are always read from
+    chat_store by seq. The store is also re-read every CHAT_STREAM_POLL
+    seconds, which is how messages sent through another worker (and rooms
+    deleted there) reach this stream.
+    """
+    room = request.args.get("room")
+    if not room:
+        return jsonify({"ok": False, "error": "room required"}), 400
+    after = request.headers.get("Last-Event-ID") or request.args.get("after")
+
+    # Subscribe before reading the backlog so nothing falls in between
+    sub = chat_hub.subscribe(room)
+    reset = False
+    start_seq = 0
+    try:
+        start_seq = chat_store.seq_of(room, after) if after else 0
+        backlog = chat_store.since(room, start_seq)
+    except KeyError:
+        reset = True
+        backlog = chat_store.history(room)
+
+    def stream():
+        last_seq = backlog[-1]["seq"] if backlog else start_seq
+        room_seen = bool(after and not reset) or bool(backlog)
+        last_sent = time.time()
+        next_poll = time.time() + CHAT_STREAM_POLL
+        try:
+            yield f"retry: {NOTIFICATION_STREAM_RETRY_MS}\n\n"
+            if reset:
+                yield format_sse({"room": room}, event_type="reset")
+            for m in backlog:
+                yield format_sse(m, event_id=m["id"], event_type="message")
+            while True:
+                try:
+                    event = sub.get(timeout=max(0, next_poll - time.time()))
+                except queue.Empty:
+                    event = None
+                if event is not None and event["event"] == "closed":
+                    yield format_sse(event["data"], event_type="closed")
+                    return
+                if event is not None and event["seq"] <= last_seq:
+                    continue
+                try:
+                    fresh = chat_store.since(room, last_seq)
+                    if event is None:
+                        next_poll = time.time() + CHAT_STREAM_POLL
+                        if not fresh and room_seen and not chat_store.room_exists(room):
+                            yield format_sse({"room": room}, event_type="closed")
+                            return
+                except Exception as e:
+                    print(f"[WARN] Chat stream poll for {room} failed: {e}")
+                    fresh = []
+                for m in fresh:
+                    last_seq = m["seq"]
+                    room_seen = True
+                    yield format_sse(m, event_id=m["id"], event_type="message")
+                if fresh:
+                    last_sent = time.time()
+                elif time.time() - last_sent >= CHAT_STREAM_HEARTBEAT:
+                    last_sent = time.time()
+                    yield ": keep-alive\n\n"
+        finally:
+            chat_hub.unsubscribe(room, sub)
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@app.get("/api/chat/stats")
+def chat_stats():
+    return jsonify({"store": chat_store.stats(), "stream": chat_hub.stats()}), 200
+
 @app.post("/chatbot")
 def chatbot():
     if rag is None:
@@ -711,6 +1001,78 @@ def chatbot():
     except Exception:
         return jsonify({"error": "RAG search failed"}), 500
 
+# Server-side timings of /chatbot/stream, in seconds from the request:
+# first byte (first progress event), first answer token, last event
+chatbot_timings = deque(maxlen=500)
+
+def timing_percentiles(values) -> dict:
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return {"p50_ms": None, "p95_ms": None}
+    return {
+        "p50_ms": round(values[len(values) // 2] * 1000, 1),
+        "p95_ms": round(values[min(int(len(values) * 0.95), len(values) - 1)] * 1000, 1),
+    }
+
+@app.post("/chatbot/stream")
+def chatbot_stream():
+    """
+    Streaming /chatbot over Server-Sent Events: "status" events while the
+    question is classified, retrieved and summarized, then a "token" event
+    per piece of the answer as the LLM produces it, then "done" with the
+    full reply and the timings.
+    """
+    if rag is None:
+        return jsonify({"error": "RAG not ready"}), 503
+    data = request.get_json() or {}
+    user_input = (data.get("message") or "").strip()
+    if not user_input:
+        return jsonify({"error": "Empty message"}), 400
+    received = time.perf_counter()
+
+    def stream():
+        first_byte = first_token = None
+        try:
+            for event, payload in rag.stream_answer(user_input):
+                now = time.perf_counter() - received
+                if first_byte is None:
+                    first_byte = now
+                if event == "token" and first_token is None:
+                    first_token = now
+                if event == "done":
+                    chatbot_timings.append((first_byte, first_token, now))
+                    payload = {
+                        **payload,
+                        "ttfb_ms": round(first_byte * 1000, 1),
+                        "ttft_ms": round(first_token * 1000, 1) if first_token is not None else None,
+                        "total_ms": round(now * 1000, 1),
+                    }
+                yield format_sse(payload, event_type=event)
+        except Exception as e:
+            print(f"[ERROR] Chatbot stream failed: {e}")
+            yield format_sse({"error": "RAG search failed"}, event_type="error")
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+@app.get("/api/chatbot/stats")
+def chatbot_stats():
+    timings = list(chatbot_timings)
+    return jsonify({
+        "responses": len(timings),
+        "ttfb": timing_percentiles(t[0] for t in timings),
+        "ttft": timing_percentiles(t[1] for t in timings),
+        "total": timing_percentiles(t[2] for t in timings),
+        "answer_cache": rag.answer_cache.stats() if rag is not None else None,
+        "classification_cache": rag.class_cache.stats() if rag is not None else None,
+    }), 200
+
+@app.get("/api/models/stats")
+def model_stats():
+    return jsonify(model_registry.stats()), 200
+
 @app.post("/api/crops/add")
 def add_crop():
     data = request.get_json() or {}
@@ -749,106 +1111,201 @@ def get_user():
     return jsonify(user), 200
 
 
+# ============================================================
+# OUTBOUND HTTP (shared pool, per-host limits, breaker, metrics)
+# ============================================================
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5")
+NOMINATIM_BASE_URL = os.getenv("NOMINATIM_BASE_URL", "https://nominatim.openstreetmap.org")
+
+def host_policy(prefix: str, **defaults) -> HostPolicy:
+    """HostPolicy from <prefix>_CONNECT_TIMEOUT, _READ_TIMEOUT, _MAX_CONCURRENCY, _RETRIES."""
+    return HostPolicy(
+        connect_timeout=float(os.getenv(f"{prefix}_CONNECT_TIMEOUT", defaults.get("connect_timeout", 3))),
+        read_timeout=float(os.getenv(f"{prefix}_READ_TIMEOUT", defaults.get("read_timeout", 10))),
+        max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", defaults.get("max_concurrency", 8))),
+        retries=int(os.getenv(f"{prefix}_RETRIES", defaults.get("retries", 2))),
+    )
+
+outbound = OutboundHTTP(
+    default_policy=host_policy("OUTBOUND"),
+    policies={
+        urlsplit(OPENWEATHER_BASE_URL).netloc: host_policy("OPENWEATHER", read_timeout=5, max_concurrency=8),
+        # Rate limited by the geocode cache's token bucket; never retry behind its back
+        urlsplit(NOMINATIM_BASE_URL).netloc: host_policy("NOMINATIM", read_timeout=10, max_concurrency=2, retries=0),
+        "ipapi.co": host_policy("IPAPI", read_timeout=4, max_concurrency=4, retries=0),
+        "ip-api.com": host_policy("IPAPI", read_timeout=4, max_concurrency=4, retries=1),
+    },
+    pool_size=int(os.getenv("OUTBOUND_POOL_SIZE", "32")),
+    async_workers=int(os.getenv("OUTBOUND_ASYNC_WORKERS", "16")),
+)
+
+def upstream_failure_response(e: Exception, label: str):
+    """503 when the call was refused locally, 504 on timeout, else None."""
+    if isinstance(e, UpstreamUnavailable):
+        return jsonify({"error": f"{label} temporarily unavailable", "reason": e.reason}), 503
+    if isinstance(e, requests.Timeout):
+        return jsonify({"error": f"{label} timed out"}), 504
+    return None
+
+@app.get("/api/upstream/stats")
+def upstream_stats():
+    return jsonify(outbound.stats()), 200
+
+
 # ============================================================
 # WEATHER ENDPOINTS (FROM FILE O)
 # ============================================================
-@app.get("/api/weather/forecast")
-def weather_forecast():
+WEATHER_BUCKET_DEG = float(os.getenv("WEATHER_BUCKET_DEG", "0.05"))
+weather_client = OpenWeatherClient(OPENWEATHER_KEY, base_url=OPENWEATHER_BASE_URL, http=outbound)
+weather_current_cache = WeatherCache(
+    weather_client.current,
+    ttl=float(os.getenv("WEATHER_CURRENT_TTL", "600")),
+    stale_ttl=float(os.getenv("WEATHER_CURRENT_STALE_TTL", "1800")),
+    name="weather current",
+)
+weather_forecast_cache = WeatherCache(
+    weather_client.forecast,
+    ttl=float(os.getenv("WEATHER_FORECAST_TTL", "10800")),
+    stale_ttl=float(os.getenv("WEATHER_FORECAST_STALE_TTL", "21600")),
+    name="weather forecast",
+)
+
+def weather_bucket_from_args():
+    """Geo bucket for the lat/lon query params, or an error response."""
     lat = request.args.get("lat")
     lon = request.args.get("lon")
-
     if not lat or not lon:
-        return jsonify({"error": "Missing coordinates"}), 400
-
+        return None, (jsonify({"error": "Missing coordinates"}), 400)
     if not OPENWEATHER_KEY:
-        return jsonify({"error": "Missing OpenWeather key"}), 500
+        return None, (jsonify({"error": "Missing OpenWeather key"}), 500)
+    try:
+        return geo_bucket(float(lat), float(lon), WEATHER_BUCKET_DEG), None
+    except ValueError:
+        return None, (jsonify({"error": "Invalid coordinates"}), 400)
+
+def format_current_weather(data: dict) -> dict:
+    """Format an OpenWeather current reading for the frontend."""
+    weather_main = data.get("weather", [{}])[0]
+    main_data = data.get("main", {})
+    rain_data = data.get("rain", {})
+    return {
+        "temp": main_data.get("temp", 0),
+        "humidity": main_data.get("humidity", 0),
+        "rain": rain_data.get("1h", 0) or rain_data.get("3h", 0),
+        "icon": weather_main.get("icon", "01d"),
+        "condition": weather_main.get("main", "Clear"),
+        "description": weather_main.get("description", "")
+    }
 
-    url = (
-        f"https://api.openweathermap.org/data/2.5/forecast?"
-        f"lat={lat}&lon={lon}&appid={OPENWEATHER_KEY}&units=metric"
-    )
+@app.get("/api/weather/forecast")
+def weather_forecast():
+    bucket, error = weather_bucket_from_args()
+    if error:
+        return error
 
     try:
-        r = requests.get(url)
-        data = r.json()
+        data = weather_forecast_cache.get(bucket)
 
         if "list" not in data:
             return jsonify({"error": "OpenWeather error", "details": data}), 500
 
         return jsonify({"forecast": data["list"]}), 200
 
+    except UpstreamError as e:
+        return jsonify({"error": "OpenWeather error", "details": e.payload}), 500
     except Exception as e:
         print("WEATHER FORECAST ERROR:", e)
-        return jsonify({"error": str(e)}), 500
+        return upstream_failure_response(e, "OpenWeather") or (jsonify({"error": str(e)}), 500)
 
 
 @app.get("/api/weather/current")
 def weather_current():
-    lat = request.args.get("lat")
-    lon = request.args.get("lon")
-
-    if not lat or not lon:
-        return jsonify({"error": "Missing coordinates"}), 400
-
-    if not OPENWEATHER_KEY:
-        return jsonify({"error": "Missing OpenWeather key"}), 500
-
-    url = (
-        f"https://api.openweathermap.org/data/2.5/weather?"
-        f"lat={lat}&lon={lon}&appid={OPENWEATHER_KEY}&units=metric"
-    )
+    bucket, error = weather_bucket_from_args()
+    if error:
+        return error
 
     try:
-        r = requests.get(url)
-        data = r.json()
-        
-        if r.status_code != 200:
-             return jsonify(data), r.status_code
-
-        # Format for frontend
-        weather_main = data.get("weather", [{}])[0]
-        main_data = data.get("main", {})
-        rain_data = data.get("rain", {})
-        
-        formatted = {
-            "temp": main_data.get("temp", 0),
-            "humidity": main_data.get("humidity", 0),
-            "rain": rain_data.get("1h", 0) or rain_data.get("3h", 0),
-            "icon": weather_main.get("icon", "01d"),
-            "condition": weather_main.get("main", "Clear"),
-            "description": weather_main.get("description", "")
-        }
-        
-        return jsonify(formatted), 200
+        data = weather_current_cache.get(bucket)
+        return jsonify(format_current_weather(data)), 200
+    except UpstreamError as e:
+        return jsonify(e.payload), e.status
     except Exception as e:
         print("WEATHER CURRENT ERROR:", e)
-        return jsonify({"error": str(e)}), 500
+        return upstream_failure_response(e, "OpenWeather") or (jsonify({"error": str(e)}), 500)
+
+
+@app.get("/api/weather/cache/stats")
+def weather_cache_stats():
+    return jsonify({
+        "bucket_deg": WEATHER_BUCKET_DEG,
+        "current": weather_current_cache.stats(),
+        "forecast": weather_forecast_cache.stats(),
+    }), 200
 
 
 # ============================================================
 # LOCATION PROXY (Fix for CORS/User-Agent)
 # ============================================================
+def map_location_to_district(place: dict, lat, lon) -> dict:
+    """
+    Map a Nominatim reverse-geocode result onto the district table, by the
+    address's district name if known, else by nearest centroid within
+    DISTRICT_MAX_KM. Returns {"district_id", "matched_district"}, or {} if
+    neither matches (unknown district). The table's state/district never
+    replace the ones in the address.
+    """
+    if district_table is None:
+        return {}
+    address = place.get("address") or {}
+    district_id = None
+    for key in ("state_district", "county", "district", "city_district", "city"):
+        district_id = district_table.lookup(address.get(key))
+        if district_id is not None:
+            break
+    if district_id is None:
+        try:
+            district_id = district_table.nearest(float(lat), float(lon), max_km=DISTRICT_MAX_KM)
+        except (TypeError, ValueError):
+            return {}
+    if district_id is None:
+        return {}
+    return {"district_id": district_id, "matched_district": district_table.names[district_id]}
+
+
+# Nominatim requires a User-Agent and allows one request per second
+geocode_cache = ReverseGeocodeCache(
+    os.getenv("GEOCODE_CACHE_PATH", os.path.join(os.getcwd(), "geocode_cache.sqlite3")),
+    NominatimClient(base_url=NOMINATIM_BASE_URL, http=outbound).reverse,
+    precision=int(os.getenv("GEOCODE_PRECISION", "3")),
+    limiter=TokenBucket(rate=float(os.getenv("NOMINATIM_RATE", "1"))),
+    max_wait=float(os.getenv("NOMINATIM_MAX_WAIT", "20")),
+)
+
 @app.get("/api/location/reverse")
 def location_reverse():
     lat = request.args.get("lat")
     lon = request.args.get("lon")
     if not lat or not lon:
         return jsonify({"error": "Missing lat/lon"}), 400
-
-    # Nominatim requires a User-Agent
-    headers = {
-        "User-Agent": "KrishiMitra/1.0 (educational project)"
-    }
-    url = f"https://nominatim.openstreetmap.org/reverse?lat={lat}&lon={lon}&format=json"
+    try:
+        lat, lon = float(lat), float(lon)
+    except ValueError:
+        return jsonify({"error": "Invalid lat/lon"}), 400
 
     try:
-        r = requests.get(url, headers=headers)
-        if r.status_code != 200:
-             return jsonify({"error": "Nominatim error", "details": r.text}), r.status_code
-        return jsonify(r.json()), 200
+        data = dict(geocode_cache.lookup(lat, lon))
+        data.update(map_location_to_district(data, lat, lon))
+        return jsonify(data), 200
+    except UpstreamError as e:
+        return jsonify({"error": "Nominatim error", "details": e.payload}), e.status
     except Exception as e:
         print("LOCATION REVERSE ERROR:", e)
-        return jsonify({"error": str(e)}), 500
+        return upstream_failure_response(e, "Nominatim") or (jsonify({"error": str(e)}), 500)
+
+
+@app.get("/api/location/cache/stats")
+def location_cache_stats():
+    return jsonify(geocode_cache.stats()), 200
 
 
 @app.get("/api/location/ip")
@@ -866,10 +1323,14 @@ def location_ip():
         headers = {
             "User-Agent": "KrishiMitra/1.0"
         }
-        r = requests.get("https://ipapi.co/json/", headers=headers)
-        if r.status_code != 200:
+        try:
+            r = outbound.get("https://ipapi.co/json/", headers=headers)
+        except (UpstreamUnavailable, requests.RequestException) as e:
+            print(f"[WARN] ipapi.co unavailable: {e}")
+            r = None
+        if r is None or r.status_code != 200:
             # Fallback to ip-api.com if ipapi.co fails (429 etc)
-            r = requests.get("http://ip-api.com/json/")
+            r = outbound.get("http://ip-api.com/json/")
         
         data = r.json()
         
@@ -892,7 +1353,7 @@ def location_ip():
         return jsonify(normalized), 200
     except Exception as e:
         print("LOCATION IP ERROR:", e)
-        return jsonify({"error": str(e)}), 500
+        return upstream_failure_response(e, "IP location") or (jsonify({"error": str(e)}), 500)
 
         result = {
             "temp": data["main"]["temp"],
@@ -909,12 +1370,138 @@ def location_ip():
         return jsonify({"error": str(e)}), 500
 
 
+# ============================================================
+# DASHBOARD (one round trip for the farmer dashboard)
+# ============================================================
+DASHBOARD_BUDGET = float(os.getenv("DASHBOARD_BUDGET", "3"))
+DASHBOARD_USER_FIELDS = {"_id": 0, "password": 0, "role_key": 0, "fpc_name_key": 0, "updated_at": 0}
+dashboard_pool = ThreadPoolExecutor(max_workers=int(os.getenv("DASHBOARD_WORKERS", "8")), thread_name_prefix="dashboard")
+
+def dashboard_schemes(crops: list, state: str) -> list:
+    """Top scheme per crop, skipping schemes already picked for an earlier crop (as the client did)."""
+    shown, picked = [], []
+    for item in crops:
+        if not item.get("text"):
+            continue
+        schemes, _ = get_ranked_schemes(item["text"], state, shown, limit=1)
+        if schemes:
+            picked.append({**schemes[0], "crop": item["text"], "cropDate": item.get("date")})
+            shown.append({"scheme_name": schemes[0]["scheme_name"]})
+    return picked
+
+def compact_forecast(data: dict) -> list:
+    return [
+        {
+            "dt_txt": item.get("dt_txt"),
+            "temp": item.get("main", {}).get("temp"),
+            "humidity": item.get("main", {}).get("humidity"),
+            "rain": (item.get("rain") or {}).get("3h", 0),
+        }
+        for item in data.get("list", [])
+    ]
+
+def dashboard_location(lat: float, lon: float, max_wait: float = None) -> dict:
+    place = geocode_cache.lookup(lat, lon, max_wait=max_wait)
+    address = place.get("address") or {}
+    return {
+        "display_name": place.get("display_name"),
+        "state": address.get("state"),
+        "district": address.get("state_district") or address.get("county") or address.get("city"),
+        # Match in the district table, only present when there is one
+        **map_location_to_district(place, lat, lon),
+    }
+
+@app.get("/api/dashboard")
+def dashboard():
+    """
+    Everything the farmer dashboard needs in one call:
+    ?userID=...&lat=...&lon=...[&state=...]
+
+    The user and crop reads run in parallel with the weather and location
+    lookups; schemes reuse the crops and the user's state (or ?state=).
+    Sections not ready within DASHBOARD_BUDGET seconds come back as null
+    with the reason in "errors" (their caches keep filling in the
+    background, so the next load is complete).
+    """
+    userID = request.args.get("userID")
+    if not userID:
+        return jsonify({"error": "userID required"}), 400
+    clean_uid = clean_alphanumeric(userID)
+    deadline = time.monotonic() + DASHBOARD_BUDGET
+
+    tasks = {
+        "user": dashboard_pool.submit(mongo.db.users.find_one, {"_id": clean_uid}, DASHBOARD_USER_FIELDS),
+        # Same read as /api/crops/get, in insertion order
+        "crops": dashboard_pool.submit(lambda: list(mongo.db.crops.find({"userID": userID}, {"_id": 0}))),
+    }
+    errors = {}
+    lat, lon = request.args.get("lat"), request.args.get("lon")
+    if lat and lon:
+        try:
+            lat, lon = float(lat), float(lon)
+        except ValueError:
+            return jsonify({"error": "Invalid lat/lon"}), 400
+        # On dashboard_pool, not outbound: a miss sleeps in the Nominatim
+        # limiter, and only queues for as long as the budget has left
+        tasks["location"] = dashboard_pool.submit(dashboard_location, lat, lon,
+                                                  max(deadline - time.monotonic(), 0))
+        if OPENWEATHER_KEY:
+            bucket = geo_bucket(lat, lon, WEATHER_BUCKET_DEG)
+            tasks["weather"] = outbound.submit(weather_current_cache.get, bucket)
+            tasks["forecast"] = outbound.submit(weather_forecast_cache.get, bucket)
+        else:
+            errors["weather"] = errors["forecast"] = "Missing OpenWeather key"
+
+    def result(name):
+        try:
+            return tasks[name].result(timeout=max(deadline - time.monotonic(), 0))
+        except (FuturesTimeout, requests.Timeout):
+            errors[name] = "timeout"
+        except UpstreamUnavailable as e:
+            errors[name] = e.reason
+        except UpstreamError as e:
+            errors[name] = f"upstream returned {e.status}"
+        except Exception as e:
+            print(f"[WARN] Dashboard {name} failed: {e}")
+            errors[name] = str(e)
+        return None
+
+    user = result("user")
+    if user is None and "user" not in errors:
+        return jsonify({"error": "User not found"}), 404
+    crops = result("crops")
+
+    schemes = None
+    state = request.args.get("state") or (user or {}).get("state")
+    if crops and state:
+        tasks["schemes"] = dashboard_pool.submit(dashboard_schemes, crops, state)
+        schemes = result("schemes")
+
+    weather = result("weather") if "weather" in tasks else None
+    forecast = result("forecast") if "forecast" in tasks else None
+    return jsonify({
+        "user": user,
+        "crops": crops,
+        "state": state,
+        "schemes": schemes,
+        "location": result("location") if "location" in tasks else None,
+        "weather": format_current_weather(weather) if weather else None,
+        "forecast": compact_forecast(forecast) if forecast else None,
+        "errors": errors,
+        "partial": bool(errors),
+    }), 200
+
+
 # ============================================================
 # GOV SCHEME ENDPOINTS (FROM FILE O)
 # ============================================================
 @app.post("/api/scheme/bycrop")
 def scheme_bycrop():
-    """Return the next best scheme for a given crop/state combination."""
+    """
+    Return the next best scheme(s) for a given crop/state combination.
+    Optional "limit" returns that many ranked schemes; pass "next_cursor"
+    back as "cursor" to get the following page.
+    """
     data = request.get_json() or {}
     crop = (data.get("crop") or "").strip()
     state = (data.get("state") or "").strip()
@@ -923,12 +1510,21 @@ def scheme_bycrop():
     if not crop or not state:
         return jsonify({"error": "Missing crop or state"}), 400
 
-    scheme_dict = get_next_best_scheme(crop, state, shown)
+    try:
+        schemes, next_cursor = get_ranked_schemes(
+            crop, state, shown, limit=_scheme_page_size(data), cursor=data.get("cursor")
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    if scheme_dict is None:
+    if not schemes:
         return jsonify({"error": "No scheme available"}), 404
 
-    return jsonify({"recommended_scheme": scheme_dict}), 200
+    return jsonify({
+        "recommended_scheme": schemes[0],
+        "schemes": schemes,
+        "next_cursor": next_cursor
+    }), 200
 
 
 @app.post("/api/scheme/auto")
@@ -949,17 +1545,64 @@ def scheme_auto():
 
     crop = latest_crop[0]["text"]
 
-    scheme_dict = get_next_best_scheme(crop, state, shown)
+    try:
+        schemes, next_cursor = get_ranked_schemes(
+            crop, state, shown, limit=_scheme_page_size(data), cursor=data.get("cursor")
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    if scheme_dict is None:
+    if not schemes:
         return jsonify({"error": "No scheme available"}), 404
 
     return jsonify({
         "crop": crop,
         "state": state,
-        "recommended_scheme": scheme_dict
+        "recommended_scheme": schemes[0],
+        "schemes": schemes,
+        "next_cursor": next_cursor
     }), 200
     
+@app.post("/api/scheme/batch")
+def scheme_batch():
+    """
+    Top-k schemes for many (crop, state) pairs in one call, e.g. every farmer
+    in a district. Body: {"pairs": [{"crop": ..., "state": ...}, ...], "limit": k}
+    """
+    data = request.get_json() or {}
+    pairs = data.get("pairs")
+    if not isinstance(pairs, list) or not pairs:
+        return jsonify({"error": "pairs must be a non-empty list"}), 400
+    if len(pairs) > MAX_SCHEME_BATCH_PAIRS:
+        return jsonify({"error": f"At most {MAX_SCHEME_BATCH_PAIRS} pairs per batch"}), 400
+
+    valid = []
+    results = []
+    for p in pairs:
+        p = p if isinstance(p, dict) else {}
+        crop = str(p.get("crop") or "").strip()
+        state = str(p.get("state") or "").strip()
+        if crop and state:
+            valid.append((len(results), crop, state))
+            results.append({"crop": crop, "state": state, "schemes": []})
+        else:
+            results.append({"crop": crop, "state": state, "error": "Missing crop or state"})
+
+    try:
+        ranked = recommend_schemes_batch([(c, s) for _, c, s in valid], k=_scheme_page_size(data))
+    except Exception as e:
+        print(f"[ERROR] Batch scheme recommendation failed: {e}")
+        return jsonify({"error": "Batch recommendation failed"}), 500
+
+    for (pos, _, _), schemes in zip(valid, ranked):
+        results[pos]["schemes"] = schemes
+    return jsonify({"results": results}), 200
+
+@app.get("/api/scheme/cache/stats")
+def scheme_cache_stats_endpoint():
+    """Hit/miss/eviction counters of the scheme ranking cache (per worker)."""
+    return jsonify(scheme_cache_stats()), 200
+
 @app.get("/api/scheme/list")
 def list_all_schemes():
     """Returns a list of all available schemes (limited sample)."""
@@ -969,7 +1612,7 @@ def list_all_schemes():
         display_cols = ["scheme_name", "state_ministry", "description", "scheme_link"]
         
         # Return the top 20 schemes from the loaded DataFrame for efficiency
-        limited_schemes = schemes_df.head(20).copy()
+        limited_schemes = get_scheme_index().df.head(20)
         
         return jsonify(limited_schemes[display_cols].to_dict(orient="records")), 200
     except Exception as e:
@@ -986,9 +1629,15 @@ def get_sellers():
     if not state:
         return jsonify({"error": "State required"}), 400
 
+    query = {**normalized_keys.query("users", "role_key", "seller"), "state": state}
+    # Optional comma-separated commodity filter, resolved via the seller index
+    commodity = (request.args.get("commodity") or "").strip()
+    if commodity:
+        query["_id"] = {"$in": get_seller_index().seller_ids_for_commodities(commodity)}
+
     sellers = list(
         mongo.db.users.find(
-            {"role": "seller", "state": state},
+            query,
             {"_id": 0, "password": 0}
         )
     )
@@ -0,0 +1,159 @@
+import time
+import threading
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    Final chatbot answers keyed by the question's embedding.
+
+    A lookup is one matrix-vector product over the stored (L2-normalized)
+    question embeddings; the best match is a hit if its cosine similarity
+    is at least `threshold` and it is younger than `ttl`. Beyond
+    max_entries the least recently used entry is replaced.
+
+    Entries belong to a generation of the vector store; check_generation()
+    drops everything when the store was rebuilt or reloaded.
+    """
+
+    def __init__(self, threshold: float = 0.92, ttl: float = 86400, max_entries: int = 1000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation = None
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._answers = [None] * max_entries
+        self._questions = [None] * max_entries
+        self._llm_calls = np.zeros(max_entries, dtype=np.int32)
+        self._stored_at = np.zeros(max_entries)
+        self._used_at = np.zeros(max_entries)
+        self._size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.llm_calls_saved = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        v = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def check_generation(self, generation):
+        with self._lock:
+            if generation == self.generation:
+                return
+            if self._size:
+                self.invalidations += 1
+                print(f"[INFO] Vector store changed; dropping {self._size} cached answers")
+            self.generation = generation
+            self._size = 0
+            self._answers = [None] * self.max_entries
+            self._questions = [None] * self.max_entries
+
+    def get(self, embedding):
+        """Cached answer for the closest stored question, or None."""
+        q = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            if self._size:
+                scores = self._matrix[:self._size] @ q
+                scores[now - self._stored_at[:self._size] > self.ttl] = -1.0
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.hits += 1
+                    self.llm_calls_saved += int(self._llm_calls[best])
+                    self._used_at[best] = now
+                    return self._answers[best]
+            self.misses += 1
+        return None
+
+    def put(self, question: str, embedding, answer: str, llm_calls: int = 0):
+        q = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != q.shape[0]:
+                self._matrix = np.zeros((self.max_entries, q.shape[0]), dtype=np.float32)
+                self._size = 0
+            if self._size:
+                # Same question again (e.g. two misses raced): refresh it in place
+                scores = self._matrix[:self._size] @ q
+                slot = int(np.argmax(scores))
+                if scores[slot] < 0.999:
+                    slot = None
+            else:
+                slot = None
+            if slot is None:
+                if self._size < self.max_entries:
+                    slot = self._size
+                    self._size += 1
+                else:
+                    expired = now - self._stored_at > self.ttl
+                    slot = int(np.argmax(expired)) if expired.any() else int(np.argmin(self._used_at))
+                    self.evictions += 1
+            self._matrix[slot] = q
+            self._answers[slot] = answer
+            self._questions[slot] = question
+            self._llm_calls[slot] = llm_calls
+            self._stored_at[slot] = now
+            self._used_at[slot] = now
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "llm_calls_saved": self.llm_calls_saved,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# Hit rate and lookup cost on synthetic paraphrases: each of 300 questions
+# is a random unit vector, its rewordings are small perturbations of it.
+# This measures the cache, not the threshold; tests/test_answer_cache.py
+# checks 0.92 against real encoded rewordings and near misses.
+# python -m src.answer_cache
+if __name__ == "__main__":
+    rng = np.random.default_rng(3)
+    dim, questions = 384, 300
+
+    base = rng.standard_normal((questions, dim)).astype(np.float32)
+    base /= np.linalg.norm(base, axis=1, keepdims=True)
+
+    def reworded(i):
+        v = base[i] + rng.standard_normal(dim).astype(np.float32) * 0.012
+        return v / np.linalg.norm(v)
+
+    cache = SemanticAnswerCache(threshold=0.92, max_entries=1000)
+    cache.check_generation(1)
+    # Popular questions are asked far more often (Zipf)
+    asked = np.minimum(rng.zipf(1.3, 5000), questions) - 1
+    wrong = 0
+    for i in asked:
+        emb = reworded(i)
+        answer = cache.get(emb)
+        if answer is None:
+            cache.put(f"question {i}", emb, f"answer {i}", llm_calls=2)
+        elif answer != f"answer {i}":
+            wrong += 1
+    print(f"[INFO] 5000 reworded questions over {questions} topics, {wrong} wrong answers: {cache.stats()}")
+
+    n = 2000
+    emb = reworded(0)
+    start = time.perf_counter()
+    for _ in range(n):
+        cache.get(emb)
+    print(f"[INFO] lookup over {cache.stats()['entries']} entries: {(time.perf_counter() - start) / n * 1e6:.1f} us")
+
+    cache.check_generation(2)
+    print(f"[INFO] after a store rebuild: entries={cache.stats()['entries']}, invalidations={cache.invalidations}")
@@ -0,0 +1,128 @@
+"""
+Local load test: chat delivery over /api/chat/stream (push) vs. polling
+/api/chat/history every few seconds like the old BuyerSellerChat.
+
+    python -m src.chat_loadtest [rooms] [messages_per_room]
+
+Starts the Flask app on a local port in this process (chat endpoints do
+not touch MongoDB), opens two participants per room and has one of them
+send messages. Reports delivery latency (send issued -> other
+participant sees it) and the number of HTTP requests the server handled.
+"""
+import os
+import sys
+import time
+import json
+import random
+import threading
+
+import requests
+
+os.environ.setdefault("DB_BOOTSTRAP", "0")
+os.environ.setdefault("CHAT_STORE", "memory")
+
+ROOMS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+MESSAGES_PER_ROOM = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+SEND_INTERVAL = 1.0
+POLL_INTERVAL = 3.0
+
+
+class Run:
+    def __init__(self, base: str, mode: str):
+        self.base = base
+        self.mode = mode
+        self.sent_at = {}
+        self.latencies = []
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def count(self, n: int = 1):
+        with self.lock:
+            self.requests += n
+
+    def delivered(self, text: str):
+        now = time.perf_counter()
+        with self.lock:
+            sent = self.sent_at.pop(text, None)
+            if sent is not None:
+                self.latencies.append(now - sent)
+
+    def sender(self, room: str):
+        session = requests.Session()
+        time.sleep(random.uniform(0, SEND_INTERVAL))
+        for i in range(MESSAGES_PER_ROOM):
+            # Texts are unique, so the receiver can match them to send times
+            text = f"{room} msg {i}"
+            with self.lock:
+                self.sent_at[text] = time.perf_counter()
+            session.post(f"{self.base}/api/chat/send", json={
+                "sender": "farmer", "receiver": "fpc", "text": text, "room": room,
+            })
+            self.count()
+            time.sleep(SEND_INTERVAL)
+
+    def stream_receiver(self, room: str, ready: threading.Barrier):
+        with requests.get(f"{self.base}/api/chat/stream", params={"room": room}, stream=True) as r:
+            self.count()
+            ready.wait()
+            seen = 0
+            for line in r.iter_lines(decode_unicode=True):
+                if line and line.startswith("data: "):
+                    self.delivered(json.loads(line[6:])["text"])
+                    seen += 1
+                    if seen == MESSAGES_PER_ROOM:
+                        return
+
+    def poll_receiver(self, room: str, ready: threading.Barrier):
+        session = requests.Session()
+        ready.wait()
+        seen = set()
+        time.sleep(random.uniform(0, POLL_INTERVAL))
+        while len(seen) < MESSAGES_PER_ROOM:
+            messages = session.get(f"{self.base}/api/chat/history", params={"room": room}).json()
+            self.count()
+            for m in messages:
+                if m["id"] not in seen:
+                    seen.add(m["id"])
+                    self.delivered(m["text"])
+            time.sleep(POLL_INTERVAL)
+
+    def run(self):
+        ready = threading.Barrier(ROOMS + 1)
+        receiver = self.stream_receiver if self.mode == "push" else self.poll_receiver
+        threads = []
+        for n in range(ROOMS):
+            room = f"{self.mode}-{n}"
+            threads.append(threading.Thread(target=receiver, args=(room, ready), daemon=True))
+        for t in threads:
+            t.start()
+        ready.wait()
+        senders = [threading.Thread(target=self.sender, args=(f"{self.mode}-{n}",), daemon=True) for n in range(ROOMS)]
+        start = time.perf_counter()
+        for t in senders:
+            t.start()
+        for t in senders + threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        lat = sorted(self.latencies)
+        p50 = lat[len(lat) // 2] * 1000
+        p95 = lat[int(len(lat) * 0.95) - 1] * 1000
+        print(f"[INFO] {self.mode:>4}: {len(lat)} msgs in {elapsed:.1f}s, latency p50 {p50:7.1f} ms "
+              f"p95 {p95:7.1f} ms, {self.requests} HTTP requests")
+
+
+if __name__ == "__main__":
+    import logging
+    from werkzeug.serving import make_server
+    from server import app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    httpd = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{httpd.server_port}"
+    print(f"[INFO] {ROOMS} rooms x {MESSAGES_PER_ROOM} messages against {base}")
+
+    Run(base, "poll").run()
+    Run(base, "push").run()
+    httpd.shutdown()
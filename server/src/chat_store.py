@@ -0,0 +1,250 @@
+import threading
+from collections import deque
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+
+class ChatRoom:
+    """Bounded message log for one room; messages carry a per-room `seq`."""
+
+    __slots__ = ("messages", "positions", "next_seq", "lock")
+
+    def __init__(self, retention: int):
+        self.messages = deque(maxlen=retention)
+        self.positions = {}
+        self.next_seq = 1
+        self.lock = threading.Lock()
+
+    def first_seq(self) -> int:
+        return self.messages[0]["seq"] if self.messages else self.next_seq
+
+
+class ChatStore:
+    """
+    In-memory chat history sharded by room.
+
+    Each room keeps its newest `retention` messages in a deque, so appends
+    and evictions are O(1) and reads only touch the requested room. The
+    room table has its own lock; each room has another, so sends to
+    different rooms do not contend under a threaded server.
+
+    Messages keep their uuid "id" and also get a per-room "seq"; a message
+    sits at deque position seq - first_seq, so before/after pagination by
+    message id is a dict lookup plus a slice.
+    """
+
+    def __init__(self, retention: int = 500):
+        self.retention = max(1, int(retention))
+        self._rooms = {}
+        self._lock = threading.Lock()
+
+    def _room(self, room: str, create: bool = False):
+        with self._lock:
+            r = self._rooms.get(room)
+            if r is None and create:
+                r = self._rooms[room] = ChatRoom(self.retention)
+            return r
+
+    def append(self, room: str, msg: dict, on_append=None) -> dict:
+        """
+        Store `msg` and assign its seq. `on_append(msg)` runs under the room
+        lock, so listeners see a room's messages in seq order; it must not
+        block.
+        """
+        r = self._room(room, create=True)
+        with r.lock:
+            if len(r.messages) == r.messages.maxlen:
+                r.positions.pop(r.messages[0]["id"], None)
+            msg["seq"] = r.next_seq
+            r.next_seq += 1
+            r.messages.append(msg)
+            r.positions[msg["id"]] = msg["seq"]
+            if on_append is not None:
+                on_append(msg)
+        return msg
+
+    def history(self, room: str, before: str = None, after: str = None, limit: int = None):
+        """
+        Messages for `room`, oldest first. `after` returns messages newer
+        than that id (the oldest `limit` of them), `before` returns messages
+        older than it (the newest `limit`). Unknown or evicted ids raise
+        KeyError. Without either, the newest `limit` (or all) are returned.
+        """
+        r = self._room(room)
+        if r is None:
+            if before or after:
+                raise KeyError(before or after)
+            return []
+        with r.lock:
+            first = r.first_seq()
+            start, end = 0, len(r.messages)
+            if after:
+                start = r.positions[after] - first + 1
+            if before:
+                end = r.positions[before] - first
+            if end <= start:
+                return []
+            if limit is not None and end - start > limit:
+                if after and not before:
+                    end = start + limit
+                else:
+                    start = end - limit
+            if start == 0 and end == len(r.messages):
+                return list(r.messages)
+            return [r.messages[i] for i in range(start, end)]
+
+    def seq_of(self, room: str, msg_id: str) -> int:
+        """Seq of a retained message; KeyError if unknown or evicted."""
+        r = self._room(room)
+        if r is None:
+            raise KeyError(msg_id)
+        with r.lock:
+            return r.positions[msg_id]
+
+    def since(self, room: str, seq: int, limit: int = None):
+        """Messages with a seq above `seq`, oldest first."""
+        r = self._room(room)
+        if r is None:
+            return []
+        with r.lock:
+            start = max(0, seq - r.first_seq() + 1)
+            end = len(r.messages) if limit is None else min(len(r.messages), start + limit)
+            return [r.messages[i] for i in range(start, end)]
+
+    def room_exists(self, room: str) -> bool:
+        return self._room(room) is not None
+
+    def delete_rooms(self, *rooms) -> int:
+        removed = 0
+        with self._lock:
+            for room in rooms:
+                if room and self._rooms.pop(room, None) is not None:
+                    removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            rooms = list(self._rooms.values())
+        return {
+            "rooms": len(rooms),
+            "messages": sum(len(r.messages) for r in rooms),
+            "retention": self.retention,
+        }
+
+
+class MongoChatStore:
+    """
+    ChatStore over MongoDB, so every worker process sees the same rooms.
+
+    A room's next seq is a counter document in `chat_rooms`; messages live
+    in `chat_messages` keyed by (room, seq). Appends past `retention` delete
+    the room's oldest messages, so a room still holds at most `retention`.
+    `get_db` is called per operation and returns the database.
+    """
+
+    def __init__(self, get_db, retention: int = 500):
+        self.get_db = get_db
+        self.retention = max(1, int(retention))
+
+    def append(self, room: str, msg: dict, on_append=None) -> dict:
+        """
+        Store `msg` and assign its seq. `on_append(msg)` runs once the
+        message is readable, so a listener woken by it finds it with since().
+        """
+        db = self.get_db()
+        counter = db.chat_rooms.find_one_and_update(
+            {"_id": room},
+            {"$inc": {"next_seq": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        msg["seq"] = counter["next_seq"]
+        db.chat_messages.insert_one(dict(msg))
+        if msg["seq"] > self.retention:
+            db.chat_messages.delete_many({"room": room, "seq": {"$lte": msg["seq"] - self.retention}})
+        if on_append is not None:
+            on_append(msg)
+        return msg
+
+    def seq_of(self, room: str, msg_id: str, db=None) -> int:
+        """Seq of a retained message; KeyError if unknown or evicted."""
+        db = db if db is not None else self.get_db()
+        doc = db.chat_messages.find_one({"room": room, "id": msg_id}, {"seq": 1})
+        if doc is None:
+            raise KeyError(msg_id)
+        return doc["seq"]
+
+    def history(self, room: str, before: str = None, after: str = None, limit: int = None):
+        """Same contract as ChatStore.history."""
+        db = self.get_db()
+        query = {"room": room}
+        seq = {}
+        if after:
+            seq["$gt"] = self.seq_of(room, after, db)
+        if before:
+            seq["$lt"] = self.seq_of(room, before, db)
+        if seq:
+            query["seq"] = seq
+        if after and not before:
+            cursor = db.chat_messages.find(query, {"_id": 0}).sort("seq", ASCENDING)
+            return list(cursor.limit(limit) if limit else cursor)
+        if limit is None:
+            return list(db.chat_messages.find(query, {"_id": 0}).sort("seq", ASCENDING))
+        newest = db.chat_messages.find(query, {"_id": 0}).sort("seq", DESCENDING).limit(limit)
+        return list(newest)[::-1]
+
+    def since(self, room: str, seq: int, limit: int = None):
+        """Messages with a seq above `seq`, oldest first."""
+        cursor = self.get_db().chat_messages.find(
+            {"room": room, "seq": {"$gt": seq}}, {"_id": 0}
+        ).sort("seq", ASCENDING)
+        return list(cursor.limit(limit) if limit else cursor)
+
+    def room_exists(self, room: str) -> bool:
+        return self.get_db().chat_rooms.find_one({"_id": room}, {"_id": 1}) is not None
+
+    def delete_rooms(self, *rooms) -> int:
+        rooms = [room for room in rooms if room]
+        if not rooms:
+            return 0
+        db = self.get_db()
+        db.chat_messages.delete_many({"room": {"$in": rooms}})
+        return db.chat_rooms.delete_many({"_id": {"$in": rooms}}).deleted_count
+
+    def stats(self) -> dict:
+        db = self.get_db()
+        return {
+            "rooms": db.chat_rooms.estimated_document_count(),
+            "messages": db.chat_messages.estimated_document_count(),
+            "retention": self.retention,
+        }
+
+
+# Benchmark: history latency vs. total chat volume
+# python -m src.chat_store
+if __name__ == "__main__":
+    import time
+    import uuid
+
+    for total in (10_000, 100_000, 1_000_000):
+        rooms = 1000
+        store = ChatStore(retention=500)
+        legacy = []
+        for i in range(total):
+            msg = {"id": str(uuid.uuid4()), "room": f"room{i % rooms}", "text": "hi"}
+            store.append(msg["room"], msg)
+            legacy.append(msg)
+
+        start = time.perf_counter()
+        for i in range(100):
+            [m for m in legacy if m.get("room") == f"room{i}"]
+        scan_ms = (time.perf_counter() - start) * 10
+
+        start = time.perf_counter()
+        for i in range(100):
+            page = store.history(f"room{i}", limit=50)
+            store.history(f"room{i}", before=page[0]["id"], limit=50)
+        store_ms = (time.perf_counter() - start) * 10
+
+        print(f"[INFO] total={total:>8}: list scan {scan_ms:8.3f} ms/read, "
+              f"chat store {store_ms:6.3f} ms/2 pages")
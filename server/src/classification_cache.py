@@ -0,0 +1,219 @@
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def classification_key(query: str, chat_context: str = "") -> str:
+    """
+    Case, whitespace and trailing punctuation do not change the decision;
+    the chat context does, so a fingerprint of it is part of the key.
+    """
+    q = re.sub(r"\s+", " ", query.lower()).strip(" ?!.,")
+    context = re.sub(r"\s+", " ", chat_context.lower()).strip()
+    if not context:
+        return q
+    return hashlib.sha1(context.encode()).hexdigest()[:16] + ":" + q
+
+
+class MemoryBackend:
+    """Per-process LRU with TTL."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 7 * 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: bool):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """
+    LRU with TTL in a SQLite file (WAL), shared by every worker process on
+    the host. Recency is refreshed at most once a minute per entry to keep
+    hits read-only; trimming back to max_entries runs every ~1% of puts.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = 7 * 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._puts = 0
+        self._trim_every = max(1, max_entries // 100)
+        self.evictions = 0
+        self.expirations = 0
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS classification ("
+            " key TEXT PRIMARY KEY, value INTEGER, stored_at REAL, used_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS classification_used_at ON classification (used_at)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10)
+        return conn
+
+    def get(self, key: str):
+        conn = self._conn()
+        row = conn.execute("SELECT value, stored_at, used_at FROM classification WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, stored_at, used_at = row
+        now = time.time()
+        if now - stored_at > self.ttl:
+            conn.execute("DELETE FROM classification WHERE key = ?", (key,))
+            conn.commit()
+            self.expirations += 1
+            return None
+        if now - used_at > 60:
+            conn.execute("UPDATE classification SET used_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+        return bool(value)
+
+    def put(self, key: str, value: bool):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO classification (key, value, stored_at, used_at) VALUES (?, ?, ?, ?)",
+            (key, int(value), now, now),
+        )
+        self._puts += 1
+        if self._puts % self._trim_every == 0:
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM classification WHERE key IN"
+                    " (SELECT key FROM classification ORDER BY used_at LIMIT ?)", (excess,)
+                )
+                self.evictions += excess
+        conn.commit()
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM classification").fetchone()[0]
+
+
+class ClassificationCache:
+    """Agriculture / not-agriculture decisions in front of the embedding and LLM checks."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"[WARN] Classification cache read failed: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: bool):
+        try:
+            self.backend.put(key, value)
+        except Exception as e:
+            print(f"[WARN] Classification cache write failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "entries": len(self.backend),
+            "max_entries": self.backend.max_entries,
+            "ttl": self.backend.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.backend.evictions,
+            "expirations": self.backend.expirations,
+        }
+
+
+def make_classification_cache(backend: str = "memory", path: str = None, max_entries: int = 10000,
+                              ttl: float = 7 * 86400) -> ClassificationCache:
+    if backend == "sqlite":
+        return ClassificationCache(SQLiteBackend(path, max_entries=max_entries, ttl=ttl))
+    if backend != "memory":
+        print(f"[WARN] Unknown classification cache backend {backend!r}, using memory")
+    return ClassificationCache(MemoryBackend(max_entries=max_entries, ttl=ttl))
+
+
+# Shared vs. per-worker caching across 4 processes asking the same questions
+# python -m src.classification_cache
+if __name__ == "__main__":
+    import os
+    import tempfile
+    from multiprocessing import Pool
+
+    def worker(args):
+        backend, path, keys = args
+        cache = make_classification_cache(backend, path, max_entries=1000)
+        computed = 0
+        for key in keys:
+            if cache.get(key) is None:
+                computed += 1  # stands in for an embedding encode or an LLM call
+                cache.put(key, len(key) % 2 == 0)
+        return computed
+
+    path = os.path.join(tempfile.mkdtemp(), "classification.sqlite3")
+    questions = [f"question {i % 300}" for i in range(2000)]
+    for backend in ("memory", "sqlite"):
+        jobs = [(backend, path, questions[w::4] + questions[:100]) for w in range(4)]
+        with Pool(4) as pool:
+            computed = sum(pool.map(worker, jobs))
+        print(f"[INFO] {backend:>6}: 4 workers, 300 distinct questions -> {computed} classifier calls")
+
+    path = os.path.join(tempfile.mkdtemp(), "classification.sqlite3")
+    for backend in ("memory", "sqlite"):
+        cache = make_classification_cache(backend, path, max_entries=1000)
+        keys = [classification_key(f"Which fertilizer for crop {i}?", "") for i in range(1500)]
+        start = time.perf_counter()
+        for key in keys:
+            cache.put(key, True)
+        put_us = (time.perf_counter() - start) / len(keys) * 1e6
+        start = time.perf_counter()
+        for key in keys:
+            cache.get(key)
+        get_us = (time.perf_counter() - start) / len(keys) * 1e6
+        print(f"[INFO] {backend:>6}: put {put_us:.1f} us, get {get_us:.1f} us; {cache.stats()}")
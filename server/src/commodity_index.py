@@ -0,0 +1,127 @@
+import re
+
+import numpy as np
+
+# Alternate names -> canonical commodity. Both sides are normalized with
+# normalize_commodity(); extend as new regional names show up in sign-ups.
+COMMODITY_ALIASES = {
+    "paddy": "rice",
+    "dhan": "rice",
+    "chawal": "rice",
+    "groundnut": "peanut",
+    "groundnuts": "peanut",
+    "peanuts": "peanut",
+    "moongphali": "peanut",
+    "corn": "maize",
+    "makka": "maize",
+    "gehun": "wheat",
+    "peas": "pea",
+    "matar": "pea",
+    "potatoes": "potato",
+    "aloo": "potato",
+    "onions": "onion",
+    "pyaz": "onion",
+    "tomatoes": "tomato",
+    "brinjal": "eggplant",
+    "baingan": "eggplant",
+    "sarson": "mustard",
+    "rapeseed": "mustard",
+    "pat": "jute",
+    "chai": "tea",
+    "adrak": "ginger",
+    "haldi": "turmeric",
+    "chillies": "chilli",
+    "chilies": "chilli",
+    "chili": "chilli",
+    "mirchi": "chilli",
+    "vegetable": "vegetables",
+}
+
+
+def normalize_commodity(text) -> str:
+    t = str(text or "").lower()
+    t = re.sub(r'[^a-z0-9\s]', ' ', t)
+    return " ".join(t.split())
+
+
+def split_commodities(commodities):
+    """Accepts a list or a comma-separated string; returns normalized names."""
+    if isinstance(commodities, (list, tuple)):
+        items = commodities
+    else:
+        items = str(commodities or "").split(",")
+    names = [normalize_commodity(c) for c in items]
+    return [n for n in names if n]
+
+
+class CommodityIndex:
+    """
+    Inverted index from normalized commodity to seller slots.
+
+    Each commodity is indexed under its full name and under its individual
+    words ("basmati rice" -> "basmati rice", "basmati", "rice"), all mapped
+    through the alias table. Matching is on whole terms, so "pea" no longer
+    hits "peanut".
+    """
+
+    def __init__(self, aliases=None):
+        aliases = COMMODITY_ALIASES if aliases is None else aliases
+        self.aliases = {normalize_commodity(k): normalize_commodity(v) for k, v in aliases.items()}
+        self.postings = {}
+        self.slot_terms = {}
+
+    def canonical(self, name: str) -> str:
+        return self.aliases.get(name, name)
+
+    def terms_for(self, commodities):
+        terms = set()
+        for name in split_commodities(commodities):
+            terms.add(self.canonical(name))
+            words = name.split()
+            if len(words) > 1:
+                terms.update(self.canonical(w) for w in words)
+        return terms
+
+    def add(self, slot: int, commodities):
+        self.remove(slot)
+        terms = self.terms_for(commodities)
+        for term in terms:
+            self.postings.setdefault(term, set()).add(slot)
+        self.slot_terms[slot] = terms
+
+    def remove(self, slot: int):
+        for term in self.slot_terms.pop(slot, ()):
+            plist = self.postings.get(term)
+            if plist is not None:
+                plist.discard(slot)
+                if not plist:
+                    del self.postings[term]
+
+    def query_terms(self, crops):
+        """Canonical, de-duplicated query commodities, in input order."""
+        seen = []
+        for name in split_commodities(crops):
+            term = self.canonical(name)
+            if term not in seen:
+                seen.append(term)
+        return seen
+
+    def slots_for(self, crops) -> set:
+        """Union of the posting lists: slots dealing in at least one of `crops`."""
+        result = set()
+        for term in self.query_terms(crops):
+            result |= self.postings.get(term, set())
+        return result
+
+    def match_counts(self, crops, n_slots: int):
+        """
+        Per-slot number of query commodities matched, plus the number of
+        query commodities (the denominator of the match fraction).
+        """
+        terms = self.query_terms(crops)
+        counts = np.zeros(n_slots)
+        for term in terms:
+            plist = self.postings.get(term)
+            if plist:
+                counts[np.fromiter(plist, dtype=np.int64, count=len(plist))] += 1
+        return counts, len(terms)
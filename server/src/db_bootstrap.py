@@ -0,0 +1,232 @@
+import re
+import threading
+
+from pymongo import ASCENDING, DESCENDING
+
+
+def normalize_key(value) -> str:
+    """Lowercased, whitespace-collapsed lookup key (what the old /i regexes compared)."""
+    return " ".join(str(value or "").lower().split())
+
+
+def key_regex(key: str) -> dict:
+    """Case-insensitive regex for the source values that normalize to `key`."""
+    words = r"\s+".join(re.escape(word) for word in key.split())
+    return {"$regex": rf"^\s*{words}\s*$", "$options": "i"}
+
+
+# collection -> list of (keys, options)
+INDEXES = {
+    "users": [
+        ([("role_key", ASCENDING), ("state", ASCENDING)], {}),
+        ([("role_key", ASCENDING), ("updated_at", ASCENDING)], {}),
+        ([("email", ASCENDING)], {}),
+        ([("fpc_name_key", ASCENDING)], {"sparse": True}),
+    ],
+    "requests": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("farmer_id", ASCENDING)], {}),
+        ([("fpc_id", ASCENDING)], {}),
+        ([("fpc_name_key", ASCENDING)], {}),
+        ([("settlement.status", ASCENDING)], {"sparse": True}),
+    ],
+    "notifications": [
+        ([("request_id", ASCENDING)], {}),
+        ([("to_key", ASCENDING), ("timestamp", DESCENDING)], {}),
+        ([("to_key", ASCENDING), ("seq", ASCENDING)], {}),
+    ],
+    "chat_messages": [
+        ([("room", ASCENDING), ("seq", ASCENDING)], {}),
+        ([("room", ASCENDING), ("id", ASCENDING)], {}),
+    ],
+    "crops": [
+        ([("userID", ASCENDING), ("date", DESCENDING)], {}),
+    ],
+}
+
+# collection -> {normalized field: source field}
+NORMALIZED_KEYS = {
+    "users": {"role_key": "role", "fpc_name_key": "fpcName"},
+    "requests": {"fpc_name_key": "fpc_name"},
+    "notifications": {"to_key": "to"},
+}
+
+
+class NormalizedKeys:
+    """
+    Tracks whether the *_key backfill is complete. Until it is (still
+    running, failed, or skipped with DB_BOOTSTRAP=0), query() also matches
+    documents that have no key yet by a regex on the source field, so
+    reads never miss data written before the keys existed.
+    """
+
+    def __init__(self):
+        self.ready = threading.Event()
+
+    def query(self, coll_name: str, key_field: str, key: str) -> dict:
+        if self.ready.is_set():
+            return {key_field: key}
+        source_field = NORMALIZED_KEYS[coll_name][key_field]
+        return {"$or": [
+            {key_field: key},
+            {key_field: {"$exists": False}, source_field: key_regex(key)},
+        ]}
+
+    def check(self, db) -> bool:
+        """Mark the keys ready if no document is missing one."""
+        try:
+            missing = missing_keys(db)
+        except Exception as e:
+            print(f"[WARN] Normalized key check failed: {e}")
+            return False
+        if missing:
+            print(f"[WARN] Normalized keys missing in {', '.join(missing)}; matching by regex until backfilled")
+            return False
+        self.ready.set()
+        return True
+
+
+normalized_keys = NormalizedKeys()
+
+
+def missing_keys(db) -> list:
+    """"collection.key" for every normalized key some document still lacks."""
+    missing = []
+    for coll_name, fields in NORMALIZED_KEYS.items():
+        for key_field, source_field in fields.items():
+            if db[coll_name].find_one({key_field: {"$exists": False}, source_field: {"$exists": True}}, {"_id": 1}):
+                missing.append(f"{coll_name}.{key_field}")
+    return missing
+
+
+def duplicate_values(coll, field: str, limit: int = 10) -> list:
+    pipeline = [
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit},
+    ]
+    return [doc["_id"] for doc in coll.aggregate(pipeline)]
+
+
+def ensure_indexes(db):
+    """
+    Create INDEXES; one failing index does not stop the rest. A unique index
+    over a field that already has duplicates is created non-unique and the
+    duplicates are logged, instead of failing the whole bootstrap.
+    """
+    for coll_name, specs in INDEXES.items():
+        coll = db[coll_name]
+        for keys, options in specs:
+            try:
+                if options.get("unique"):
+                    field = keys[0][0]
+                    dupes = duplicate_values(coll, field)
+                    if dupes:
+                        print(f"[ERROR] {coll_name}.{field} has duplicate values (e.g. {dupes}); "
+                              f"index created without unique, resolve them and drop it to enforce uniqueness")
+                        options = {k: v for k, v in options.items() if k != "unique"}
+                coll.create_index(keys, **options)
+            except Exception as e:
+                print(f"[WARN] Index {coll_name} {keys} not created: {e}")
+    print("[INFO] MongoDB indexes ensured")
+
+
+def migrate_normalized_keys(db) -> int:
+    """
+    Backfill the lowercase *_key fields on documents written before they
+    existed. Safe to re-run; only documents missing a key are touched.
+    Documents are grouped by key value so each value is one update_many.
+    """
+    updated = 0
+    for coll_name, fields in NORMALIZED_KEYS.items():
+        coll = db[coll_name]
+        for key_field, source_field in fields.items():
+            cursor = coll.find(
+                {key_field: {"$exists": False}, source_field: {"$exists": True}},
+                {source_field: 1},
+            )
+            ids_by_key = {}
+            for doc in cursor:
+                ids_by_key.setdefault(normalize_key(doc.get(source_field)), []).append(doc["_id"])
+            for key_value, ids in ids_by_key.items():
+                result = coll.update_many({"_id": {"$in": ids}}, {"$set": {key_field: key_value}})
+                updated += result.modified_count
+    print(f"[INFO] Normalized lookup keys backfilled on {updated} documents")
+    return updated
+
+
+def bootstrap(db):
+    try:
+        migrate_normalized_keys(db)
+    except Exception as e:
+        print(f"[WARN] Normalized key backfill failed: {e}")
+    normalized_keys.check(db)
+    try:
+        ensure_indexes(db)
+    except Exception as e:
+        print(f"[WARN] MongoDB bootstrap failed: {e}")
+
+
+def _winning_stages(plan: dict):
+    stages = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        if "stage" in node:
+            stages.append(node["stage"])
+        for key in ("inputStage", "queryPlan"):
+            if key in node:
+                stack.append(node[key])
+        stack.extend(node.get("inputStages", []))
+    return stages
+
+
+# Query shapes used by the hot endpoints, for the explain-plan check below
+ENDPOINT_QUERIES = [
+    ("signUp", "users", {"$or": [{"_id": "x"}, {"email": "x@example.com"}]}, None),
+    ("recommend/seller index", "users", {"role_key": "seller"}, None),
+    ("seller sync poll", "users", {"role_key": "seller", "updated_at": {"$exists": True}}, None),
+    ("sellers", "users", {"role_key": "seller", "state": "West Bengal"}, None),
+    ("create_request", "users", {"fpc_name_key": "some fpc"}, None),
+    ("list_requests by farmer", "requests", {"farmer_id": "x"}, None),
+    ("list_requests by fpc_id", "requests", {"fpc_id": "x"}, None),
+    ("list_requests by fpc_name", "requests", {"fpc_name_key": "some fpc"}, None),
+    ("accept/reject", "requests", {"id": "x"}, None),
+    ("settlement resume", "requests", {"settlement.status": {"$in": ["pending", "submitted"]}}, None),
+    ("notifications", "notifications", {"to_key": "some fpc"}, [("timestamp", DESCENDING)]),
+    ("notifications since", "notifications", {"to_key": "some fpc", "seq": {"$gt": 0}}, [("seq", ASCENDING)]),
+    ("notifications by request", "notifications", {"request_id": "x"}, None),
+    ("scheme_auto crops", "crops", {"userID": "x"}, [("date", DESCENDING)]),
+    ("chat since", "chat_messages", {"room": "a_b", "seq": {"$gt": 0}}, [("seq", ASCENDING)]),
+    ("chat message by id", "chat_messages", {"room": "a_b", "id": "x"}, None),
+]
+
+
+def explain_collscans(db):
+    """Return the names of endpoint queries whose winning plan contains a COLLSCAN."""
+    offenders = []
+    for name, coll_name, query, sort in ENDPOINT_QUERIES:
+        cursor = db[coll_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _winning_stages(plan):
+            offenders.append(name)
+    return offenders
+
+
+# Explain-plan check against a real mongod: python -m src.db_bootstrap
+if __name__ == "__main__":
+    import os
+    from pymongo import MongoClient
+
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/krishiMitra"))
+    db = client.get_default_database()
+    bootstrap(db)
+    offenders = explain_collscans(db)
+    if offenders:
+        print(f"[ERROR] COLLSCAN in: {offenders}")
+        raise SystemExit(1)
+    print(f"[INFO] No COLLSCAN in {len(ENDPOINT_QUERIES)} endpoint queries")
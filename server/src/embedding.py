@@ -1,16 +1,23 @@
 from typing import List, Any
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
 import numpy as np
 from src.data_loader import load_all_documents
+from src.model_registry import models
 
 class EmbeddingPipeline:
     def __init__(self, model_name: str = "all-MiniLM-L6-v2", chunk_size: int = 1000, chunk_overlap: int = 200):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        # Same instance as the vector store's when the model name matches
+        self.model = models.acquire(model_name)
         print(f"[INFO] Loaded embedding model: {model_name}")
 
+    def close(self):
+        if self.model is not None:
+            models.release(self.model_name)
+            self.model = None
+
     def chunk_documents(self, documents: List[Any]) -> List[Any]:
         splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.chunk_size,
@@ -0,0 +1,277 @@
+import json
+import time
+import sqlite3
+import threading
+
+from src.http_client import OutboundHTTP
+from src.weather_cache import InFlight, UpstreamError
+
+
+def grid_cell(lat: float, lon: float, precision: int = 3):
+    """
+    Round to `precision` decimal places (3 -> ~110 m cells); returns the
+    cell key and the cell's coordinates, which are what goes upstream.
+    """
+    clat, clon = round(float(lat), precision), round(float(lon), precision)
+    return f"{clat:.{precision}f},{clon:.{precision}f}", clat, clon
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. acquire() reserves the next free slot and
+    sleeps until it, so callers queue in arrival order instead of spinning;
+    it returns False without reserving if the wait would exceed max_wait.
+    """
+
+    def __init__(self, rate: float = 1.0, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def acquire(self, max_wait: float = None) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return False
+            # Tokens may go negative: that is the queue of reserved slots
+            self._tokens -= 1
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+
+class NominatimClient:
+    def __init__(self, base_url: str = "https://nominatim.openstreetmap.org",
+                 user_agent: str = "KrishiMitra/1.0 (educational project)", http: OutboundHTTP = None):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"User-Agent": user_agent}
+        self.http = http or OutboundHTTP()
+
+    def reverse(self, lat: float, lon: float):
+        r = self.http.get(
+            f"{self.base_url}/reverse",
+            params={"lat": lat, "lon": lon, "format": "json"},
+            headers=self.headers,
+        )
+        if r.status_code != 200:
+            raise UpstreamError(r.status_code, r.text)
+        return r.json()
+
+
+class ReverseGeocodeCache:
+    """
+    SQLite-backed reverse-geocode cache keyed by grid cell.
+
+    Hits are a primary-key lookup on a per-thread connection. Misses go
+    through the token bucket (Nominatim allows one request per second) and
+    concurrent misses for the same cell share one upstream call. Entries
+    older than max_age are refetched; errors are not cached.
+    """
+
+    def __init__(self, path: str, fetch, precision: int = 3, limiter: TokenBucket = None,
+                 max_wait: float = 30.0, max_age: float = 180 * 86400):
+        self.path = path
+        self.fetch = fetch
+        self.precision = precision
+        self.limiter = limiter or TokenBucket(rate=1.0)
+        self.max_wait = max_wait
+        self.max_age = max_age
+        self._local = threading.local()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.throttled = 0
+        self.errors = 0
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS reverse_geocode ("
+            " cell TEXT PRIMARY KEY, lat REAL, lon REAL, payload TEXT, fetched_at REAL)"
+        )
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10)
+        return conn
+
+    def get_cached(self, cell: str):
+        row = self._conn().execute(
+            "SELECT payload, fetched_at FROM reverse_geocode WHERE cell = ?", (cell,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.max_age:
+            return None
+        return json.loads(row[0])
+
+    def lookup(self, lat: float, lon: float, max_wait: float = None):
+        """
+        Cached or fetched Nominatim result for the cell containing (lat, lon).
+        `max_wait` lowers the limiter queue limit for this call only.
+        """
+        cell, clat, clon = grid_cell(lat, lon, self.precision)
+        place = self.get_cached(cell)
+        if place is not None:
+            self.hits += 1
+            return place
+
+        with self._lock:
+            call = self._inflight.get(cell)
+            if call is None:
+                self.misses += 1
+                call = self._inflight[cell] = InFlight()
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            # Share the leader's outcome; a failed call is not retried by every waiter
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            wait = self.max_wait if max_wait is None else min(max_wait, self.max_wait)
+            if not self.limiter.acquire(wait):
+                self.throttled += 1
+                raise UpstreamError(429, "reverse geocode queue is full, try again later")
+            try:
+                place = self.fetch(clat, clon)
+            except Exception:
+                self.errors += 1
+                raise
+            self.store(cell, clat, clon, place)
+            call.result = place
+            return place
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(cell)
+            call.done.set()
+
+    def store(self, cell: str, lat: float, lon: float, place):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO reverse_geocode (cell, lat, lon, payload, fetched_at) VALUES (?, ?, ?, ?, ?)",
+            (cell, lat, lon, json.dumps(place), time.time()),
+        )
+        conn.commit()
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM reverse_geocode").fetchone()[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self),
+            "precision": self.precision,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+def prewarm(cache: ReverseGeocodeCache, db, district_table) -> int:
+    """Fill the cache with the centroid cell of every district registered users are in."""
+    district_ids = set()
+    for name in db.users.distinct("district"):
+        district_id = district_table.lookup(name)
+        if district_id is None:
+            print(f"[WARN] Prewarm: unknown district {name!r}")
+        else:
+            district_ids.add(district_id)
+    fetched = 0
+    for district_id in sorted(district_ids):
+        lat, lon = district_table.centroid(district_id)
+        cell = grid_cell(lat, lon, cache.precision)[0]
+        if cache.get_cached(cell) is not None:
+            continue
+        try:
+            cache.lookup(lat, lon)
+            fetched += 1
+            print(f"[INFO] Prewarmed {district_table.names[district_id]} ({cell})")
+        except Exception as e:
+            print(f"[WARN] Prewarm failed for {district_table.names[district_id]}: {e}")
+    print(f"[INFO] Prewarm done: {len(district_ids)} districts, {fetched} fetched, {len(cache)} cached cells")
+    return fetched
+
+
+# python -m src.geocode_cache prewarm   fill the cache from users' districts (MONGO_URI)
+# python -m src.geocode_cache bench     hit latency and limiter pacing against a local stub
+if __name__ == "__main__":
+    import os
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "bench"
+
+    if command == "prewarm":
+        from pymongo import MongoClient
+        from src.district_index import DistrictTable
+
+        db = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/krishiMitra")).get_default_database()
+        table = DistrictTable(os.getenv("DISTRICT_TABLE_PATH", os.path.join(os.getcwd(), "district_centroids.csv")))
+        cache = ReverseGeocodeCache(
+            os.getenv("GEOCODE_CACHE_PATH", os.path.join(os.getcwd(), "geocode_cache.sqlite3")),
+            NominatimClient(base_url=os.getenv("NOMINATIM_BASE_URL", "https://nominatim.openstreetmap.org")).reverse,
+            precision=int(os.getenv("GEOCODE_PRECISION", "3")),
+        )
+        prewarm(cache, db, table)
+        sys.exit(0)
+
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from concurrent.futures import ThreadPoolExecutor
+
+    upstream_times = []
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            upstream_times.append(time.monotonic())
+            data = json.dumps({"display_name": "Alipurduar, West Bengal", "address": {"state_district": "Alipurduar"}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    path = os.path.join(tempfile.mkdtemp(), "geocode.sqlite3")
+    client = NominatimClient(base_url=f"http://127.0.0.1:{stub.server_port}")
+    cache = ReverseGeocodeCache(path, client.reverse)
+
+    # 5 distinct cells requested by 40 concurrent callers
+    points = [(26.49 + (i % 5) * 0.01, 89.52) for i in range(40)]
+    start = time.monotonic()
+    with ThreadPoolExecutor(40) as pool:
+        list(pool.map(lambda p: cache.lookup(*p), points))
+    gaps = [b - a for a, b in zip(upstream_times, upstream_times[1:])]
+    print(f"[INFO] 40 concurrent lookups, 5 cells -> {len(upstream_times)} upstream calls in "
+          f"{time.monotonic() - start:.1f}s, min gap {min(gaps):.2f}s")
+
+    # Survives a restart: a fresh instance on the same file answers from disk
+    cache = ReverseGeocodeCache(path, client.reverse)
+    n = 10000
+    start = time.perf_counter()
+    for i in range(n):
+        cache.lookup(*points[i % 5])
+    hit_us = (time.perf_counter() - start) / n * 1e6
+    print(f"[INFO] hit after restart: {hit_us:.1f} us/lookup; {cache.stats()}")
+    stub.shutdown()
@@ -0,0 +1,332 @@
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class UpstreamUnavailable(Exception):
+    """The call was not made: circuit open or host concurrency limit reached."""
+
+    def __init__(self, host: str, reason: str):
+        super().__init__(f"{host}: {reason}")
+        self.host = host
+        self.reason = reason
+
+
+class HostPolicy:
+    def __init__(self, connect_timeout: float = 3.0, read_timeout: float = 10.0, max_concurrency: int = 8,
+                 acquire_timeout: float = 2.0, retries: int = 2, backoff_base: float = 0.2, backoff_max: float = 2.0,
+                 failure_threshold: int = 5, cooldown: float = 30.0):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_concurrency = max_concurrency
+        self.acquire_timeout = acquire_timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `threshold` consecutive failures; after `cooldown`
+    seconds one trial call is let through (half-open) and its result
+    closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.opens = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial_running:
+                return False
+            self.trial_running = True
+            return True
+
+    def cancel(self):
+        """The allowed call was not made after all; a half-open trial may run again."""
+        with self._lock:
+            self.trial_running = False
+
+    def record(self, ok: bool):
+        with self._lock:
+            self.trial_running = False
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    self.opens += 1
+                self.opened_at = time.monotonic()
+
+
+class HostState:
+    def __init__(self, policy: HostPolicy):
+        self.policy = policy
+        self.slots = threading.BoundedSemaphore(policy.max_concurrency)
+        self.breaker = CircuitBreaker(policy.failure_threshold, policy.cooldown)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=1000)
+
+    def stats(self) -> dict:
+        lat = sorted(self.latencies)
+        return {
+            "state": self.breaker.state,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "breaker_opens": self.breaker.opens,
+            "p50_ms": round(lat[len(lat) // 2] * 1000, 1) if lat else None,
+            "p95_ms": round(lat[min(int(len(lat) * 0.95), len(lat) - 1)] * 1000, 1) if lat else None,
+        }
+
+
+RETRY_STATUS = {429, 502, 503, 504}
+
+
+class OutboundHTTP:
+    """
+    Shared client for third-party HTTP calls.
+
+    One pooled requests.Session for every upstream. Each host gets a
+    HostPolicy (timeouts, concurrency cap, retries, breaker settings), a
+    semaphore that bounds how many worker threads can be waiting on it, a
+    circuit breaker and latency/error counters. A call that cannot get a
+    slot within acquire_timeout, or hits an open circuit, fails fast with
+    UpstreamUnavailable instead of tying up the worker.
+
+    GETs are retried on connection failures and 429/502/503/504 with full
+    jitter backoff; read timeouts are not retried. submit() and
+    request_async() run calls on a bounded pool so several upstreams can be
+    awaited in parallel.
+    """
+
+    def __init__(self, default_policy: HostPolicy = None, policies: dict = None,
+                 pool_size: int = 32, async_workers: int = 16):
+        self.default_policy = default_policy or HostPolicy()
+        self.policies = dict(policies or {})
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=async_workers, thread_name_prefix="outbound")
+
+    def _host(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            with self._lock:
+                state = self._hosts.get(host)
+                if state is None:
+                    state = self._hosts[host] = HostState(self.policies.get(host, self.default_policy))
+        return state
+
+    def request(self, method: str, url: str, timeout=None, retries: int = None, **kwargs) -> requests.Response:
+        host = urlsplit(url).netloc
+        state = self._host(host)
+        policy = state.policy
+        # Breaker first: with the circuit open, calls fail at once instead of
+        # queueing for a slot behind calls to a host that is down
+        if not state.breaker.allow():
+            state.rejected += 1
+            raise UpstreamUnavailable(host, "circuit open")
+        if not state.slots.acquire(timeout=policy.acquire_timeout):
+            state.breaker.cancel()
+            state.rejected += 1
+            raise UpstreamUnavailable(host, "too many concurrent requests")
+
+        attempts = 1 + (policy.retries if retries is None else retries) if method.upper() == "GET" else 1
+        with state.lock:
+            state.in_flight += 1
+        try:
+            for attempt in range(attempts):
+                if attempt:
+                    state.retries += 1
+                    time.sleep(random.uniform(0, min(policy.backoff_max, policy.backoff_base * 2 ** attempt)))
+                start = time.perf_counter()
+                state.requests += 1
+                try:
+                    r = self.session.request(method, url, timeout=timeout or policy.timeout, **kwargs)
+                except requests.ReadTimeout:
+                    # The upstream may still be working on it; don't pile on
+                    state.timeouts += 1
+                    state.errors += 1
+                    state.breaker.record(False)
+                    raise
+                except requests.ConnectionError as e:
+                    state.errors += 1
+                    if isinstance(e, requests.ConnectTimeout):
+                        state.timeouts += 1
+                    if attempt == attempts - 1:
+                        state.breaker.record(False)
+                        raise
+                    continue
+                except Exception:
+                    # Anything else (bad redirects, broken chunked body, ...) still
+                    # counts, so a half-open trial never stays running
+                    state.errors += 1
+                    state.breaker.record(False)
+                    raise
+                finally:
+                    state.latencies.append(time.perf_counter() - start)
+                if r.status_code in RETRY_STATUS or r.status_code >= 500:
+                    state.errors += 1
+                    if r.status_code in RETRY_STATUS and attempt < attempts - 1:
+                        continue
+                    state.breaker.record(False)
+                    return r
+                state.breaker.record(True)
+                return r
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+            state.slots.release()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` (e.g. a client call) on the outbound pool; returns a Future."""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    async def request_async(self, method: str, url: str, **kwargs) -> requests.Response:
+        return await asyncio.wrap_future(self.submit(self.request, method, url, **kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {host: state.stats() for host, state in sorted(hosts.items())}
+
+
+# Check against a local stub that is slow, flaky or down
+# python -m src.http_client
+if __name__ == "__main__":
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    mode = {"status": 200, "delay": 0.0}
+    hits = []
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(time.monotonic())
+            time.sleep(mode["delay"])
+            try:
+                self.send_response(mode["status"])
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+            except BrokenPipeError:
+                pass  # the client already gave up (timeout)
+
+        def log_message(self, *args):
+            pass
+
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{stub.server_port}/x"
+    host = urlsplit(url).netloc
+    http = OutboundHTTP(policies={host: HostPolicy(read_timeout=0.3, max_concurrency=4, acquire_timeout=0.05,
+                                                   retries=2, backoff_base=0.05, failure_threshold=3, cooldown=0.5)})
+
+    # Slow upstream: calls end at the read timeout instead of hanging
+    mode["delay"] = 1.0
+    start = time.perf_counter()
+    try:
+        http.get(url, retries=0)
+    except requests.Timeout:
+        pass
+    print(f"[INFO] slow upstream cut off after {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    # Burst beyond the host limit: the extra callers fail fast
+    futures = [http.submit(http.get, url, retries=0) for _ in range(12)]
+    outcomes = []
+    for f in futures:
+        try:
+            f.result()
+            outcomes.append("ok")
+        except UpstreamUnavailable as e:
+            outcomes.append(e.reason)
+        except requests.Timeout:
+            outcomes.append("timeout")
+    print(f"[INFO] burst of 12 with max_concurrency=4: {outcomes.count('timeout')} timed out, "
+          f"{outcomes.count('too many concurrent requests')} rejected without waiting")
+
+    # Those timeouts opened the circuit; wait out the cooldown so a trial closes it
+    print(f"[INFO] after the timeouts: state={http.stats()[host]['state']}")
+    mode["delay"] = 0.0
+    time.sleep(0.6)
+    http.get(url)
+
+    # Flaky upstream: 503s are retried with backoff, then the circuit opens
+    mode["status"] = 503
+    for _ in range(3):
+        http.get(url)
+    n = len(hits)
+    try:
+        http.get(url)
+    except UpstreamUnavailable as e:
+        print(f"[INFO] after 3 failed calls: {e.reason}; no request sent: {len(hits) == n}")
+
+    # Recovery: after the cooldown one trial call closes the circuit
+    mode["status"] = 200
+    time.sleep(0.6)
+    status = http.get(url).status_code
+    print(f"[INFO] trial call after cooldown returned {status}; state={http.stats()[host]['state']}")
+
+    async def parallel():
+        return await asyncio.gather(*(http.request_async("GET", url) for _ in range(4)))
+
+    mode["delay"] = 0.2
+    start = time.perf_counter()
+    asyncio.run(parallel())
+    print(f"[INFO] 4 async calls of 200 ms each took {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    # A half-open trial that fails with anything else must not leave the circuit stuck
+    mode["delay"], mode["status"] = 0.0, 503
+    for _ in range(3):
+        http.get(url, retries=0)
+    time.sleep(0.6)
+    session_request = http.session.request
+    http.session.request = lambda *a, **kw: (_ for _ in ()).throw(requests.TooManyRedirects("loop"))
+    try:
+        http.get(url)
+    except requests.TooManyRedirects:
+        pass
+    http.session.request = session_request
+    print(f"[INFO] trial that raised TooManyRedirects: state={http.stats()[host]['state']}")
+
+    print(f"[INFO] {http.stats()}")
+    stub.shutdown()
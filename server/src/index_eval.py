@@ -0,0 +1,143 @@
+"""
+Recall@k and latency of each Faiss index type on our corpus, against the
+exact flat index, to pick FAISS_INDEX_TYPE and its nprobe / efSearch.
+
+    python -m src.index_eval [--store faiss_store] [--queries questions.txt] [--k 5]
+    python -m src.index_eval --synthetic 200000     # no store needed
+
+Corpus vectors come from the saved store (reconstructed from the index,
+or encoded from metadata.pkl when the index is missing or cannot
+reconstruct).
+Queries are the lines of --queries encoded with the store's model, or
+else corpus vectors with noise added, so each has near but not exact
+neighbours. Latency is per single-query search, as the chatbot issues them.
+Build parameters (FAISS_NLIST, FAISS_HNSW_M, FAISS_PQ_M, ...) are read
+from the environment like the store does.
+"""
+import os
+import sys
+import time
+import pickle
+import argparse
+
+import faiss
+import numpy as np
+
+from src.vectorstore import IndexConfig, build_index, index_type_of, search_params
+
+SWEEPS = {
+    "flat": [{}],
+    "ivf_flat": [{"nprobe": n} for n in (1, 4, 8, 16, 32)],
+    "hnsw": [{"ef_search": e} for e in (16, 32, 64, 128)],
+    "ivf_pq": [{"nprobe": n} for n in (1, 4, 8, 16, 32)],
+}
+
+
+def corpus_vectors(store_dir: str, model_name: str) -> np.ndarray:
+    index_path = os.path.join(store_dir, "faiss.index")
+    if os.path.exists(index_path):
+        index = faiss.read_index(index_path)
+        try:
+            return index.reconstruct_n(0, index.ntotal)
+        except RuntimeError:
+            print("[INFO] Index cannot reconstruct vectors; re-encoding the chunks")
+    else:
+        print(f"[INFO] No {index_path}; encoding the chunks in metadata.pkl")
+    from src.model_registry import models
+    with open(os.path.join(store_dir, "metadata.pkl"), "rb") as f:
+        texts = [m.get("text", "") for m in pickle.load(f)]
+    print(f"[INFO] Encoding {len(texts)} chunks with {model_name}")
+    return models.acquire(model_name).encode(texts, batch_size=64, show_progress_bar=True)
+
+
+def sweep(index) -> list:
+    """Search parameters to try for the index that was actually built."""
+    built = index_type_of(index)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return SWEEPS[built]
+    # nprobe beyond nlist searches the same lists again
+    nprobes = sorted({min(p["nprobe"], ivf.nlist) for p in SWEEPS[built]})
+    return [{"nprobe": n} for n in nprobes]
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def evaluate(index, queries: np.ndarray, truth: np.ndarray, k: int, **params):
+    p = search_params(index, params.get("nprobe"), params.get("ef_search"))
+    found, latencies = [], []
+    for q in queries:
+        q = q.reshape(1, -1)
+        start = time.perf_counter()
+        _, I = index.search(q, k) if p is None else index.search(q, k, params=p)
+        latencies.append(time.perf_counter() - start)
+        found.append(I[0])
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return recall, percentile(latencies, 0.5), percentile(latencies, 0.95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default="faiss_store")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--queries", help="file with one question per line")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N random vectors instead of the store")
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--types", default=",".join(SWEEPS))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.synthetic:
+        # Clustered like real chunk embeddings, not uniform noise
+        centers = rng.standard_normal((max(1, args.synthetic // 500), 384))
+        corpus = centers[rng.integers(0, len(centers), args.synthetic)] + rng.standard_normal((args.synthetic, 384)) * 0.6
+    else:
+        corpus = corpus_vectors(args.store, args.model)
+    corpus = np.ascontiguousarray(corpus, dtype=np.float32)
+    n, dim = corpus.shape
+
+    if args.queries:
+        from src.model_registry import models
+        with open(args.queries, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+        queries = models.acquire(args.model).encode(questions)
+    else:
+        picks = rng.choice(n, size=min(args.num_queries, n), replace=False)
+        scale = np.linalg.norm(corpus, axis=1).mean() / np.sqrt(dim)
+        queries = corpus[picks] + rng.standard_normal((len(picks), dim)) * scale * 0.3
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+
+    exact = faiss.IndexFlatL2(dim)
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+    print(f"[INFO] {n} vectors x {dim} dims, {len(queries)} queries, recall@{args.k} against flat")
+    print(f"{'index':<9} {'params':<14} {'build s':>8} {'size MB':>8} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7}")
+
+    for index_type in args.types.split(","):
+        if index_type not in SWEEPS:
+            parser.error(f"unknown index type {index_type!r}")
+        # nlist, hnsw_m, pq_m etc. come from the same FAISS_* settings as the store
+        config = IndexConfig.from_env()
+        config.index_type = index_type
+        start = time.perf_counter()
+        index = build_index(config, corpus)
+        index.add(corpus)
+        build_s = time.perf_counter() - start
+        size_mb = faiss.serialize_index(index).nbytes / 2 ** 20
+        # Rows are labelled with what was built: small corpora fall back to flat
+        built = index_type_of(index)
+        if built != index_type:
+            print(f"[INFO] {index_type} not built for {n} vectors; row below is {built}")
+        for params in sweep(index):
+            recall, p50, p95 = evaluate(index, queries, truth, args.k, **params)
+            label = ",".join(f"{key}={value}" for key, value in params.items()) or "-"
+            print(f"{built:<9} {label:<14} {build_s:8.1f} {size_mb:8.1f} {recall:7.3f} {p50 * 1000:7.3f} {p95 * 1000:7.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+
+
+def load_sentence_transformer(name: str, device: str = None):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name, device=device)
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of loaded models keyed by (name, device).
+
+    acquire() loads a model on first use and hands the same instance to
+    every later caller; release() drops a reference and unloads the model
+    once nobody holds it. Loads of different models run in parallel,
+    concurrent acquires of the same model wait for the one load.
+    """
+
+    def __init__(self, loader=load_sentence_transformer, default_device: str = None):
+        self.loader = loader
+        self.default_device = default_device
+        self._models = {}
+        self._refs = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.load_seconds = {}
+
+    def _key(self, name: str, device: str = None):
+        return name, device or self.default_device or "auto"
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def acquire(self, name: str, device: str = None):
+        key = self._key(name, device)
+        with self._key_lock(key):
+            with self._lock:
+                model = self._models.get(key)
+            if model is None:
+                start = time.perf_counter()
+                model = self.loader(name, device or self.default_device)
+                self.load_seconds[key] = round(time.perf_counter() - start, 3)
+                print(f"[INFO] Loaded model {name} ({key[1]}) in {self.load_seconds[key]:.2f}s")
+                with self._lock:
+                    self._models[key] = model
+                    self.loads += 1
+            with self._lock:
+                self._refs[key] = self._refs.get(key, 0) + 1
+        return model
+
+    def release(self, name: str, device: str = None):
+        # Under the key lock, so an acquire that already found the model
+        # takes its reference before the model can be unloaded
+        key = self._key(name, device)
+        with self._key_lock(key), self._lock:
+            refs = self._refs.get(key, 0) - 1
+            if refs > 0:
+                self._refs[key] = refs
+                return
+            self._refs.pop(key, None)
+            if self._models.pop(key, None) is not None:
+                print(f"[INFO] Unloaded model {name} ({key[1]})")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loads": self.loads,
+                "models": {f"{name}@{device}": {"refs": self._refs.get((name, device), 0),
+                                                "load_seconds": self.load_seconds.get((name, device))}
+                           for name, device in self._models},
+            }
+
+
+# Shared by the vector store, the embedding pipeline and RAGSearch
+models = ModelRegistry(default_device=os.getenv("EMBEDDING_DEVICE") or None)
+
+
+# Startup time and memory with and without the registry. The loader
+# allocates a MiniLM-sized weight buffer so this runs without the model.
+# python -m src.model_registry
+if __name__ == "__main__":
+    import tracemalloc
+    import numpy as np
+
+    def fake_loader(name, device):
+        time.sleep(0.3)
+        return np.ones(22_700_000, dtype=np.float32)  # ~91 MB, like all-MiniLM-L6-v2
+
+    name = "all-MiniLM-L6-v2"
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    separate = [fake_loader(name, None) for _ in ("vectorstore", "classifier", "pipeline")]
+    print(f"[INFO] separate loads: {time.perf_counter() - start:.2f}s, "
+          f"{tracemalloc.get_traced_memory()[0] / 2**20:.0f} MB")
+    del separate
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    registry = ModelRegistry(loader=fake_loader)
+    start = time.perf_counter()
+    threads = [threading.Thread(target=registry.acquire, args=(name,)) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"[INFO] registry:       {time.perf_counter() - start:.2f}s, "
+          f"{tracemalloc.get_traced_memory()[0] / 2**20:.0f} MB; {registry.stats()}")
+
+    for _ in range(3):
+        registry.release(name)
+    print(f"[INFO] after the last release: {tracemalloc.get_traced_memory()[0] / 2**20:.0f} MB; {registry.stats()}")
+    tracemalloc.stop()
@@ -0,0 +1,115 @@
+import json
+import queue
+import threading
+
+
+class NotificationHub:
+    """
+    In-process fan-out of notification events to connected clients.
+
+    Each Server-Sent Events connection subscribes with a key (normalized
+    FPC name for notifications, room for chat) and gets its own bounded
+    queue; publish() pushes into every queue for that key. Nothing is read
+    from Mongo per event, so the cost of an idle connection does not depend
+    on notification history.
+
+    Events are only seen by subscribers in the same process. With several
+    workers the hub is just the fast path: notification and chat streams
+    also poll their `seq` cursor in Mongo on a timer to pick up what other
+    workers published.
+    """
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, key: str) -> queue.Queue:
+        q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(q)
+        return q
+
+    def unsubscribe(self, key: str, q: queue.Queue):
+        with self._lock:
+            subs = self._subscribers.get(key)
+            if subs is not None:
+                subs.discard(q)
+                if not subs:
+                    del self._subscribers[key]
+
+    def publish(self, key: str, event: dict):
+        with self._lock:
+            subs = list(self._subscribers.get(key, ()))
+            self.published += 1
+        for q in subs:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # Slow client; it will resync from its cursor on reconnect
+                self.dropped += 1
+
+    def connections(self) -> int:
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+    def stats(self) -> dict:
+        return {
+            "connections": self.connections(),
+            "recipients": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+def format_sse(event: dict, event_id=None, event_type: str = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event_type:
+        lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(event, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+# Benchmark: CPU per connected seller vs. notification history size
+# python -m src.notification_hub
+if __name__ == "__main__":
+    import re
+    import time
+    import mongomock
+
+    sellers = 200
+    events_per_seller = 5
+
+    for history in (1_000, 10_000, 50_000):
+        db = mongomock.MongoClient().db
+        db.notifications.insert_many([
+            {"to": f"FPC {i % sellers}", "to_key": f"fpc {i % sellers}", "seq": i, "read": True,
+             "timestamp": "2024-01-01 00:00:00", "msg": "old"}
+            for i in range(history)
+        ])
+
+        # Old behaviour: every poll re-reads the full history for that seller
+        sampled = range(0, sellers, 10)
+        start = time.process_time()
+        for s in sampled:
+            list(db.notifications.find({"to": {"$regex": re.escape(f"FPC {s}"), "$options": "i"}}).sort("timestamp", -1))
+        poll_cpu = (time.process_time() - start) / len(sampled)
+
+        # Push: sellers stay subscribed; each new notification is one fan-out
+        hub = NotificationHub()
+        queues = [hub.subscribe(f"fpc {s}") for s in range(sellers)]
+        start = time.process_time()
+        for n in range(events_per_seller):
+            for s in range(sellers):
+                hub.publish(f"fpc {s}", {"seq": history + n, "msg": "new"})
+        for q in queues:
+            while not q.empty():
+                format_sse(q.get_nowait())
+        push_cpu = (time.process_time() - start) / sellers
+
+        print(f"[INFO] history={history:>6}: poll {poll_cpu * 1000:8.3f} ms CPU/seller/poll, "
+              f"push {push_cpu * 1000:6.3f} ms CPU/seller for {events_per_seller} events")
@@ -0,0 +1,158 @@
+import os
+import tempfile
+import threading
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class ReferenceBank:
+    """
+    Named banks of reference phrases (e.g. "en", "hi", "agronomy") with
+    their embeddings precomputed, L2-normalized and kept as one contiguous
+    float32 matrix per bank, so scoring a query is a single matrix-vector
+    product and a max.
+
+    Banks are persisted to one .npz file (next to the FAISS store). On
+    start-up only phrases missing from the file are encoded; a bank saved
+    by a different model is re-encoded in full.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], model_name: str, path: str = None):
+        self.encode = encode
+        self.model_name = model_name
+        self.path = path
+        self._banks = {}
+        self._lock = threading.Lock()
+        self._saved = self._read() if path else {}
+        self.encoded = 0
+
+    def _read(self) -> Dict[str, tuple]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data["model"]) != self.model_name:
+                    print(f"[INFO] Reference bank at {self.path} is for another model; re-encoding")
+                    return {}
+                names = [str(n) for n in data["banks"]]
+                return {name: (list(data[f"{name}.texts"]), data[f"{name}.embeddings"]) for name in names}
+        except Exception as e:
+            print(f"[WARN] Could not read reference bank {self.path}: {e}")
+            return {}
+
+    def _write(self):
+        # Banks saved earlier but not set in this run are kept
+        arrays = {"model": np.array(self.model_name), "banks": np.array(sorted(self._saved))}
+        for name, (texts, matrix) in self._saved.items():
+            arrays[f"{name}.texts"] = np.array(texts, dtype=str)
+            arrays[f"{name}.embeddings"] = matrix
+        # A temp file of its own: workers starting together must not write into one
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".",
+                                   prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def set_bank(self, name: str, texts: List[str]):
+        """Make `name` hold exactly `texts`, encoding only phrases not already embedded."""
+        texts = list(dict.fromkeys(t.strip() for t in texts if t and t.strip()))
+        with self._lock:
+            known = {}
+            for source in (self._saved.get(name), self._banks.get(name)):
+                if source:
+                    known.update(zip(source[0], source[1]))
+            missing = [t for t in texts if t not in known]
+            if missing:
+                known.update(zip(missing, normalize_rows(self.encode(missing))))
+                self.encoded += len(missing)
+            matrix = np.ascontiguousarray(np.stack([known[t] for t in texts]), dtype=np.float32) if texts else None
+            self._banks[name] = (texts, matrix)
+            saved = self._saved.get(name)
+            if self.path and (saved is None or saved[0] != texts):
+                self._saved[name] = (texts, matrix)
+                self._write()
+        return len(missing)
+
+    def extend(self, name: str, texts: List[str]) -> int:
+        """Add phrases to a bank (created if missing); returns how many were encoded."""
+        current = self._banks.get(name)
+        return self.set_bank(name, (current[0] if current else []) + list(texts))
+
+    def max_similarity(self, query_embedding: np.ndarray, bank: str = None) -> float:
+        """Highest cosine similarity between the query and the bank (all banks if None)."""
+        q = normalize_rows(np.asarray(query_embedding).reshape(-1))
+        banks = [self._banks[bank]] if bank is not None else list(self._banks.values())
+        best = -1.0
+        for _, matrix in banks:
+            if matrix is not None:
+                best = max(best, float(np.max(matrix @ q)))
+        return best
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "path": self.path,
+            "banks": {name: len(texts) for name, (texts, _) in self._banks.items()},
+            "encoded_this_run": self.encoded,
+        }
+
+
+# Warm start and scoring cost. A hashing encoder stands in for the
+# SentenceTransformer so this runs without downloading a model.
+# python -m src.reference_bank
+if __name__ == "__main__":
+    import time
+    import zlib
+
+    from src.utils import AGRI_REFERENCE_TEXTS
+
+    dim = 384
+    calls = []
+
+    def encode(texts):
+        calls.append(len(texts))
+        return np.stack([np.random.default_rng(zlib.crc32(t.encode())).standard_normal(dim) for t in texts])
+
+    path = os.path.join(tempfile.mkdtemp(), "agri_reference.npz")
+    agronomy = [f"agronomy phrase {i}" for i in range(5000)]
+
+    start = time.perf_counter()
+    bank = ReferenceBank(encode, "all-MiniLM-L6-v2", path)
+    bank.set_bank("en", AGRI_REFERENCE_TEXTS)
+    bank.extend("agronomy", agronomy)
+    print(f"[INFO] cold start: encoded {bank.encoded} phrases in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    calls.clear()
+    start = time.perf_counter()
+    bank = ReferenceBank(encode, "all-MiniLM-L6-v2", path)
+    bank.set_bank("en", AGRI_REFERENCE_TEXTS)
+    bank.set_bank("agronomy", agronomy)
+    print(f"[INFO] warm start: {sum(calls)} phrases encoded, loaded in {(time.perf_counter() - start) * 1000:.1f} ms; {bank.stats()}")
+
+    q = encode([AGRI_REFERENCE_TEXTS[3]])[0]
+
+    n = 10000
+    for name in ("en", "agronomy"):
+        start = time.perf_counter()
+        for _ in range(n):
+            bank.max_similarity(q, name)
+        print(f"[INFO] max similarity over {bank.stats()['banks'][name]} phrases: "
+              f"{(time.perf_counter() - start) / n * 1e6:.1f} us/query")
+
+    # Another model invalidates the file
+    calls.clear()
+    bank = ReferenceBank(encode, "paraphrase-multilingual-MiniLM-L12-v2", path)
+    bank.set_bank("en", AGRI_REFERENCE_TEXTS)
+    print(f"[INFO] model change: {sum(calls)} of {len(AGRI_REFERENCE_TEXTS)} phrases re-encoded")
@@ -1,33 +1,110 @@
 import re
-import pandas as pd
 import numpy as np
-from collections import Counter
-from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import os
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-CSV_PATH = os.path.join(os.getcwd(), "new_allschemes.csv")
+from src.scheme_engine.index import SchemeIndex, SchemeIndexManager
+from src.scheme_engine.ranking import SchemeRanking, top_k_indices, encode_cursor, decode_cursor
+from src.scheme_engine.cache import RankingCache
 
-df = pd.read_csv(CSV_PATH)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.getenv("SCHEME_CSV_PATH", os.path.join(os.getcwd(), "new_allschemes.csv"))
+INDEX_PATH = os.getenv("SCHEME_INDEX_PATH", os.path.join(os.path.dirname(CSV_PATH), "scheme_index.pkl"))
 
-text_cols = ["scheme_name", "state_ministry", "description", "tags", "combined_text"]
-for c in text_cols:
-    df[c] = df[c].fillna("").astype(str)
+index_manager = SchemeIndexManager(
+    CSV_PATH,
+    INDEX_PATH,
+    check_interval=float(os.getenv("SCHEME_RELOAD_INTERVAL", "30")),
+)
 
+ranking_cache = RankingCache(
+    max_entries=int(os.getenv("SCHEME_CACHE_MAX_ENTRIES", "256")),
+    max_bytes=int(os.getenv("SCHEME_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+    ttl=float(os.getenv("SCHEME_CACHE_TTL", "3600")),
+)
 
-all_tags = ", ".join(df["tags"].fillna(""))
-tag_list = [t.strip().lower() for t in all_tags.split(",") if t.strip()]
-tag_counts = Counter(tag_list)
-important_keywords = [tag for tag, _ in tag_counts.most_common(50)]
+def get_index() -> SchemeIndex:
+    """The live scheme index; may be swapped for a rebuilt one when the CSV changes."""
+    return index_manager.current()
 
-vectorizer = TfidfVectorizer(stop_words="english")
-tfidf_matrix = vectorizer.fit_transform(df["combined_text"])
+def normalize_query_text(text) -> str:
+    return " ".join(str(text or "").lower().split())
 
 def word_in(text, word):
     pattern = r"\b" + re.escape(word.lower()) + r"\b"
     return re.search(pattern, text.lower()) is not None
 
+def rank_schemes(crop: str, state: str, index: SchemeIndex = None) -> SchemeRanking:
+    """
+    Full ranked ordering for (crop, state). Served from ranking_cache when
+    possible; otherwise the table is scored once and the result cached.
+    """
+    index = index or get_index()
+    crop = normalize_query_text(crop)
+    state = normalize_query_text(state)
+    key = (crop, state)
+    ranking = ranking_cache.get(key, index.dataset_version)
+    if ranking is None:
+        scorer = index.scorer
+        ranking = SchemeRanking(crop, state, scorer.score(crop, state), scorer.name_keys)
+        ranking_cache.put(key, index.dataset_version, ranking)
+    return ranking
+
+
+def cache_stats() -> dict:
+    return ranking_cache.stats()
+
+
+def scheme_record(index: SchemeIndex, idx: int, score: float) -> dict:
+    df = index.df
+    row = df.iloc[idx]
+    return {
+        "scheme_name": row["scheme_name"],
+        "state_ministry": row["state_ministry"],
+        "description": row["description"],
+        "tags": row["tags"],
+        "scheme_link": str(row["scheme_link"]) if "scheme_link" in df.columns else "",
+        "score": float(score)
+    }
+
+
+def recommend_schemes(crop: str, state: str, k: int = 1, exclude=None, cursor: str = None):
+    """
+    Top-k schemes for (crop, state), skipping normalized names in `exclude`.
+
+    Pass the returned cursor back in to get the following page. Returns
+    (schemes, next_cursor); next_cursor is None when the ranking is exhausted.
+    Raises ValueError for a cursor that does not belong to this query.
+    """
+    index = get_index()
+    ranking = rank_schemes(crop, state, index)
+    offset = decode_cursor(cursor, ranking.crop, ranking.state) if cursor else 0
+    picked, next_offset = ranking.page(k, offset=offset, exclude=exclude)
+    schemes = [scheme_record(index, idx, ranking.scores[idx]) for idx in picked]
+    next_cursor = encode_cursor(ranking.crop, ranking.state, next_offset) if next_offset is not None else None
+    return schemes, next_cursor
+
+
+def recommend_schemes_batch(pairs, k: int = 1, chunk_size: int = 256):
+    """
+    Top-k schemes for many (crop, state) pairs in one go.
+
+    Each chunk of pairs is scored with a single vectorizer.transform and a
+    single sparse product against the TF-IDF matrix (see SchemeScorer.score_batch),
+    so throughput scales with batch size rather than request count.
+    Returns one list of scheme dicts per input pair, in order.
+    """
+    index = get_index()
+    crops = [normalize_query_text(c) for c, _ in pairs]
+    states = [normalize_query_text(s) for _, s in pairs]
+    results = []
+    for start in range(0, len(pairs), chunk_size):
+        scores = index.scorer.score_batch(crops[start:start + chunk_size], states[start:start + chunk_size])
+        for row in scores:
+            results.append([scheme_record(index, int(idx), row[idx]) for idx in top_k_indices(row, k)])
+    return results
+
+
 def recommend_scheme_single(crop: str, state: str):
     """
     Returns:
@@ -39,17 +116,22 @@ def recommend_scheme_single(crop: str, state: str):
             "tags": ...
         }
     """
-    crop = crop.lower().strip()
-    state = state.lower().strip()
+    schemes, _ = recommend_schemes(crop, state, k=1)
+    return schemes[0]
+
 
-    # ML similarity raw scores
+def _loop_scores(index: SchemeIndex, crop: str, state: str) -> np.ndarray:
+    """
+    Original row-by-row implementation of the scoring formula.
+    Kept only as the reference for the parity check / benchmark below.
+    """
     user_query = f"{crop} farmer in {state} looking for schemes"
-    qvec = vectorizer.transform([user_query])
-    ml_raw = cosine_similarity(qvec, tfidf_matrix).flatten()
+    qvec = index.vectorizer.transform([user_query])
+    ml_raw = cosine_similarity(qvec, index.tfidf_matrix).flatten()
 
     final_scores = []
 
-    for idx, row in df.iterrows():
+    for idx, row in index.df.iterrows():
         desc = row["description"].lower()
         tags = row["tags"].lower()
         sm = row["state_ministry"].lower()
@@ -74,7 +156,7 @@ def recommend_scheme_single(crop: str, state: str):
             score += 150
 
         # KEYWORD BOOST
-        for key in important_keywords:
+        for key in index.important_keywords:
             if word_in(tags, key) or word_in(desc, key):
                 score += 5
 
@@ -83,15 +165,35 @@ def recommend_scheme_single(crop: str, state: str):
 
         final_scores.append(score)
 
-    final_scores = np.array(final_scores)
-    best_index = final_scores.argmax()
-    best_row = df.iloc[best_index]
-
-    return {
-        "scheme_name": best_row["scheme_name"],
-        "state_ministry": best_row["state_ministry"],
-        "description": best_row["description"],
-        "tags": best_row["tags"],
-        "scheme_link": str(best_row["scheme_link"]) if "scheme_link" in df.columns else "",
-        "score": float(final_scores[best_index])
-    }
+    return np.array(final_scores)
+
+
+# Micro-benchmark (parity is in tests/test_scheme_engine.py): python -m src.scheme_engine.engine
+if __name__ == "__main__":
+    import time
+
+    index = get_index()
+    pairs = [
+        ("rice", "west bengal"), ("paddy", "assam"), ("wheat", "punjab"),
+        ("fish", "kerala"), ("goat", "rajasthan"), ("tea", "assam"),
+        ("crop insurance", "odisha"), ("milk", "gujarat"), ("pea", "uttarakhand"),
+        ("mango", "puducherry"),
+    ]
+
+    loop = lambda crop, state: _loop_scores(index, crop, state)
+    for label, fn in (("iterrows/regex", loop), ("vectorized", index.scorer.score)):
+        start = time.perf_counter()
+        for crop, state in pairs:
+            fn(crop, state)
+        per_request = (time.perf_counter() - start) / len(pairs)
+        print(f"[INFO] {label:15s} {per_request * 1000:8.2f} ms/request")
+
+    batch = [pairs[i % len(pairs)] for i in range(500)]
+    start = time.perf_counter()
+    for crop, state in batch:
+        index.scorer.score(crop, state)
+    single = time.perf_counter() - start
+    start = time.perf_counter()
+    recommend_schemes_batch(batch, k=5)
+    batched = time.perf_counter() - start
+    print(f"[INFO] {len(batch)} pairs: one-by-one {single * 1000:.0f} ms, batch {batched * 1000:.0f} ms")
@@ -0,0 +1,164 @@
+import os
+import time
+import pickle
+import hashlib
+import threading
+import pandas as pd
+from collections import Counter
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.scheme_engine.scorer import SchemeScorer
+
+# Bump whenever the pickled layout or the scoring inputs change
+ARTIFACT_VERSION = 1
+
+TEXT_COLS = ["scheme_name", "state_ministry", "description", "tags", "combined_text"]
+
+
+def file_fingerprint(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class SchemeIndex:
+    """
+    Everything fitted from the scheme CSV: the cleaned table, important
+    keywords, the TF-IDF vectorizer/matrix and the vectorized scorer.
+    Can be pickled to disk so a cold start skips the refit.
+    """
+
+    def __init__(self, df: pd.DataFrame, important_keywords, vectorizer, tfidf_matrix, dataset_version: str):
+        self.df = df
+        self.important_keywords = important_keywords
+        self.vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        self.dataset_version = dataset_version
+        self.scorer = SchemeScorer(df, important_keywords, vectorizer, tfidf_matrix)
+
+    @classmethod
+    def build(cls, csv_path: str, dataset_version: str = None) -> "SchemeIndex":
+        dataset_version = dataset_version or file_fingerprint(csv_path)
+        df = pd.read_csv(csv_path)
+        for c in TEXT_COLS:
+            df[c] = df[c].fillna("").astype(str)
+
+        all_tags = ", ".join(df["tags"].fillna(""))
+        tag_list = [t.strip().lower() for t in all_tags.split(",") if t.strip()]
+        tag_counts = Counter(tag_list)
+        important_keywords = [tag for tag, _ in tag_counts.most_common(50)]
+
+        vectorizer = TfidfVectorizer(stop_words="english")
+        tfidf_matrix = vectorizer.fit_transform(df["combined_text"])
+        print(f"[INFO] Built scheme index from {csv_path} ({len(df)} schemes)")
+        return cls(df, important_keywords, vectorizer, tfidf_matrix, dataset_version)
+
+    def save(self, path: str):
+        payload = {"artifact_version": ARTIFACT_VERSION, "index": self}
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        print(f"[INFO] Saved scheme index to {path}")
+
+    @classmethod
+    def load(cls, path: str, dataset_version: str = None):
+        """Load a saved index; returns None if it is missing, unreadable or out of date."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                payload = pickle.load(f)
+        except Exception as e:
+            print(f"[WARN] Could not read scheme index {path}: {e}")
+            return None
+        if payload.get("artifact_version") != ARTIFACT_VERSION:
+            return None
+        index = payload.get("index")
+        if dataset_version and getattr(index, "dataset_version", None) != dataset_version:
+            return None
+        print(f"[INFO] Loaded scheme index from {path}")
+        return index
+
+    @classmethod
+    def load_or_build(cls, csv_path: str, artifact_path: str = None) -> "SchemeIndex":
+        dataset_version = file_fingerprint(csv_path)
+        index = cls.load(artifact_path, dataset_version) if artifact_path else None
+        if index is None:
+            index = cls.build(csv_path, dataset_version)
+            if artifact_path:
+                try:
+                    index.save(artifact_path)
+                except Exception as e:
+                    print(f"[WARN] Could not save scheme index {artifact_path}: {e}")
+        return index
+
+
+class SchemeIndexManager:
+    """
+    Holds the live SchemeIndex and hot-swaps it when the CSV changes.
+
+    `current()` is cheap: at most once per `check_interval` seconds it stats
+    the CSV, and if mtime/size moved and the content hash differs it starts a
+    background rebuild. Requests keep using the old index until the new one
+    is ready; the swap is a single reference assignment.
+    """
+
+    def __init__(self, csv_path: str, artifact_path: str = None, check_interval: float = 30.0):
+        self.csv_path = csv_path
+        self.artifact_path = artifact_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._last_check = time.monotonic()
+        self._stat = self._stat_csv()
+        self.index = SchemeIndex.load_or_build(csv_path, artifact_path)
+
+    def _stat_csv(self):
+        try:
+            st = os.stat(self.csv_path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def current(self) -> SchemeIndex:
+        if self.check_interval is not None and time.monotonic() - self._last_check >= self.check_interval:
+            self.check_for_update()
+        return self.index
+
+    def check_for_update(self, background: bool = True) -> bool:
+        """Start (or run) a rebuild if the CSV changed. Returns True if a reload was triggered."""
+        with self._lock:
+            self._last_check = time.monotonic()
+            stat = self._stat_csv()
+            if stat is None or stat == self._stat or self._reloading:
+                return False
+            self._stat = stat
+            self._reloading = True
+        if background:
+            threading.Thread(target=self._reload, daemon=True).start()
+        else:
+            self._reload()
+        return True
+
+    def _reload(self):
+        try:
+            dataset_version = file_fingerprint(self.csv_path)
+            if dataset_version == self.index.dataset_version:
+                return
+            index = SchemeIndex.build(self.csv_path, dataset_version)
+            self.index = index
+            print(f"[INFO] Scheme index reloaded (version {dataset_version[:12]})")
+        except Exception as e:
+            print(f"[ERROR] Scheme index reload failed: {e}")
+            with self._lock:
+                self._stat = None  # retry on the next check
+        else:
+            # Best effort: a failed save must not undo the swap or force a rebuild
+            if self.artifact_path:
+                try:
+                    index.save(self.artifact_path)
+                except Exception as e:
+                    print(f"[WARN] Scheme index artifact not saved: {e}")
+        finally:
+            with self._lock:
+                self._reloading = False
@@ -0,0 +1,71 @@
+import base64
+import json
+import numpy as np
+
+
+def encode_cursor(crop: str, state: str, offset: int) -> str:
+    raw = json.dumps({"c": crop, "s": state, "o": int(offset)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, crop: str, state: str) -> int:
+    """Return the ranking offset stored in a cursor; raises ValueError if it is invalid for this query."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        offset = int(data["o"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if data.get("c") != crop or data.get("s") != state or offset < 0:
+        raise ValueError("Cursor does not belong to this crop/state")
+    return offset
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first, with the same tie order as a
+    stable descending sort (lowest index first) but without sorting everything.
+    """
+    n = len(scores)
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+    threshold = scores[np.argpartition(-scores, k - 1)[:k]].min()
+    candidates = np.flatnonzero(scores >= threshold)
+    return candidates[np.argsort(-scores[candidates], kind="stable")][:k]
+
+
+class SchemeRanking:
+    """
+    Full ranked ordering of the scheme table for one (crop, state) pair.
+
+    Built from a single scoring pass; paging and "next best" lookups only
+    walk the precomputed order, so they never rescan or copy the table.
+    """
+
+    def __init__(self, crop: str, state: str, scores: np.ndarray, name_keys: np.ndarray):
+        self.crop = crop
+        self.state = state
+        self.scores = scores
+        # Stable sort keeps the lowest row index first on ties, same as argmax
+        self.order = np.argsort(-scores, kind="stable").astype(np.int32)
+        self.name_keys = name_keys
+
+    def __len__(self):
+        return len(self.order)
+
+    def page(self, k: int = 1, offset: int = 0, exclude=None):
+        """
+        Return (row indices, next offset) for up to k schemes starting at
+        `offset` in the ranking, skipping any whose normalized name is in
+        `exclude`. The next offset is None once the ranking is exhausted.
+        """
+        exclude = exclude or ()
+        picked = []
+        pos = offset
+        while pos < len(self.order) and len(picked) < k:
+            idx = int(self.order[pos])
+            pos += 1
+            if self.name_keys[idx] in exclude:
+                continue
+            picked.append(idx)
+        next_offset = pos if pos < len(self.order) else None
+        return picked, next_offset
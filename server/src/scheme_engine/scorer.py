@@ -0,0 +1,118 @@
+import re
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+# Same notion of a "word" as the \b...\b patterns used by engine.word_in
+TOKEN_PATTERN = r"(?u)\b\w+\b"
+_SINGLE_TOKEN = re.compile(r"\w+")
+
+
+class SchemeScorer:
+    """
+    Vectorized version of the recommend_scheme_single scoring formula.
+
+    The scheme table is tokenized once into binary document-term matrices
+    (name, tags, description), the state_ministry column is factorized into
+    its distinct values, and the keyword boost - which does not depend on
+    the request - is precomputed per row. Scoring a (crop, state) pair is
+    then a few sparse column lookups plus NumPy arithmetic.
+    """
+
+    def __init__(self, df: pd.DataFrame, important_keywords, vectorizer, tfidf_matrix):
+        self.df = df
+        self.vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix
+
+        self.names = df["scheme_name"].str.lower().to_numpy()
+        self.tags = df["tags"].str.lower().to_numpy()
+        self.descriptions = df["description"].str.lower().to_numpy()
+        # Normalized names, used to match "already shown" exclusion lists
+        self.name_keys = df["scheme_name"].str.lower().str.strip().to_numpy()
+
+        # --------------- TERM MATRICES ---------------
+        self.term_vectorizer = CountVectorizer(token_pattern=TOKEN_PATTERN, binary=True)
+        self.term_vectorizer.fit(np.concatenate([self.names, self.tags, self.descriptions]))
+        self.vocab = self.term_vectorizer.vocabulary_
+        # CSC so that "which rows contain term t" is a single column slice
+        self.name_terms = self.term_vectorizer.transform(self.names).tocsc()
+        self.tag_terms = self.term_vectorizer.transform(self.tags).tocsc()
+        self.desc_terms = self.term_vectorizer.transform(self.descriptions).tocsc()
+
+        # --------------- STATE / MINISTRY ---------------
+        codes, uniques = pd.factorize(df["state_ministry"].str.lower())
+        self.sm_codes = codes
+        self.sm_uniques = [str(u) for u in uniques]
+        central = np.array(
+            ["ministry of" in sm or "government of india" in sm for sm in self.sm_uniques],
+            dtype=bool,
+        )
+        self.sm_base = np.where(central, 3000.0, -8000.0)
+
+        # --------------- KEYWORD BOOST ---------------
+        self.important_keywords = list(important_keywords)
+        self.keyword_boost = self._keyword_boost()
+
+    def _keyword_boost(self) -> np.ndarray:
+        boost = np.zeros(len(self.df))
+        for key in self.important_keywords:
+            hit = self._word_hits(self.tags, key) | self._word_hits(self.descriptions, key)
+            boost += hit * 5.0
+        return boost
+
+    def _word_hits(self, texts: np.ndarray, word: str) -> np.ndarray:
+        """Regex fallback for words that are not a single token (e.g. 'crop insurance')."""
+        pattern = re.compile(r"\b" + re.escape(word.lower()) + r"\b")
+        return np.fromiter((pattern.search(t) is not None for t in texts), dtype=bool, count=len(texts))
+
+    def _term_hits(self, matrix, texts: np.ndarray, word: str) -> np.ndarray:
+        if _SINGLE_TOKEN.fullmatch(word):
+            col = self.vocab.get(word)
+            hits = np.zeros(len(texts), dtype=bool)
+            if col is not None:
+                hits[matrix.indices[matrix.indptr[col]:matrix.indptr[col + 1]]] = True
+            return hits
+        return self._word_hits(texts, word)
+
+    def state_scores(self, state: str) -> np.ndarray:
+        per_unique = np.array(
+            [10000.0 if state in sm else base for sm, base in zip(self.sm_uniques, self.sm_base)]
+        )
+        return per_unique[self.sm_codes]
+
+    def crop_scores(self, crop: str) -> np.ndarray:
+        scores = self._term_hits(self.name_terms, self.names, crop) * 500.0
+        scores = scores + self._term_hits(self.tag_terms, self.tags, crop) * 300.0
+        scores = scores + self._term_hits(self.desc_terms, self.descriptions, crop) * 150.0
+        return scores
+
+    @staticmethod
+    def user_query(crop: str, state: str) -> str:
+        return f"{crop} farmer in {state} looking for schemes"
+
+    def ml_scores(self, crop: str, state: str) -> np.ndarray:
+        qvec = self.vectorizer.transform([self.user_query(crop, state)])
+        return cosine_similarity(qvec, self.tfidf_matrix).flatten()
+
+    def score(self, crop: str, state: str) -> np.ndarray:
+        """Scores for every scheme row; crop and state must already be lowercased/stripped."""
+        scores = self.state_scores(state) + self.crop_scores(crop)
+        scores = scores + self.keyword_boost
+        scores = scores + self.ml_scores(crop, state) * 100
+        return scores
+
+    def score_batch(self, crops, states) -> np.ndarray:
+        """
+        Score many (crop, state) pairs at once: one vectorizer.transform call
+        and one sparse product against tfidf_matrix. Returns an array of shape
+        (n_pairs, n_schemes) with the same values score() would give per row.
+        """
+        qmat = self.vectorizer.transform([self.user_query(c, s) for c, s in zip(crops, states)])
+        ml = cosine_similarity(qmat, self.tfidf_matrix)
+
+        # Farmers in a batch share a handful of states/crops; score each once
+        state_rows = {s: self.state_scores(s) for s in set(states)}
+        crop_rows = {c: self.crop_scores(c) for c in set(crops)}
+        base = np.vstack([state_rows[s] + crop_rows[c] for c, s in zip(crops, states)])
+        return base + self.keyword_boost + ml * 100
@@ -2,11 +2,15 @@
 import os
 import time
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer, util
 from langchain_groq import ChatGroq
 
 from src.vectorstore import FaissVectorStore
-from src.utils import AGRI_REFERENCE_TEXTS
+from src.answer_cache import SemanticAnswerCache
+from src.classification_cache import classification_key, make_classification_cache
+from src.model_registry import models
+from src.reference_bank import ReferenceBank
+from src.summarizer import ChunkSummarizer
+from src.utils import AGRI_REFERENCE_BANKS
 
 load_dotenv()
 
@@ -37,6 +41,16 @@ class RAGSearch:
         self.llm = ChatGroq(groq_api_key=self.groq_api_key, model_name=self.llm_model_name)
         print(f"[INFO] Groq LLM initialized: {llm_model_name}")
 
+        # auto: chunks that fit RAG_SINGLE_CALL_TOKENS go straight into the
+        # final prompt; otherwise they are summarized concurrently first
+        self.summarizer = ChunkSummarizer(
+            self.llm,
+            mode=os.getenv("RAG_SUMMARY_MODE", "auto"),
+            workers=int(os.getenv("RAG_SUMMARY_WORKERS", "8")),
+            timeout=float(os.getenv("RAG_SUMMARY_TIMEOUT", "8")),
+            token_budget=int(os.getenv("RAG_SINGLE_CALL_TOKENS", "3000")),
+        )
+
         # --------------- VECTOR STORE ---------------
         if vector_store is not None:
             self.vectorstore = vector_store
@@ -57,10 +71,39 @@ class RAGSearch:
 
         # --------------- CLASSIFIER SETUP ---------------
         print("[INFO] Loading local embedding classifier model (for semantic agri check)...")
-        self.classifier_model = SentenceTransformer(embedding_classifier_name)
+        # Shared with the vector store when both use the same model
+        self.classifier_model = models.acquire(embedding_classifier_name)
+        self.classifier_model_name = embedding_classifier_name
+
+        # Reference phrases are constant: encode them once and keep them
+        # next to the FAISS index, so warm starts skip the encode entirely
+        bank_dir = getattr(self.vectorstore, "persist_dir", persist_dir)
+        os.makedirs(bank_dir, exist_ok=True)
+        self.reference_bank = ReferenceBank(
+            lambda texts: self.classifier_model.encode(texts, batch_size=64, normalize_embeddings=True),
+            embedding_classifier_name,
+            os.path.join(bank_dir, "agri_reference.npz"),
+        )
+        for name, texts in AGRI_REFERENCE_BANKS.items():
+            self.reference_bank.set_bank(name, texts)
+        print(f"[INFO] Reference bank ready: {self.reference_bank.stats()['banks']} "
+              f"({self.reference_bank.encoded} phrases encoded)")
+
+        # Final answers keyed by question embedding; similar rewordings are hits
+        self.answer_cache = SemanticAnswerCache(
+            threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92")),
+            ttl=float(os.getenv("ANSWER_CACHE_TTL", "86400")),
+            max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "1000")),
+        )
 
-        # Cache for classification results
-        self.class_cache = {}
+        # Cache for classification results: bounded LRU + TTL; the sqlite
+        # backend is one file shared by every worker on the host
+        self.class_cache = make_classification_cache(
+            os.getenv("CLASS_CACHE_BACKEND", "memory"),
+            path=os.getenv("CLASS_CACHE_PATH", os.path.join(os.getcwd(), "classification_cache.sqlite3")),
+            max_entries=int(os.getenv("CLASS_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("CLASS_CACHE_TTL", str(7 * 86400))),
+        )
 
         # Similarity thresholds (tunable)
         self.high_threshold = 0.40
@@ -80,14 +123,15 @@ class RAGSearch:
         q = query.lower()
         return any(kw in q for kw in self.quick_positive_keywords)
 
-    def _embedding_similarity_check(self, query: str) -> float:
+    def _embedding_similarity_check(self, query: str, q_emb=None) -> float:
         """
         Compute cosine similarity between query and agriculture reference topics.
+        Only the query is encoded (unless `q_emb` already holds it); the
+        references come from the precomputed bank.
         """
-        q_emb = self.classifier_model.encode(query, convert_to_tensor=True)
-        ref_embs = self.classifier_model.encode(AGRI_REFERENCE_TEXTS, convert_to_tensor=True)
-        scores = util.cos_sim(q_emb, ref_embs)
-        return float(scores.max().item())
+        if q_emb is None:
+            q_emb = self.classifier_model.encode(query, normalize_embeddings=True)
+        return self.reference_bank.max_similarity(q_emb)
 
     def _llm_classify_agriculture(self, query: str) -> bool:
         """
@@ -106,40 +150,45 @@ class RAGSearch:
             print(f"[WARN] LLM classifier failed: {e}")
             return True  # assume True to avoid false rejection
 
-    def is_agriculture_query(self, query: str, chat_context: str = "") -> bool:
+    def is_agriculture_query(self, query: str, chat_context: str = "", q_emb=None) -> bool:
         """
         Hybrid agriculture detector with context awareness.
         Uses query + recent chat context for better classification.
+        `q_emb` is the query's embedding if the caller already has it; it is
+        only used when there is no chat context to encode with it.
         """
         q_key = query.lower().strip()
         combined_text = (chat_context + " " + q_key).lower()
 
         # ✅ If previous messages were about agriculture, continue that context
+        # (keyword checks are cheaper than a cache lookup, so they are not cached)
         if any(kw in combined_text for kw in self.quick_positive_keywords):
-            self.class_cache[q_key] = True
             return True
 
         # ✅ If context itself contains agri content, assume this query continues it
         if any(kw in chat_context.lower() for kw in self.quick_positive_keywords):
-            self.class_cache[q_key] = True
             return True
 
         # Check cache
-        if q_key in self.class_cache:
-            return self.class_cache[q_key]
+        cache_key = classification_key(query, chat_context)
+        cached = self.class_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         # Embedding similarity check using combined text
-        max_sim = self._embedding_similarity_check(combined_text)
+        max_sim = self._embedding_similarity_check(
+            combined_text, q_emb=q_emb if not chat_context.strip() else None
+        )
         if max_sim >= self.high_threshold:
-            self.class_cache[q_key] = True
+            self.class_cache.put(cache_key, True)
             return True
         if max_sim <= self.low_threshold:
-            self.class_cache[q_key] = False
+            self.class_cache.put(cache_key, False)
             return False
 
         # Ambiguous case → LLM classification fallback
         is_agri = self._llm_classify_agriculture(query)
-        self.class_cache[q_key] = is_agri
+        self.class_cache.put(cache_key, is_agri)
         return is_agri
 
     # -----------------------------------------------------
@@ -150,18 +199,54 @@ class RAGSearch:
         Full RAG pipeline with chat context awareness.
         If chat_context (previous conversation) is provided, it’s included in prompt.
         """
+        reply = ""
+        for event, data in self.stream_answer(query, top_k=top_k, chat_context=chat_context):
+            if event == "done":
+                reply = data["reply"]
+        return reply
+
+    def stream_answer(self, query: str, top_k: int = 5, chat_context: str = ""):
+        """
+        Same pipeline as search_and_summarize, as a generator of (event, data):
+          ("status", {"stage": "classifying" | "retrieving" | "summarizing" | "answering", ...})
+          ("token", {"text": ...})   pieces of the final answer as the LLM streams them
+          ("done", {"reply": ...})   the full answer
+        Questions close enough to an earlier one (without chat context, which
+        changes the answer) are answered from the semantic answer cache.
+        """
 
         print(f"[INFO] Received query: '{query}'")
 
+        # STEP 0: Semantic answer cache
+        q_emb = None
+        if not chat_context.strip():
+            self.answer_cache.check_generation(getattr(self.vectorstore, "generation", None))
+            q_emb = self.classifier_model.encode(query.lower().strip(), normalize_embeddings=True)
+            cached = self.answer_cache.get(q_emb)
+            if cached is not None:
+                print("[INFO] Answered from semantic cache")
+                yield "status", {"stage": "cached"}
+                yield "token", {"text": cached}
+                yield "done", {"reply": cached, "cached": True}
+                return
+
         # STEP 1: Check if agriculture-related
-        if not self.is_agriculture_query(query, chat_context=chat_context):
-            return (
+        yield "status", {"stage": "classifying"}
+        # Without chat context the classifier encodes the same text as STEP 0
+        if not self.is_agriculture_query(query, chat_context=chat_context, q_emb=q_emb):
+            reply = (
                 "This assistant specializes in agricultural and farm-related topics only. "
                 "Please ask questions about crops, soil, weather, fertilizers, or other farming-related subjects."
             )
+            # Not cached: the cache holds real answers only, and a misclassified
+            # question must be able to get one on the next try
+            yield "token", {"text": reply}
+            yield "done", {"reply": reply}
+            return
 
         # STEP 2: FAISS Retrieval
         print("[INFO] Classified as agriculture query. Searching FAISS index...")
+        yield "status", {"stage": "retrieving"}
         start = time.time()
         results = self.vectorstore.query(query, top_k=top_k)
         print(f"[DEBUG] FAISS search took {time.time() - start:.2f}s, retrieved {len(results)} docs.")
@@ -171,24 +256,13 @@ class RAGSearch:
 
         # STEP 3: RAG Mode (Data Found)
         if texts:
-            chunk_summaries = []
-            for i, chunk in enumerate(texts):
-                sub_prompt = (
-                    f"You are an agricultural summarizer.\n"
-                    f"User Question: {query}\n\n"
-                    f"Relevant Text Chunk:\n{chunk}\n\n"
-                    "Summarize this chunk in 1–2 concise sentences focusing on relevant details."
-                )
-                try:
-                    resp = self.llm.invoke([sub_prompt])
-                    summary = resp.content.strip()
-                    if summary:
-                        chunk_summaries.append(summary)
-                except Exception as e:
-                    print(f"[WARN] Chunk summarization failed for chunk {i}: {e}")
-
-            combined_summary = "\n".join(chunk_summaries)
-            final_prompt = (
+            yield "status", {"stage": "summarizing", "documents": len(texts)}
+            start = time.time()
+            combined_summary, mode = self.summarizer.context(query, texts)
+            llm_calls = 1 + (len(texts) if mode == "map" else 0)
+            print(f"[DEBUG] Context for {len(texts)} chunks built in {time.time() - start:.2f}s ({mode} mode)")
+
+            prompt = (
                 "You are an expert agricultural assistant.\n"
                 "Your job is to answer using ONLY the information from the conversation and retrieved context.\n"
                 "Do NOT add any disclaimers such as checking other sources, websites, portals, or external updates.\n"
@@ -196,28 +270,43 @@ class RAGSearch:
                 "If the user asks for detailed or long explanation, provide 4–6 sentences.\n"
                 "Otherwise, ALWAYS give a short, precise answer of 1–2 sentences.\n\n"
                 f"Conversation History:\n{chat_context}\n\n"
-                f"Retrieved Context Summaries:\n{combined_summary}\n\n"
+                f"Retrieved Context:\n{combined_summary}\n\n"
                 f"User Question: {query}\n\n"
                 "Now produce the final answer following the rules above:"
             )
-            try:
-                final_resp = self.llm.invoke([final_prompt])
-                return final_resp.content.strip()
-            except Exception as e:
-                print(f"[ERROR] Final summarization failed: {e}")
-                return "Error generating final summary from data."
-
-        # STEP 4: General Knowledge Fallback
-        print("[INFO] No relevant FAISS documents found. Using general agricultural knowledge.")
-        fallback_prompt = (
-            "You are an agricultural expert assistant. Use your own knowledge and previous conversation to answer.\n\n"
-            f"Previous conversation:\n{chat_context}\n\n"
-            f"User Question: {query}\n\n"
-            "Answer helpfully in 3–5 sentences:"
-        )
+            error_reply = "Error generating final summary from data."
+        else:
+            # STEP 4: General Knowledge Fallback
+            print("[INFO] No relevant FAISS documents found. Using general agricultural knowledge.")
+            prompt = (
+                "You are an agricultural expert assistant. Use your own knowledge and previous conversation to answer.\n\n"
+                f"Previous conversation:\n{chat_context}\n\n"
+                f"User Question: {query}\n\n"
+                "Answer helpfully in 3–5 sentences:"
+            )
+            error_reply = "Sorry, I couldn’t generate an answer right now."
+            llm_calls = 1
+
+        yield "status", {"stage": "answering"}
+        for event, data in self._stream_llm(prompt, error_reply):
+            if event == "done" and q_emb is not None and data["reply"] and not data.get("incomplete"):
+                self.answer_cache.put(query, q_emb, data["reply"], llm_calls)
+            yield event, data
+
+    def _stream_llm(self, prompt: str, error_reply: str):
+        """Stream the final LLM answer token by token; on failure send error_reply instead."""
+        parts = []
         try:
-            fallback_resp = self.llm.invoke([fallback_prompt])
-            return fallback_resp.content.strip()
+            for chunk in self.llm.stream([prompt]):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield "token", {"text": chunk.content}
         except Exception as e:
-            print(f"[ERROR] General fallback failed: {e}")
-            return "Sorry, I couldn’t generate an answer right now."
+            print(f"[ERROR] Final answer generation failed: {e}")
+            if not parts:
+                yield "token", {"text": error_reply}
+                yield "done", {"reply": error_reply, "incomplete": True}
+                return
+            yield "done", {"reply": "".join(parts).strip(), "incomplete": True}
+            return
+        yield "done", {"reply": "".join(parts).strip()}
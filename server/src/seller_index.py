@@ -0,0 +1,470 @@
+import re
+import math
+import time
+import threading
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+from src.commodity_index import CommodityIndex
+from src.scheme_engine.ranking import top_k_indices
+
+
+def preprocess_text_for_bm25(text):
+    t = str(text or "").lower()
+    t = re.sub(r'[^a-z0-9\s]', ' ', t)
+    tokens = [tok for tok in t.split() if tok]
+    return tokens
+
+
+def seller_from_user_doc(s: dict) -> dict:
+    """Flatten a `users` document with role=seller into the record used for ranking."""
+    seller = {}
+    seller['_id'] = s.get("_id")
+    seller['fpcName'] = s.get("fpcName") or s.get("fpc_name") or s.get("_id")
+    seller['district'] = s.get("district", "")
+    comms = s.get("commodities", [])
+    if isinstance(comms, list):
+        commodities_str = ", ".join([str(x) for x in comms if x])
+    else:
+        commodities_str = str(comms)
+    seller['commodities'] = commodities_str
+    seller['address'] = s.get("address", "") or s.get("Address", "")
+    seller['contact_phone'] = s.get("contact_phone", "") or s.get("Contact_Phone", "")
+    try:
+        # Handle rating as string or number
+        rating_value = s.get("rating") or s.get("Rating") or 5
+        seller['rating'] = float(rating_value) if rating_value is not None else 5.0
+    except Exception:
+        seller['rating'] = 5.0
+    try:
+        # Check for experience field (as stored in MongoDB) or years_of_experience
+        exp_value = s.get("experience") or s.get("years_of_experience") or s.get("Years_of_Experience") or 5
+        seller['years_of_experience'] = float(exp_value) if exp_value is not None else 5.0
+    except Exception:
+        seller['years_of_experience'] = 5.0
+    return seller
+
+
+def district_similarity_score(farmer_district, seller_district):
+    farmer_district = str(farmer_district or "").lower().strip()
+    seller_district = str(seller_district or "").lower().strip()
+    if not farmer_district or not seller_district:
+        return 0.3
+    if farmer_district == seller_district:
+        return 1.0
+    if farmer_district in seller_district or seller_district in farmer_district:
+        return 0.7
+    return 0.3
+
+
+def normalize_array(values: np.ndarray) -> np.ndarray:
+    """Min-max scale to [0, 1]; all-equal input maps to 0.5."""
+    lo, hi = values.min(), values.max()
+    if hi == lo:
+        return np.full(len(values), 0.5)
+    return (values - lo) / (hi - lo)
+
+
+# Weights of the /api/recommend score
+WEIGHT_RATING = 0.40
+WEIGHT_DISTRICT = 0.25
+WEIGHT_COMMODITY = 0.20
+WEIGHT_EXPERIENCE = 0.10
+WEIGHT_BM25 = 0.05
+
+
+def seller_doc_tokens(seller: dict):
+    doc_text = f"{seller['fpcName']} {seller['district']} {seller['commodities']} {seller['address']}"
+    return preprocess_text_for_bm25(doc_text)
+
+
+class IncrementalBM25:
+    """
+    BM25Okapi (same k1/b/epsilon and idf floor as rank_bm25) over a corpus
+    that can gain and lose documents without a rebuild.
+
+    Documents live in integer slots; postings map term -> {slot: tf}, so a
+    query only touches the slots that contain its terms.
+    """
+
+    def __init__(self, k1=1.5, b=0.75, epsilon=0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.postings = {}
+        self.doc_len = np.zeros(0)
+        self.doc_terms = {}
+        self.corpus_size = 0
+        self.total_len = 0
+        self._average_idf = None
+
+    def _ensure_capacity(self, slot):
+        if slot >= len(self.doc_len):
+            grown = np.zeros(max(slot + 1, 2 * len(self.doc_len), 16))
+            grown[:len(self.doc_len)] = self.doc_len
+            self.doc_len = grown
+
+    def add(self, slot: int, tokens):
+        if slot in self.doc_terms:
+            self.remove(slot)
+        self._ensure_capacity(slot)
+        tf = Counter(tokens)
+        for term, freq in tf.items():
+            self.postings.setdefault(term, {})[slot] = freq
+        self.doc_terms[slot] = list(tf)
+        self.doc_len[slot] = len(tokens)
+        self.corpus_size += 1
+        self.total_len += len(tokens)
+        self._average_idf = None
+
+    def remove(self, slot: int):
+        terms = self.doc_terms.pop(slot, None)
+        if terms is None:
+            return
+        for term in terms:
+            plist = self.postings.get(term)
+            if plist is not None:
+                plist.pop(slot, None)
+                if not plist:
+                    del self.postings[term]
+        self.corpus_size -= 1
+        self.total_len -= int(self.doc_len[slot])
+        self.doc_len[slot] = 0
+        self._average_idf = None
+
+    def _raw_idf(self, n: int) -> float:
+        return math.log(self.corpus_size - n + 0.5) - math.log(n + 0.5)
+
+    def idf(self, term: str) -> float:
+        plist = self.postings.get(term)
+        if not plist:
+            return 0.0
+        idf = self._raw_idf(len(plist))
+        if idf < 0:
+            if self._average_idf is None:
+                total = sum(self._raw_idf(len(p)) for p in self.postings.values())
+                self._average_idf = total / len(self.postings)
+            idf = self.epsilon * self._average_idf
+        return idf
+
+    def get_scores(self, query, n_slots: int) -> np.ndarray:
+        scores = np.zeros(n_slots)
+        if not self.corpus_size:
+            return scores
+        avgdl = self.total_len / self.corpus_size
+        for q in query:
+            plist = self.postings.get(q)
+            if not plist:
+                continue
+            idf = self.idf(q)
+            slots = np.fromiter(plist.keys(), dtype=np.int64, count=len(plist))
+            q_freq = np.fromiter(plist.values(), dtype=float, count=len(plist))
+            doc_len = self.doc_len[slots]
+            scores[slots] += idf * (q_freq * (self.k1 + 1) /
+                                    (q_freq + self.k1 * (1 - self.b + self.b * doc_len / avgdl)))
+        return scores
+
+
+class SellerIndex:
+    """
+    Long-lived index of seller (FPC) records plus their BM25 statistics.
+
+    Replaces rebuilding everything from Mongo on each /api/recommend call.
+    Kept current by upsert()/remove() hooks and SellerIndexSync; rebuild()
+    reloads everything from `load_sellers` as a fallback.
+
+    Ranking inputs are also held column-wise, indexed by slot (rating,
+    experience, district code), with commodities in an inverted index, so
+    rank() scores every candidate in a few NumPy expressions.
+    """
+
+    def __init__(self, load_sellers, districts=None):
+        self.load_sellers = load_sellers
+        self.districts = districts
+        self._lock = threading.RLock()
+        self._reset()
+        self.built = False
+        self.last_rebuild = None
+        self.last_sync = None
+        self.updates_applied = 0
+
+    def _reset(self):
+        self._slots = []
+        self._slot_of = {}
+        self._free = []
+        self._bm25 = IncrementalBM25()
+        self._active = np.zeros(0, dtype=bool)
+        self._rating = np.zeros(0)
+        self._experience = np.zeros(0)
+        self._district_code = np.zeros(0, dtype=np.int32)
+        self._districts = []
+        self._district_ids = {}
+        self._district_refs = []
+        self._commodity_index = CommodityIndex()
+
+    def _ensure_capacity(self, slot: int):
+        if slot < len(self._active):
+            return
+        cap = max(slot + 1, 2 * len(self._active), 16)
+        for name in ("_active", "_rating", "_experience", "_district_code"):
+            old = getattr(self, name)
+            grown = np.zeros(cap, dtype=old.dtype)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+    def _district_id(self, district) -> int:
+        key = str(district or "").lower().strip()
+        code = self._district_ids.get(key)
+        if code is None:
+            code = len(self._districts)
+            self._districts.append(key)
+            self._district_ids[key] = code
+            ref = self.districts.lookup(key) if self.districts is not None else None
+            self._district_refs.append(-1 if ref is None else ref)
+        return code
+
+    def rebuild(self):
+        docs = list(self.load_sellers())
+        with self._lock:
+            self._reset()
+            for doc in docs:
+                self._upsert(doc)
+            self.built = True
+            self.last_rebuild = self.last_sync = time.time()
+        print(f"[INFO] Seller index rebuilt with {len(self._slot_of)} sellers")
+
+    def ensure_built(self):
+        if not self.built:
+            with self._lock:
+                if not self.built:
+                    self.rebuild()
+
+    def _upsert(self, user_doc: dict):
+        seller = seller_from_user_doc(user_doc)
+        seller_id = seller["_id"]
+        slot = self._slot_of.get(seller_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = len(self._slots)
+                self._slots.append(None)
+            self._slot_of[seller_id] = slot
+        self._slots[slot] = seller
+        self._bm25.add(slot, seller_doc_tokens(seller))
+
+        self._ensure_capacity(slot)
+        self._active[slot] = True
+        self._rating[slot] = seller["rating"]
+        self._experience[slot] = seller["years_of_experience"]
+        self._district_code[slot] = self._district_id(seller["district"])
+        self._commodity_index.add(slot, user_doc.get("commodities", []))
+
+    def upsert(self, user_doc: dict):
+        with self._lock:
+            self._upsert(user_doc)
+            self.updates_applied += 1
+
+    def remove(self, seller_id):
+        with self._lock:
+            slot = self._slot_of.pop(seller_id, None)
+            if slot is None:
+                return
+            self._slots[slot] = None
+            self._bm25.remove(slot)
+            self._active[slot] = False
+            self._commodity_index.remove(slot)
+            self._free.append(slot)
+            self.updates_applied += 1
+
+    def mark_synced(self):
+        self.last_sync = time.time()
+
+    def seller_ids_for_commodities(self, crops):
+        """Ids of sellers dealing in at least one of `crops` (list or comma-separated)."""
+        self.ensure_built()
+        with self._lock:
+            return [self._slots[slot]["_id"] for slot in self._commodity_index.slots_for(crops)]
+
+    def _district_scores(self, district_input: str, farmer_district_id=None) -> np.ndarray:
+        """
+        District score for every known seller district code. Uses the
+        reference table's distance decay when both sides resolve to a
+        district id, and the old string comparison otherwise.
+        """
+        if farmer_district_id is None and self.districts is not None:
+            farmer_district_id = self.districts.lookup(district_input)
+        refs = np.array(self._district_refs, dtype=np.int64)
+        scores = np.empty(len(refs))
+        known = refs >= 0
+        if farmer_district_id is not None:
+            scores[known] = self.districts.proximity[farmer_district_id, refs[known]]
+        else:
+            known[:] = False
+        for code in np.flatnonzero(~known):
+            scores[code] = district_similarity_score(district_input, self._districts[code])
+        return scores
+
+    def rank(self, crop_input: str, district_input: str = "", state_input: str = "",
+             limit: int = 20, offset: int = 0, farmer_district_id=None):
+        """
+        Weighted seller ranking: rating 40%, district 25%, commodity 20%,
+        experience 10%, BM25 5%. Rating/experience/BM25 are normalized over
+        the sellers that pass the commodity filter. `farmer_district_id`
+        (from the district table) overrides the district name for proximity.
+
+        Returns (page of output records, total number of matched sellers).
+        """
+        self.ensure_built()
+        query = f"{crop_input} {district_input} {state_input}".strip()
+        tokens = preprocess_text_for_bm25(query)
+
+        with self._lock:
+            n = len(self._slots)
+            if not n:
+                return [], 0
+            active = self._active[:n]
+
+            # Commodity filter + match fraction from posting-list counts
+            counts, n_crops = self._commodity_index.match_counts(crop_input, n)
+            if n_crops:
+                matched = active & (counts > 0)
+                commodity = np.minimum(counts / n_crops, 1.0)
+            else:
+                matched = active
+                commodity = np.full(n, 0.5)
+
+            candidates = np.flatnonzero(matched)
+            if not candidates.size:
+                return [], 0
+
+            bm25 = self._bm25.get_scores(tokens, n)[candidates]
+            max_bm25 = bm25.max() if bm25.max() > 0 else 1.0
+            district_table = self._district_scores(district_input, farmer_district_id)
+
+            final = (
+                normalize_array(self._rating[candidates]) * WEIGHT_RATING +
+                district_table[self._district_code[candidates]] * WEIGHT_DISTRICT +
+                commodity[candidates] * WEIGHT_COMMODITY +
+                normalize_array(self._experience[candidates]) * WEIGHT_EXPERIENCE +
+                (bm25 / max_bm25) * WEIGHT_BM25
+            )
+
+            top = top_k_indices(final, offset + limit)[offset:]
+            page = [self._output_record(self._slots[candidates[pos]], final[pos]) for pos in top]
+            return page, int(candidates.size)
+
+    @staticmethod
+    def _output_record(seller: dict, final_score: float) -> dict:
+        return {
+            "FPC_Name": seller.get("fpcName", seller.get("_id", "")),
+            "District": seller.get("district", ""),
+            "Commodities": seller.get("commodities", ""),
+            "Rating": seller.get("rating", 5.0),
+            "Years_of_Experience": seller.get("years_of_experience", 5.0),
+            "Contact_Phone": seller.get("contact_phone", ""),
+            "Address": seller.get("address", ""),
+            "match_percentage": round(float(final_score) * 100, 1),
+            "fpc_id": seller.get("_id", ""),
+        }
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "sellers": len(self),
+            "built": self.built,
+            "updates_applied": self.updates_applied,
+            "last_rebuild": self.last_rebuild,
+            "last_sync": self.last_sync,
+            "staleness_seconds": (now - self.last_sync) if self.last_sync else None,
+        }
+
+
+class SellerIndexSync(threading.Thread):
+    """
+    Background feed that keeps a SellerIndex current.
+
+    Tries a Mongo change stream first (needs a replica set); on a standalone
+    server or mongomock it falls back to polling `updated_at`. Either way a
+    full rebuild runs every `rebuild_interval` seconds to pick up deletes and
+    documents written without `updated_at`.
+    """
+
+    def __init__(self, index: SellerIndex, collection, seller_query: dict,
+                 poll_interval: float = 10.0, rebuild_interval: float = 600.0):
+        super().__init__(daemon=True)
+        self.index = index
+        self.collection = collection
+        self.seller_query = seller_query
+        self.poll_interval = poll_interval
+        self.rebuild_interval = rebuild_interval
+        self.mode = None
+        self._stop_event = threading.Event()
+        self._last_seen = None
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        try:
+            self._watch()
+        except Exception as e:
+            print(f"[INFO] Seller change stream unavailable ({e}); polling every {self.poll_interval}s")
+        self._poll_loop()
+
+    def _watch(self):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        last_rebuild = time.time()
+        with self.collection.watch(pipeline, full_document="updateLookup", max_await_time_ms=1000) as stream:
+            self.mode = "change_stream"
+            while not self._stop_event.is_set():
+                change = stream.try_next()
+                if change is not None:
+                    self._apply_change(change)
+                self.index.mark_synced()
+                if time.time() - last_rebuild >= self.rebuild_interval:
+                    self.index.rebuild()
+                    last_rebuild = time.time()
+
+    def _apply_change(self, change: dict):
+        if change.get("operationType") == "delete":
+            self.index.remove(change.get("documentKey", {}).get("_id"))
+            return
+        doc = change.get("fullDocument")
+        if not doc:
+            return
+        if str(doc.get("role", "")).lower() == "seller":
+            self.index.upsert(doc)
+        else:
+            self.index.remove(doc.get("_id"))
+
+    def poll_once(self):
+        query = dict(self.seller_query)
+        if self._last_seen is not None:
+            query["updated_at"] = {"$gte": self._last_seen}
+        else:
+            query["updated_at"] = {"$exists": True}
+        for doc in self.collection.find(query, {"password": 0}):
+            self.index.upsert(doc)
+            updated_at = doc.get("updated_at")
+            if isinstance(updated_at, datetime) and (self._last_seen is None or updated_at > self._last_seen):
+                self._last_seen = updated_at
+        self.index.mark_synced()
+
+    def _poll_loop(self):
+        self.mode = "polling"
+        last_rebuild = time.time()
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                if time.time() - last_rebuild >= self.rebuild_interval:
+                    self.index.rebuild()
+                    last_rebuild = time.time()
+                else:
+                    self.poll_once()
+            except Exception as e:
+                print(f"[WARN] Seller index sync failed: {e}")
@@ -0,0 +1,330 @@
+import heapq
+import queue
+import threading
+import time
+
+from web3.exceptions import TransactionNotFound
+
+PENDING = "pending"
+SUBMITTED = "submitted"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+
+
+class NonceManager:
+    """
+    Hands out consecutive nonces for one account without a round trip per
+    transaction, so several deals can be in flight at once. Seeded from the
+    chain's pending count. A nonce whose transaction never reached the node
+    is released and handed out again, so it does not leave a gap that
+    blocks every later transaction; resync() only moves forward.
+    """
+
+    def __init__(self, w3, address: str):
+        self.w3 = w3
+        self.address = address
+        self._lock = threading.Lock()
+        self._next = None
+        self._released = []
+
+    def allocate(self) -> int:
+        with self._lock:
+            if self._released:
+                return heapq.heappop(self._released)
+            if self._next is None:
+                self._next = self.w3.eth.get_transaction_count(self.address, "pending")
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def release(self, nonce: int):
+        with self._lock:
+            heapq.heappush(self._released, nonce)
+
+    def resync(self):
+        """Skip past nonces the node already has (e.g. "nonce too low")."""
+        chain_next = self.w3.eth.get_transaction_count(self.address, "pending")
+        with self._lock:
+            self._next = max(self._next or 0, chain_next)
+            self._released = [n for n in self._released if n >= chain_next]
+            heapq.heapify(self._released)
+
+
+def is_nonce_error(error: Exception) -> bool:
+    text = str(error).lower()
+    return "nonce too low" in text or "already known" in text or "replacement transaction underpriced" in text
+
+
+class SettlementQueue:
+    """
+    Background settlement of accepted requests as `createDeal` transactions.
+
+    enqueue() records the job as pending and returns immediately. Worker
+    threads share one Web3 client, account and contract, take nonces from a
+    NonceManager, sign and send (-> submitted), and a single confirmer
+    thread polls receipts for everything in flight (-> confirmed, or
+    failed if the transaction reverted). Every status change goes through
+    `on_status(job_id, fields)`, which is where the caller persists it.
+
+    A send that raises (e.g. a read timeout) is looked up by hash first: if
+    the node has the transaction it counts as submitted, otherwise the same
+    signed transaction is sent again, so a retry never creates the deal
+    under a second nonce.
+
+    One submit worker is the default: sends then reach the node in nonce
+    order, and deals still overlap while they wait to be mined. More
+    workers only help with nodes that queue out-of-order nonces.
+    """
+
+    def __init__(self, w3, private_key: str, contract_address: str, abi, on_status,
+                 workers: int = 1, max_attempts: int = 3, gas: int = 300000, gas_price_gwei: str = "10",
+                 poll_interval: float = 2.0, confirm_timeout: float = 600.0):
+        self.w3 = w3
+        self.account = w3.eth.account.from_key(private_key)
+        self.contract = w3.eth.contract(address=w3.to_checksum_address(contract_address), abi=abi)
+        self.nonces = NonceManager(w3, self.account.address)
+        self.on_status = on_status
+        self.gas = gas
+        self.gas_price = w3.to_wei(gas_price_gwei, "gwei")
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.confirm_timeout = confirm_timeout
+
+        self._jobs = queue.Queue()
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self.counts = {SUBMITTED: 0, CONFIRMED: 0, FAILED: 0}
+        self._threads = [threading.Thread(target=self._submit_loop, daemon=True) for _ in range(max(1, workers))]
+        self._threads.append(threading.Thread(target=self._confirm_loop, daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def enqueue(self, job_id: str, crop, region, price, farmer_address=None, seller_address=None):
+        self._set_status(job_id, PENDING)
+        self._jobs.put((job_id, 1, (crop, region, price, farmer_address, seller_address), None))
+
+    def track(self, job_id: str, tx_hash: str):
+        """Resume waiting for a transaction submitted by an earlier process."""
+        with self._in_flight_lock:
+            self._in_flight[job_id] = (tx_hash, time.time())
+
+    def _set_status(self, job_id: str, status: str, **fields):
+        if status in self.counts:
+            self.counts[status] += 1
+        try:
+            self.on_status(job_id, {"status": status, **fields})
+        except Exception as e:
+            print(f"[WARN] Settlement status update failed for {job_id}: {e}")
+
+    def _build(self, crop, region, price, farmer_address, seller_address, nonce: int):
+        farmer_addr = farmer_address or self.account.address
+        seller_addr = seller_address or self.account.address
+        txn = self.contract.functions.createDeal(
+            self.w3.to_checksum_address(farmer_addr),
+            self.w3.to_checksum_address(seller_addr),
+            str(crop),
+            str(region),
+            int(price)
+        ).build_transaction({
+            "from": self.account.address,
+            "nonce": nonce,
+            "gas": self.gas,
+            "gasPrice": self.gas_price,
+        })
+        return self.account.sign_transaction(txn)
+
+    def _submit_loop(self):
+        while True:
+            job_id, attempt, deal, sent = self._jobs.get()
+            # `sent` is the (nonce, signed transaction) of an attempt whose outcome is unknown
+            nonce, signed = sent or (None, None)
+            try:
+                if signed is None:
+                    nonce = self.nonces.allocate()
+                    signed = self._build(*deal, nonce=nonce)
+                tx_hash = self.w3.to_hex(self.w3.eth.send_raw_transaction(signed.raw_transaction))
+            except Exception as e:
+                tx_hash = self._find_sent(signed, e)
+                if tx_hash is None:
+                    self._submit_failed(job_id, attempt, deal, nonce, signed, e)
+                    continue
+            self._set_status(job_id, SUBMITTED, tx_hash=tx_hash, nonce=nonce)
+            self.track(job_id, tx_hash)
+
+    def _find_sent(self, signed, error: Exception):
+        """
+        Hash of `signed` if the node has it although the send raised, e.g. a
+        read timeout after the node accepted it. None if it was not found.
+        """
+        if signed is None:
+            return None
+        tx_hash = self.w3.to_hex(signed.hash)
+        if "already known" in str(error).lower():
+            return tx_hash
+        try:
+            self.w3.eth.get_transaction(signed.hash)
+        except TransactionNotFound:
+            return None
+        except Exception as e:
+            print(f"[WARN] Transaction lookup failed for {tx_hash}: {e}")
+            return None
+        print(f"[INFO] Send of {tx_hash} raised but the node has it: {error}")
+        return tx_hash
+
+    def _submit_failed(self, job_id: str, attempt: int, deal, nonce, signed, error: Exception):
+        sent = None
+        try:
+            if is_nonce_error(error):
+                # Another transaction has this nonce (ours was not found); move past it
+                self.nonces.resync()
+            elif signed is not None and attempt < self.max_attempts:
+                # The node may still get it: send the same signed transaction again.
+                # A new one with another nonce could create the deal twice.
+                sent = (nonce, signed)
+            elif nonce is not None:
+                self.nonces.release(nonce)
+        except Exception as e:
+            print(f"[WARN] Nonce resync failed: {e}")
+        if attempt < self.max_attempts:
+            print(f"[WARN] Settlement submit failed for {job_id} (attempt {attempt}), retrying: {error}")
+            time.sleep(min(2 ** attempt, 30) * 0.1)
+            self._jobs.put((job_id, attempt + 1, deal, sent))
+            return
+        print(f"[ERROR] Settlement submit failed for {job_id}: {error}")
+        self._set_status(job_id, FAILED, error=str(error))
+
+    def _confirm_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._in_flight_lock:
+                in_flight = list(self._in_flight.items())
+            for job_id, (tx_hash, since) in in_flight:
+                try:
+                    receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+                except TransactionNotFound:
+                    if time.time() - since > self.confirm_timeout:
+                        self._finish(job_id, FAILED, error="not mined before timeout")
+                    continue
+                except Exception as e:
+                    print(f"[WARN] Receipt lookup failed for {tx_hash}: {e}")
+                    continue
+                if receipt["status"] == 1:
+                    self._finish(job_id, CONFIRMED, block_number=receipt["blockNumber"])
+                else:
+                    self._finish(job_id, FAILED, error="transaction reverted", block_number=receipt["blockNumber"])
+
+    def _finish(self, job_id: str, status: str, **fields):
+        with self._in_flight_lock:
+            self._in_flight.pop(job_id, None)
+        self._set_status(job_id, status, **fields)
+
+    def stats(self) -> dict:
+        with self._in_flight_lock:
+            in_flight = len(self._in_flight)
+        return {
+            "queued": self._jobs.qsize(),
+            "in_flight": in_flight,
+            "account": self.account.address,
+            **self.counts,
+        }
+
+
+# Local check against an in-process eth-tester chain (pip install "eth-tester[py-evm]").
+# eth-tester mines each transaction immediately and rejects future nonces, so
+# it exercises ordering and statuses; overlap in the mempool needs anvil/geth.
+# python -m src.settlement
+if __name__ == "__main__":
+    from web3 import Web3, EthereumTesterProvider
+
+    class LockedTesterProvider(EthereumTesterProvider):
+        # eth-tester is not thread-safe; a real node handles this itself
+        _lock = threading.Lock()
+
+        def make_request(self, method, params):
+            with self._lock:
+                return super().make_request(method, params)
+
+    provider = LockedTesterProvider()
+    w3 = Web3(provider)
+    keys = provider.ethereum_tester.backend.account_keys
+    deployer = w3.eth.accounts[0]
+
+    def deploy(runtime: bytes) -> str:
+        # Init code that returns `runtime` as the contract code
+        init = bytes([0x60, len(runtime), 0x60, 0x0c, 0x60, 0x00, 0x39, 0x60, len(runtime), 0x60, 0x00, 0xf3])
+        tx = w3.eth.send_transaction({"from": deployer, "data": init + runtime})
+        return w3.eth.get_transaction_receipt(tx)["contractAddress"]
+
+    abi = [{
+        "inputs": [
+            {"name": "farmer", "type": "address"}, {"name": "seller", "type": "address"},
+            {"name": "crop", "type": "string"}, {"name": "region", "type": "string"},
+            {"name": "price", "type": "uint256"},
+        ],
+        "name": "createDeal", "outputs": [{"name": "dealId", "type": "bytes32"}],
+        "stateMutability": "nonpayable", "type": "function",
+    }]
+    accepting = deploy(bytes([0x00]))                  # STOP: every call succeeds
+    reverting = deploy(bytes([0x60, 0x00, 0x80, 0xfd]))  # REVERT(0, 0)
+
+    statuses = {}
+    lock = threading.Lock()
+
+    def on_status(job_id, fields):
+        with lock:
+            statuses.setdefault(job_id, []).append(fields)
+
+    settle = SettlementQueue(w3, keys[0].to_hex(), accepting, abi, on_status, poll_interval=0.1)
+    failing = SettlementQueue(w3, keys[1].to_hex(), reverting, abi, on_status, poll_interval=0.1)
+
+
+    jobs = 40
+    start = time.perf_counter()
+    for i in range(jobs):
+        settle.enqueue(f"deal-{i}", "rice", "Alipurduar", 1000 + i)
+    failing.enqueue("deal-revert", "jute", "Jalpaiguri", 1)
+    enqueue_ms = (time.perf_counter() - start) * 1000
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        with lock:
+            final = [s[-1]["status"] for s in statuses.values() if s[-1]["status"] in (CONFIRMED, FAILED)]
+        if len(final) == jobs + 1:
+            break
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - start
+
+    deals = [statuses[f"deal-{i}"] for i in range(jobs)]
+    confirmed = sum(d[-1]["status"] == CONFIRMED for d in deals)
+    nonces = {d[1].get("nonce") for d in deals if len(d) > 1}
+    blocks = {d[-1].get("block_number") for d in deals}
+    print(f"[INFO] {jobs} deals enqueued in {enqueue_ms:.1f} ms, {confirmed} confirmed in {elapsed:.2f}s "
+          f"in {len(blocks)} blocks with {len(nonces)} distinct nonces; "
+          f"reverted deal {statuses['deal-revert'][-1]['status']}")
+    print(f"[INFO] {settle.stats()}")
+
+    # Sends that time out after the node already took the transaction
+    # must not be sent again under a new nonce
+    import requests
+
+    class TimeoutAfterSendProvider(LockedTesterProvider):
+        sends = 0
+
+        def make_request(self, method, params):
+            response = super().make_request(method, params)
+            if method == "eth_sendRawTransaction":
+                TimeoutAfterSendProvider.sends += 1
+                if TimeoutAfterSendProvider.sends % 3 == 1:
+                    raise requests.exceptions.ReadTimeout("read timed out")
+            return response
+
+    flaky_w3 = Web3(TimeoutAfterSendProvider(provider.ethereum_tester))
+    flaky = SettlementQueue(flaky_w3, keys[2].to_hex(), accepting, abi, on_status, poll_interval=0.1)
+    for i in range(10):
+        flaky.enqueue(f"flaky-{i}", "rice", "Alipurduar", i)
+    deadline = time.time() + 30
+    while time.time() < deadline and flaky.stats()[CONFIRMED] < 10:
+        time.sleep(0.1)
+    sent = w3.eth.get_transaction_count(flaky.account.address)
+    print(f"[INFO] {TimeoutAfterSendProvider.sends} sends, every third timing out after the node took it: "
+          f"{flaky.stats()[CONFIRMED]} of 10 deals confirmed with {sent} transactions")
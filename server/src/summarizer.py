@@ -0,0 +1,195 @@
+import time
+import zlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Tuple
+
+MAP = "map"
+SINGLE = "single"
+AUTO = "auto"
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; good enough for a budget check
+    return len(text) // 4 + 1
+
+
+class ChunkSummarizer:
+    """
+    Turns retrieved chunks into the context for the final answer prompt.
+
+    - single: the chunks go into the final prompt as they are (no extra
+      LLM call); used in auto mode when they fit `token_budget`
+    - map: each chunk is summarized by its own LLM call, all running at
+      once on a bounded pool; summaries not back within `timeout` seconds
+      are dropped and the ones that made it are used
+
+    If no summary makes the deadline, the chunks are packed (truncated to
+    the budget) instead, so the answer is never built from nothing.
+
+    Calls that miss the deadline keep running and hold a worker until the
+    LLM returns. Map mode only starts while the workers not held by such
+    abandoned calls can take every chunk; otherwise the chunks are packed,
+    so a slow LLM cannot queue new summaries behind abandoned ones. Calls
+    of queries still within their deadline do not count: concurrent
+    queries share the pool and each waits at most its own timeout.
+    """
+
+    def __init__(self, llm, mode: str = AUTO, workers: int = 5, timeout: float = 8.0, token_budget: int = 3000):
+        if mode not in (AUTO, MAP, SINGLE):
+            raise ValueError(f"unknown summary mode {mode!r}")
+        self.llm = llm
+        self.mode = mode
+        self.timeout = timeout
+        self.token_budget = token_budget
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summarize")
+        self._abandoned = 0
+        self._abandoned_lock = threading.Lock()
+        self.saturated = 0
+
+    def pack(self, texts: List[str]) -> str:
+        parts, used = [], 0
+        for i, text in enumerate(texts):
+            left = self.token_budget - used
+            if left <= 0:
+                break
+            text = text[:left * 4]
+            parts.append(f"[{i + 1}] {text}")
+            used += estimate_tokens(text)
+        return "\n\n".join(parts)
+
+    def _summarize_chunk(self, query: str, chunk: str) -> str:
+        sub_prompt = (
+            f"You are an agricultural summarizer.\n"
+            f"User Question: {query}\n\n"
+            f"Relevant Text Chunk:\n{chunk}\n\n"
+            "Summarize this chunk in 1–2 concise sentences focusing on relevant details."
+        )
+        return self.llm.invoke([sub_prompt]).content.strip()
+
+    def _abandoned_done(self, future):
+        with self._abandoned_lock:
+            self._abandoned -= 1
+
+    def map_summaries(self, query: str, texts: List[str]) -> List[str]:
+        with self._abandoned_lock:
+            abandoned = self._abandoned
+            if abandoned + len(texts) > self.workers:
+                self.saturated += 1
+                print(f"[WARN] Summary pool busy ({abandoned} of {self.workers} workers held by "
+                      f"abandoned calls); packing chunks")
+                return []
+        futures = [self._pool.submit(self._summarize_chunk, query, chunk) for chunk in texts]
+        done, not_done = wait(futures, timeout=self.timeout)
+        for f in not_done:
+            # Queued calls are dropped; running ones hold their worker until the LLM returns
+            if not f.cancel():
+                with self._abandoned_lock:
+                    self._abandoned += 1
+                f.add_done_callback(self._abandoned_done)
+        if not_done:
+            print(f"[WARN] {len(not_done)} of {len(futures)} chunk summaries missed the {self.timeout}s deadline")
+        summaries = []
+        for i, f in enumerate(futures):
+            if f not in done:
+                continue
+            try:
+                summary = f.result()
+            except Exception as e:
+                print(f"[WARN] Chunk summarization failed for chunk {i}: {e}")
+                continue
+            if summary:
+                summaries.append(summary)
+        return summaries
+
+    def context(self, query: str, texts: List[str]) -> Tuple[str, str]:
+        """Returns (context text for the final prompt, mode used)."""
+        fits = estimate_tokens(query) + sum(estimate_tokens(t) for t in texts) <= self.token_budget
+        if self.mode == SINGLE or (self.mode == AUTO and fits):
+            return self.pack(texts), SINGLE
+        summaries = self.map_summaries(query, texts)
+        if not summaries:
+            return self.pack(texts), SINGLE
+        return "\n".join(summaries), MAP
+
+
+class FakeLLM:
+    """
+    Deterministic stand-in for ChatGroq: each prompt gets a fixed latency
+    derived from its hash (1 in `slow_every` prompts is slow), so runs are
+    repeatable however the calls interleave. Replies echo the prompt tail,
+    word by word from stream().
+    """
+
+    def __init__(self, median: float = 0.4, slow: float = 3.0, slow_every: int = 20, seed: int = 7):
+        self.median = median
+        self.slow = slow
+        self.slow_every = slow_every
+        self.seed = seed
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    class Reply:
+        def __init__(self, content: str):
+            self.content = content
+
+    def latency(self, prompt: str) -> float:
+        h = zlib.crc32(prompt.encode()) ^ self.seed
+        if h % self.slow_every == 0:
+            return self.slow
+        return self.median * (0.6 + (h % 1000) / 1000)
+
+    def invoke(self, messages):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency(messages[0]))
+        return self.Reply(messages[0][-80:])
+
+    def stream(self, messages, token_delay: float = 0.02):
+        """Like ChatGroq.stream: the first token after the call latency, then one every token_delay."""
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency(messages[0]))
+        for word in messages[0][-80:].split(" "):
+            yield self.Reply(word + " ")
+            time.sleep(token_delay)
+
+
+# p50/p95 of retrieval-to-answer time per mode, using FakeLLM
+# python -m src.summarizer [queries]
+if __name__ == "__main__":
+    import sys
+
+    queries = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    top_k = 5
+    chunks = [f"Paddy chunk {i}: " + "nitrogen split doses at tillering and panicle initiation. " * 15
+              for i in range(top_k)]
+
+    def bench(label: str, mode: str, serial: bool = False):
+        llm = FakeLLM()
+        summarizer = ChunkSummarizer(llm, mode=mode, workers=top_k, timeout=1.5)
+        latencies, used = [], set()
+        for q in range(queries):
+            query = f"how much urea for paddy? ({q})"
+            start = time.perf_counter()
+            if serial:
+                # The old loop: one call per chunk, one after another
+                context = "\n".join(summarizer._summarize_chunk(query, c) for c in chunks)
+                used.add("serial")
+            else:
+                context, mode_used = summarizer.context(query, chunks)
+                used.add(mode_used)
+            llm.invoke([f"{query}\nfinal answer from:\n{context}"])
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+        print(f"[INFO] {label:<22} p50 {p50 * 1000:6.0f} ms  p95 {p95 * 1000:6.0f} ms  "
+              f"{llm.calls / queries:.1f} LLM calls/query ({', '.join(sorted(used))})")
+
+    print(f"[INFO] {queries} queries, top_k={top_k}, fake LLM ~400 ms/call, every 20th call 3 s")
+    bench("serial (before)", MAP, serial=True)
+    bench("map, concurrent", MAP)
+    bench("single call", SINGLE)
+    bench("auto", AUTO)
@@ -14,3 +14,10 @@ AGRI_REFERENCE_TEXTS = [
     "greenhouse cultivation and protected farming",
     "organic farming and composting"
 ]
+
+# Banks the classifier scores against (see src/reference_bank.py). Add
+# per-language lists or larger agronomy phrase lists here; only phrases not
+# already in the saved bank are encoded on start-up.
+AGRI_REFERENCE_BANKS = {
+    "en": AGRI_REFERENCE_TEXTS,
+}
@@ -1,41 +1,166 @@
 import os
+import time
 import faiss
 import numpy as np
 import pickle
 from typing import List, Any
-from sentence_transformers import SentenceTransformer
-from src.embedding import EmbeddingPipeline
+from src.model_registry import models
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+
+class IndexConfig:
+    """
+    Which Faiss index the store builds, and its query-time defaults.
+
+    - flat: exact search, cost linear in corpus size
+    - ivf_flat: k-means into `nlist` lists, searches `nprobe` of them
+    - hnsw: graph with `hnsw_m` links per node, `ef_search` candidates per query
+    - ivf_pq: IVF over product-quantized vectors (`pq_m` sub-vectors of
+      `pq_nbits` bits), smallest memory, lossy distances
+
+    nlist=0 picks ~4*sqrt(n) at build time.
+    """
+
+    def __init__(self, index_type: str = "flat", nlist: int = 0, nprobe: int = 8, hnsw_m: int = 32,
+                 ef_construction: int = 80, ef_search: int = 64, pq_m: int = 48, pq_nbits: int = 8):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            index_type=os.getenv("FAISS_INDEX_TYPE", "flat"),
+            nlist=int(os.getenv("FAISS_NLIST", "0")),
+            nprobe=int(os.getenv("FAISS_NPROBE", "8")),
+            hnsw_m=int(os.getenv("FAISS_HNSW_M", "32")),
+            ef_construction=int(os.getenv("FAISS_EF_CONSTRUCTION", "80")),
+            ef_search=int(os.getenv("FAISS_EF_SEARCH", "64")),
+            pq_m=int(os.getenv("FAISS_PQ_M", "48")),
+            pq_nbits=int(os.getenv("FAISS_PQ_NBITS", "8")),
+        )
+
+
+def index_type_of(index) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def build_index(config: IndexConfig, embeddings: np.ndarray):
+    """
+    An empty index of config.index_type for these vectors, trained on them
+    if the type needs training. Falls back to flat when the corpus is too
+    small to train the requested type.
+    """
+    n, dim = embeddings.shape
+    if config.index_type == "flat":
+        return faiss.IndexFlatL2(dim)
+    if config.index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, config.hnsw_m)
+        index.hnsw.efConstruction = config.ef_construction
+        index.hnsw.efSearch = config.ef_search
+        return index
+
+    nlist = config.nlist or int(4 * np.sqrt(n))
+    # k-means wants ~39 points per list, PQ codebooks 2**nbits points each
+    nlist = max(1, min(nlist, n // 39))
+    if config.index_type == "ivf_pq" and n < 2 ** config.pq_nbits:
+        print(f"[WARN] {n} vectors are too few to train IVF-PQ codebooks; using a flat index")
+        return faiss.IndexFlatL2(dim)
+    if nlist < 2:
+        print(f"[WARN] {n} vectors are too few for IVF; using a flat index")
+        return faiss.IndexFlatL2(dim)
+
+    quantizer = faiss.IndexFlatL2(dim)
+    if config.index_type == "ivf_pq":
+        # The sub-vector count has to divide the dimension
+        pq_m = max(m for m in range(1, min(config.pq_m, dim) + 1) if dim % m == 0)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, config.pq_nbits)
+    else:
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_L2)
+    start = time.perf_counter()
+    index.train(embeddings)
+    print(f"[INFO] Trained {config.index_type} index (nlist={nlist}) on {n} vectors in {time.perf_counter() - start:.1f}s")
+    index.nprobe = config.nprobe
+    return index
+
+
+def search_params(index, nprobe: int = None, ef_search: int = None):
+    """Per-call search parameters (thread-safe, unlike setting them on the index)."""
+    if nprobe is not None and faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(nprobe=nprobe)
+    if ef_search is not None and isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=ef_search)
+    return None
+
+
+def apply_defaults(index, config: IndexConfig):
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = config.nprobe
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = config.ef_search
+
 
 class FaissVectorStore:
-    def __init__(self, persist_dir: str = "faiss_store", embedding_model: str = "all-MiniLM-L6-v2", chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, persist_dir: str = "faiss_store", embedding_model: str = "all-MiniLM-L6-v2", chunk_size: int = 1000, chunk_overlap: int = 200,
+                 index_config: IndexConfig = None):
         self.persist_dir = persist_dir
         os.makedirs(self.persist_dir, exist_ok=True)
+        self.index_config = index_config or IndexConfig.from_env()
         self.index = None
         self.metadata = []
+        # Bumped whenever the index content changes, so caches keyed on it can drop stale entries
+        self.generation = 0
         self.embedding_model = embedding_model
-        self.model = SentenceTransformer(embedding_model)
+        self.model = models.acquire(embedding_model)
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         print(f"[INFO] Loaded embedding model: {embedding_model}")
 
     def build_from_documents(self, documents: List[Any]):
+        # Imported here so searching (and src.index_eval) does not need the langchain loaders
+        from src.embedding import EmbeddingPipeline
         print(f"[INFO] Building vector store from {len(documents)} raw documents...")
         emb_pipe = EmbeddingPipeline(model_name=self.embedding_model, chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
-        chunks = emb_pipe.chunk_documents(documents)
-        embeddings = emb_pipe.embed_chunks(chunks)
+        try:
+            chunks = emb_pipe.chunk_documents(documents)
+            embeddings = emb_pipe.embed_chunks(chunks)
+        finally:
+            emb_pipe.close()
         metadatas = [{"text": chunk.page_content} for chunk in chunks]
         self.add_embeddings(np.array(embeddings).astype('float32'), metadatas)
         self.save()
         print(f"[INFO] Vector store built and saved to {self.persist_dir}")
 
     def add_embeddings(self, embeddings: np.ndarray, metadatas: List[Any] = None):
-        dim = embeddings.shape[1]
         if self.index is None:
-            self.index = faiss.IndexFlatL2(dim)
+            # Trained on the first batch; build_from_documents passes the whole corpus
+            self.index = build_index(self.index_config, embeddings)
         self.index.add(embeddings)
+        self.generation += 1
         if metadatas:
             self.metadata.extend(metadatas)
-        print(f"[INFO] Added {embeddings.shape[0]} vectors to Faiss index.")
+        print(f"[INFO] Added {embeddings.shape[0]} vectors to Faiss index ({index_type_of(self.index)}).")
+
+    def close(self):
+        """Give the embedding model back to the registry."""
+        if self.model is not None:
+            models.release(self.embedding_model)
+            self.model = None
 
     def save(self):
         faiss_path = os.path.join(self.persist_dir, "faiss.index")
@@ -49,22 +174,35 @@ class FaissVectorStore:
         faiss_path = os.path.join(self.persist_dir, "faiss.index")
         meta_path = os.path.join(self.persist_dir, "metadata.pkl")
         self.index = faiss.read_index(faiss_path)
+        apply_defaults(self.index, self.index_config)
         with open(meta_path, "rb") as f:
             self.metadata = pickle.load(f)
-        print(f"[INFO] Loaded Faiss index and metadata from {self.persist_dir}")
+        self.generation += 1
+        print(f"[INFO] Loaded {index_type_of(self.index)} Faiss index ({self.index.ntotal} vectors) and metadata from {self.persist_dir}")
+        if index_type_of(self.index) != self.index_config.index_type:
+            print(f"[WARN] Saved index is {index_type_of(self.index)}, FAISS_INDEX_TYPE is "
+                  f"{self.index_config.index_type}; rebuild the store to switch")
 
-    def search(self, query_embedding: np.ndarray, top_k: int = 5):
-        D, I = self.index.search(query_embedding, top_k)
+    def search(self, query_embedding: np.ndarray, top_k: int = 5, nprobe: int = None, ef_search: int = None):
+        """nprobe (IVF) / ef_search (HNSW) override the configured defaults for this call."""
+        params = search_params(self.index, nprobe, ef_search)
+        if params is None:
+            D, I = self.index.search(query_embedding, top_k)
+        else:
+            D, I = self.index.search(query_embedding, top_k, params=params)
         results = []
         for idx, dist in zip(I[0], D[0]):
+            if idx < 0:
+                # Approximate indexes return -1 when fewer than top_k were found
+                continue
             meta = self.metadata[idx] if idx < len(self.metadata) else None
             results.append({"index": idx, "distance": dist, "metadata": meta})
         return results
 
-    def query(self, query_text: str, top_k: int = 5):
+    def query(self, query_text: str, top_k: int = 5, **search_kwargs):
         print(f"[INFO] Querying vector store for: '{query_text}'")
         query_emb = self.model.encode([query_text]).astype('float32')
-        return self.search(query_emb, top_k=top_k)
+        return self.search(query_emb, top_k=top_k, **search_kwargs)
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,242 @@
+import time
+import threading
+from collections import OrderedDict, deque
+
+from src.http_client import OutboundHTTP
+
+
+def geo_bucket(lat: float, lon: float, step: float = 0.05):
+    """
+    Snap coordinates to the centre of a step x step degree cell
+    (0.05 deg is ~5 km), so nearby farms share one cache entry.
+    """
+    return (round(round(lat / step) * step, 4), round(round(lon / step) * step, 4))
+
+
+class InFlight:
+    """One upstream call that concurrent misses wait on; they get its result or its error."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class UpstreamError(Exception):
+    """Non-200 answer from the weather API; not cached."""
+
+    def __init__(self, status: int, payload):
+        super().__init__(f"upstream returned {status}")
+        self.status = status
+        self.payload = payload
+
+
+class OpenWeatherClient:
+    """Thin OpenWeather client on the shared outbound HTTP layer."""
+
+    def __init__(self, api_key: str, base_url: str = "https://api.openweathermap.org/data/2.5",
+                 http: OutboundHTTP = None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.http = http or OutboundHTTP()
+
+    def _get(self, path: str, lat: float, lon: float):
+        r = self.http.get(
+            f"{self.base_url}/{path}",
+            params={"lat": lat, "lon": lon, "appid": self.api_key, "units": "metric"},
+        )
+        data = r.json()
+        if r.status_code != 200:
+            raise UpstreamError(r.status_code, data)
+        return data
+
+    def current(self, lat: float, lon: float):
+        return self._get("weather", lat, lon)
+
+    def forecast(self, lat: float, lon: float):
+        return self._get("forecast", lat, lon)
+
+
+class WeatherCache:
+    """
+    TTL cache over one upstream call, keyed by geo bucket.
+
+    - fresh (age < ttl): served from memory
+    - stale (age < ttl + stale_ttl): served immediately while one background
+      thread refreshes the bucket
+    - missing/expired: fetched inline; concurrent misses for the same bucket
+      wait on a single upstream call instead of each making their own
+
+    A failed background refresh keeps the stale value. Entries are evicted
+    LRU beyond max_entries.
+    """
+
+    def __init__(self, fetch, ttl: float, stale_ttl: float, max_entries: int = 5000, name: str = "weather"):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.name = name
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.errors = 0
+        self.upstream_calls = 0
+        self._latencies = deque(maxlen=1000)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = now - fetched_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._inflight:
+                        call = self._inflight[key] = InFlight()
+                        threading.Thread(target=self._refresh, args=(key, call), daemon=True).start()
+                    return value
+            call = self._inflight.get(key)
+            if call is None:
+                self.misses += 1
+                call = self._inflight[key] = InFlight()
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            # Share the outcome of the call in flight; if it failed, so do we,
+            # rather than every waiter calling upstream again in turn
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        return self._load(key, call)
+
+    def _load(self, key, call: InFlight):
+        try:
+            call.result = self._call(key)
+            self._store(key, call.result)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    def _refresh(self, key, call: InFlight):
+        try:
+            call.result = self._call(key)
+            self._store(key, call.result)
+            self.refreshes += 1
+        except Exception as e:
+            call.error = e
+            print(f"[WARN] {self.name} refresh failed for {key}: {e}")
+        finally:
+            self._finish(key, call)
+
+    def _finish(self, key, call: InFlight):
+        with self._lock:
+            self._inflight.pop(key)
+        call.done.set()
+
+    def _call(self, key):
+        start = time.perf_counter()
+        try:
+            return self.fetch(*key)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.upstream_calls += 1
+            self._latencies.append(time.perf_counter() - start)
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lat = sorted(self._latencies)
+        served = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "hit_ratio": round((self.hits + self.stale_hits) / served, 4) if served else None,
+            "upstream_calls": self.upstream_calls,
+            "upstream_p50_ms": round(lat[len(lat) // 2] * 1000, 1) if lat else None,
+            "upstream_p95_ms": round(lat[min(int(len(lat) * 0.95), len(lat) - 1)] * 1000, 1) if lat else None,
+            "upstream_max_ms": round(lat[-1] * 1000, 1) if lat else None,
+        }
+
+
+# Latency demo against a local stub (behaviour is in tests/test_weather_cache.py)
+# python -m src.weather_cache
+if __name__ == "__main__":
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from concurrent.futures import ThreadPoolExecutor
+    from urllib.parse import urlparse, parse_qs
+
+    calls = []
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            q = parse_qs(url.query)
+            calls.append((url.path, q["lat"][0], q["lon"][0]))
+            time.sleep(0.2)
+            body = {"main": {"temp": 30.0, "humidity": 70}, "weather": [{"main": "Clouds"}], "list": []}
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    client = OpenWeatherClient("test", base_url=f"http://127.0.0.1:{stub.server_port}")
+    cache = WeatherCache(client.current, ttl=0.5, stale_ttl=5)
+
+    # Same village (points up to ~0.7 km apart), 50 concurrent dashboard loads
+    points = [(26.4990 + i * 0.0001, 89.5510 - i * 0.0001) for i in range(50)]
+    with ThreadPoolExecutor(50) as pool:
+        list(pool.map(lambda p: cache.get(geo_bucket(*p)), points))
+    print(f"[INFO] 50 concurrent misses in one bucket -> {len(calls)} upstream call")
+
+    start = time.perf_counter()
+    cache.get(geo_bucket(*points[0]))
+    print(f"[INFO] fresh hit served in {(time.perf_counter() - start) * 1000:.3f} ms")
+
+    time.sleep(0.6)
+    start = time.perf_counter()
+    cache.get(geo_bucket(*points[0]))
+    stale_ms = (time.perf_counter() - start) * 1000
+    time.sleep(0.3)
+    print(f"[INFO] stale hit served in {stale_ms:.3f} ms while one background refresh ran")
+    print(f"[INFO] {cache.stats()}")
+    stub.shutdown()
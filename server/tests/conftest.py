@@ -0,0 +1,9 @@
+import os
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tests import the server's modules as `src.*`, like `python -m src.<module>`
+sys.path.insert(0, SERVER_DIR)
+# Module-level defaults resolve data files against the working directory
+os.environ.setdefault("SCHEME_CSV_PATH", os.path.join(SERVER_DIR, "new_allschemes.csv"))
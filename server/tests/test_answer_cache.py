@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from src import answer_cache
+from src.answer_cache import SemanticAnswerCache
+
+DIM = 8
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(answer_cache.time, "time", clock)
+    return clock
+
+
+def topic(i: int) -> np.ndarray:
+    """Orthogonal stand-ins for the embeddings of unrelated questions."""
+    return np.eye(DIM, dtype=np.float32)[i]
+
+
+def near(v: np.ndarray, cosine: float) -> np.ndarray:
+    """A vector at the given cosine similarity from `v` (off towards the last axis)."""
+    return cosine * v + np.sqrt(1 - cosine ** 2) * topic(DIM - 1)
+
+
+def test_hit_needs_the_threshold(clock):
+    cache = SemanticAnswerCache(threshold=0.92)
+    cache.put("urea for paddy", topic(0), "50 kg/acre", llm_calls=2)
+    assert cache.get(near(topic(0), 0.95)) == "50 kg/acre"
+    assert cache.get(near(topic(0), 0.90)) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["llm_calls_saved"]) == (1, 1, 2)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = SemanticAnswerCache(ttl=100)
+    cache.put("q", topic(0), "a")
+    assert cache.get(topic(0)) == "a"
+    clock.now += 100
+    assert cache.get(topic(0)) is None
+
+
+def test_least_recently_used_entry_is_replaced(clock):
+    cache = SemanticAnswerCache(max_entries=3)
+    for i in range(3):
+        cache.put(f"q{i}", topic(i), f"a{i}")
+    assert cache.get(topic(0)) == "a0"  # q1 is now the least recently used
+    cache.put("q3", topic(3), "a3")
+    assert cache.stats()["evictions"] == 1
+    assert [cache.get(topic(i)) for i in range(4)] == ["a0", None, "a2", "a3"]
+
+
+def test_expired_entry_is_replaced_before_the_least_recently_used(clock):
+    cache = SemanticAnswerCache(ttl=100, max_entries=2)
+    cache.put("q0", topic(0), "a0")
+    clock.now += 50
+    cache.put("q1", topic(1), "a1")
+    clock.now += 60  # q0 expired, q1 not
+    cache.get(topic(1))
+    cache.put("q2", topic(2), "a2")
+    assert [cache.get(topic(i)) for i in range(3)] == [None, "a1", "a2"]
+
+
+def test_store_generation_change_drops_everything(clock):
+    cache = SemanticAnswerCache()
+    cache.check_generation(1)
+    cache.put("q", topic(0), "a")
+    cache.check_generation(1)
+    assert cache.get(topic(0)) == "a"
+    cache.check_generation(2)
+    assert cache.get(topic(0)) is None
+    assert cache.stats()["entries"] == 0 and cache.invalidations == 1
+
+
+def test_same_question_is_refreshed_in_place(clock):
+    cache = SemanticAnswerCache(ttl=100)
+    cache.put("q", topic(0), "old")
+    clock.now += 90
+    cache.put("q", topic(0) * 3, "new")  # same direction, another scale
+    assert cache.stats()["entries"] == 1
+    clock.now += 50  # past the first put's ttl, not the refresh's
+    assert cache.get(topic(0)) == "new"
+
+
+# The default threshold against the real question encoder. Rewordings of
+# one question must hit; the same question about another crop or input
+# has a different answer and must miss.
+PARAPHRASES = [
+    ("how much urea for paddy?", "How much urea for paddy"),
+    ("how much urea should i apply to paddy", "how much urea should i apply to my paddy"),
+    ("best time to sow wheat", "best time for sowing wheat"),
+    ("how to control stem borer in rice", "how to control stem borer in rice crop"),
+]
+NEAR_MISSES = [
+    ("urea for rice", "urea for wheat"),
+    ("how much urea for paddy", "how much potash for paddy"),
+    ("best time to sow wheat", "best time to harvest wheat"),
+    ("how to control stem borer in rice", "how to control stem borer in maize"),
+]
+
+
+@pytest.fixture(scope="module")
+def encode():
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    try:
+        model = sentence_transformers.SentenceTransformer("all-MiniLM-L6-v2")
+    except OSError as e:
+        pytest.skip(f"all-MiniLM-L6-v2 not available: {e}")
+    # Same preprocessing as RAGSearch.stream_answer
+    return lambda text: model.encode(text.lower().strip(), normalize_embeddings=True)
+
+
+@pytest.mark.parametrize("asked, cached", PARAPHRASES)
+def test_default_threshold_matches_rewordings(encode, asked, cached):
+    cache = SemanticAnswerCache()
+    cache.put(cached, encode(cached), "answer")
+    assert cache.get(encode(asked)) == "answer"
+
+
+@pytest.mark.parametrize("asked, cached", NEAR_MISSES)
+def test_default_threshold_separates_near_misses(encode, asked, cached):
+    cache = SemanticAnswerCache()
+    cache.put(cached, encode(cached), "answer")
+    assert cache.get(encode(asked)) is None
@@ -0,0 +1,108 @@
+import os
+import time
+import uuid
+
+import mongomock
+import pytest
+
+from src.chat_store import ChatStore, MongoChatStore
+
+os.environ.setdefault("DB_BOOTSTRAP", "0")
+server = pytest.importorskip("server")
+
+ROOM = "f1_fpc1"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(server.mongo, "db", db)
+    monkeypatch.setattr(server, "chat_store", MongoChatStore(lambda: db, retention=50))
+    monkeypatch.setattr(server, "CHAT_STREAM_POLL", 0.05)
+    return db
+
+
+@pytest.fixture
+def client(db):
+    return server.app.test_client()
+
+
+def message(text):
+    return {"id": str(uuid.uuid4()), "sender": "f1", "receiver": "fpc1", "text": text, "room": ROOM}
+
+
+def fill(store, count):
+    return [store.append(ROOM, message(str(i))) for i in range(count)]
+
+
+@pytest.mark.parametrize("make", [
+    lambda: ChatStore(retention=50),
+    lambda: MongoChatStore(lambda db=mongomock.MongoClient().db: db, retention=50),
+])
+def test_stores_paginate_the_same_way(make):
+    store = make()
+    sent = fill(store, 80)
+    texts = lambda page: [m["text"] for m in page]
+
+    assert texts(store.history(ROOM)) == [str(i) for i in range(30, 80)]
+    assert texts(store.history(ROOM, limit=5)) == ["75", "76", "77", "78", "79"]
+    assert texts(store.history(ROOM, after=sent[40]["id"], limit=3)) == ["41", "42", "43"]
+    assert texts(store.history(ROOM, before=sent[40]["id"], limit=3)) == ["37", "38", "39"]
+    assert texts(store.history(ROOM, after=sent[40]["id"], before=sent[44]["id"])) == ["41", "42", "43"]
+    assert texts(store.since(ROOM, sent[77]["seq"])) == ["78", "79"]
+    assert store.seq_of(ROOM, sent[40]["id"]) == sent[40]["seq"]
+    with pytest.raises(KeyError):
+        store.history(ROOM, after=sent[10]["id"])  # evicted
+    assert store.room_exists(ROOM)
+    assert store.delete_rooms(ROOM, None) == 1
+    assert not store.room_exists(ROOM)
+    assert store.history(ROOM) == []
+
+
+def read_events(response, count, timeout=5.0):
+    """The first `count` message/closed/reset SSE events of a streamed response."""
+    events, deadline = [], time.monotonic() + timeout
+    for chunk in response.response:
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if text.startswith("id:") or text.startswith("event:"):
+            fields = dict(line.split(": ", 1) for line in text.strip().split("\n"))
+            events.append(fields)
+        if len(events) >= count or time.monotonic() > deadline:
+            break
+    return events
+
+
+def test_messages_from_another_worker_reach_open_streams(db, client):
+    first = client.post("/api/chat/send", json={"sender": "f1", "receiver": "fpc1", "text": "hi", "room": ROOM})
+    first_id = first.get_json()["msg"]["id"]
+    response = client.get(f"/api/chat/stream?room={ROOM}", headers={"Last-Event-ID": first_id}, buffered=False)
+    try:
+        # A second worker has its own store instance and hub; nothing is published here
+        other_worker = MongoChatStore(lambda: db, retention=50)
+        sent = other_worker.append(ROOM, message("from the other worker"))
+        events = read_events(response, 1)
+    finally:
+        response.close()
+    assert [e["id"] for e in events] == [sent["id"]]
+    assert events[0]["event"] == "message"
+
+
+def test_room_deleted_by_another_worker_closes_streams(db, client):
+    server.chat_store.append(ROOM, message("hi"))
+    response = client.get(f"/api/chat/stream?room={ROOM}", buffered=False)
+    try:
+        MongoChatStore(lambda: db).delete_rooms(ROOM)
+        events = read_events(response, 2)
+    finally:
+        response.close()
+    assert [e["event"] for e in events] == ["message", "closed"]
+
+
+def test_unknown_resume_id_resets_to_retained_history(db, client):
+    fill(server.chat_store, 3)
+    response = client.get(f"/api/chat/stream?room={ROOM}&after=gone", buffered=False)
+    try:
+        events = read_events(response, 4)
+    finally:
+        response.close()
+    assert [e["event"] for e in events] == ["reset", "message", "message", "message"]
@@ -0,0 +1,80 @@
+import pytest
+
+from src import classification_cache
+from src.classification_cache import ClassificationCache, classification_key, make_classification_cache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(classification_cache.time, "time", clock)
+    return clock
+
+
+def test_key_ignores_case_whitespace_and_trailing_punctuation():
+    assert classification_key("  How to grow RICE? ") == classification_key("how to grow rice")
+    assert classification_key("how  to grow\trice!") == classification_key("how to grow rice")
+
+
+def test_key_depends_on_the_chat_context():
+    assert classification_key("and then?", "we talked about wheat") != classification_key("and then?", "we talked about jute")
+    assert classification_key("and then?", "  ") == classification_key("and then?")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make(request, tmp_path):
+    path = str(tmp_path / "classification.sqlite3")
+    return lambda **kw: make_classification_cache(request.param, path, **kw)
+
+
+def test_entries_expire_after_ttl(make, clock):
+    cache = make(ttl=100)
+    cache.put("rice", True)
+    assert cache.get("rice") is True
+    clock.now += 101
+    assert cache.get("rice") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(make, clock):
+    cache = make(max_entries=3)
+    for i in range(3):
+        clock.now += 100
+        cache.put(f"q{i}", True)
+    clock.now += 100
+    cache.get("q0")
+    clock.now += 100
+    cache.put("q3", False)
+    assert [cache.get(f"q{i}") for i in range(4)] == [True, None, True, False]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "classification.sqlite3")
+    make_classification_cache("sqlite", path).put("urea dose", True)
+    other_worker = make_classification_cache("sqlite", path)
+    assert other_worker.get("urea dose") is True
+    assert make_classification_cache("memory").get("urea dose") is None
+
+
+def test_backend_failures_are_misses():
+    class Broken:
+        name, max_entries, ttl, evictions, expirations = "broken", 1, 1, 0, 0
+
+        def get(self, key):
+            raise OSError("disk I/O error")
+
+        put = get
+
+    cache = ClassificationCache(Broken())
+    cache.put("rice", True)
+    assert cache.get("rice") is None
+    assert cache.misses == 1
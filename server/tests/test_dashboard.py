@@ -0,0 +1,41 @@
+import os
+import time
+
+import mongomock
+import pytest
+
+from src.geocode_cache import ReverseGeocodeCache, TokenBucket
+
+os.environ.setdefault("DB_BOOTSTRAP", "0")
+server = pytest.importorskip("server")
+
+PLACE = {"display_name": "Alipurduar, West Bengal", "address": {"state": "West Bengal"}}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = mongomock.MongoClient().db
+    db.users.insert_one({"_id": "u1", "name": "A", "state": "West Bengal"})
+    monkeypatch.setattr(server.mongo, "db", db)
+    monkeypatch.setattr(server, "OPENWEATHER_KEY", None)
+    monkeypatch.setattr(server, "DASHBOARD_BUDGET", 0.5)
+    return server.app.test_client()
+
+
+def test_queued_geocode_gives_up_within_the_budget(client, monkeypatch, tmp_path):
+    # Nominatim queue already 10 s long; the location lookup must not wait it out
+    bucket = TokenBucket(rate=0.1)
+    bucket.acquire()
+    cache = ReverseGeocodeCache(str(tmp_path / "geocode.sqlite3"), lambda lat, lon: PLACE,
+                                limiter=bucket, max_wait=20)
+    monkeypatch.setattr(server, "geocode_cache", cache)
+    monkeypatch.setattr(server.outbound, "submit", lambda *a, **kw: pytest.fail("dashboard used the outbound pool"))
+
+    start = time.monotonic()
+    body = client.get("/api/dashboard?userID=u1&lat=26.49&lon=89.52").get_json()
+    assert time.monotonic() - start < 1.5
+    assert body["location"] is None
+    assert body["errors"]["location"] == "upstream returned 429"
+    assert cache.throttled == 1
+    # The refused lookup did not reserve a slot in the queue
+    assert bucket._tokens > -0.5
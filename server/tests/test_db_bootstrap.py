@@ -0,0 +1,97 @@
+import os
+
+import mongomock
+import pytest
+
+from src.db_bootstrap import (
+    ENDPOINT_QUERIES, NormalizedKeys, bootstrap, duplicate_values, ensure_indexes, explain_collscans,
+    migrate_normalized_keys, normalized_keys,
+)
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().db
+
+
+def seed_legacy(db):
+    # Written before the *_key fields existed
+    db.users.insert_many([
+        {"_id": "s1", "role": "Seller", "state": "West Bengal", "fpcName": "Green  Valley FPC"},
+        {"_id": "s2", "role": " seller ", "state": "Assam"},
+        {"_id": "f1", "role": "farmer", "state": "West Bengal"},
+    ])
+    db.requests.insert_many([
+        {"id": "r1", "fpc_name": "GREEN VALLEY fpc"},
+        {"id": "r2", "fpc_name": "Other FPC"},
+    ])
+    db.notifications.insert_many([
+        {"request_id": "r1", "to": "Green Valley FPC", "read": False},
+    ])
+
+
+def test_fallback_matches_documents_without_keys(db):
+    seed_legacy(db)
+    keys = NormalizedKeys()
+    sellers = db.users.find(keys.query("users", "role_key", "seller"))
+    assert sorted(u["_id"] for u in sellers) == ["s1", "s2"]
+    assert db.users.find_one(keys.query("users", "fpc_name_key", "green valley fpc"))["_id"] == "s1"
+    assert [r["id"] for r in db.requests.find(keys.query("requests", "fpc_name_key", "green valley fpc"))] == ["r1"]
+    assert db.notifications.count_documents(keys.query("notifications", "to_key", "green valley fpc")) == 1
+
+
+def test_fallback_does_not_match_prefixes_or_regex_syntax(db):
+    db.users.insert_many([{"_id": "a", "role": "sellers"}, {"_id": "b", "role": "sel.er"}])
+    keys = NormalizedKeys()
+    assert db.users.count_documents(keys.query("users", "role_key", "seller")) == 0
+    assert db.users.count_documents(keys.query("users", "role_key", "sel.er")) == 1
+
+
+def test_check_is_ready_only_after_backfill(db):
+    seed_legacy(db)
+    keys = NormalizedKeys()
+    assert not keys.check(db)
+    assert "$or" in keys.query("users", "role_key", "seller")
+
+    migrate_normalized_keys(db)
+    assert keys.check(db)
+    assert keys.query("users", "role_key", "seller") == {"role_key": "seller"}
+    assert sorted(u["_id"] for u in db.users.find(keys.query("users", "role_key", "seller"))) == ["s1", "s2"]
+
+
+def test_duplicate_ids_do_not_abort_bootstrap(db, capsys):
+    seed_legacy(db)
+    db.requests.insert_one({"id": "r1", "fpc_name": "Copy"})
+    assert duplicate_values(db.requests, "id") == ["r1"]
+
+    ensure_indexes(db)
+    assert "duplicate values" in capsys.readouterr().out
+    indexes = db.requests.index_information()
+    id_index = next(spec for spec in indexes.values() if spec["key"] == [("id", 1)])
+    assert not id_index.get("unique")
+    # The indexes after the failing one were still created
+    assert any(spec["key"] == [("settlement.status", 1)] for spec in indexes.values())
+
+
+def test_bootstrap_marks_shared_keys_ready(db):
+    seed_legacy(db)
+    normalized_keys.ready.clear()
+    try:
+        bootstrap(db)
+        assert normalized_keys.ready.is_set()
+    finally:
+        normalized_keys.ready.clear()
+
+
+@pytest.mark.skipif(not os.getenv("MONGO_TEST_URI"), reason="needs a real mongod (MONGO_TEST_URI)")
+def test_endpoint_queries_use_indexes():
+    from pymongo import MongoClient
+
+    client = MongoClient(os.getenv("MONGO_TEST_URI"))
+    db = client.get_default_database()
+    try:
+        seed_legacy(db)
+        bootstrap(db)
+        assert explain_collscans(db) == [], f"COLLSCAN among {len(ENDPOINT_QUERIES)} endpoint queries"
+    finally:
+        client.drop_database(db.name)
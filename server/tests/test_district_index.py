@@ -0,0 +1,30 @@
+import math
+import os
+
+import pytest
+
+from src.district_index import DistrictTable
+
+CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "district_centroids.csv")
+
+
+@pytest.fixture(scope="module")
+def table():
+    return DistrictTable(CSV)
+
+
+def test_centroid_maps_to_its_own_district(table):
+    for district_id in range(len(table.names)):
+        assert table.nearest(*table.centroid(district_id)) == district_id
+
+
+def test_point_outside_the_region_has_no_district(table):
+    assert table.nearest(51.5, -0.12) is None
+
+
+@pytest.mark.parametrize("lat, lon", [
+    (math.nan, 89.5), (26.5, math.nan), (math.inf, 89.5), (26.5, -math.inf), (math.nan, math.nan),
+])
+def test_non_finite_coordinates_have_no_district(table, lat, lon):
+    assert table.nearest(lat, lon) is None
+    assert table.nearest(lat, lon, max_km=None) is None
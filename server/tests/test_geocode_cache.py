@@ -0,0 +1,87 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.geocode_cache import ReverseGeocodeCache, TokenBucket, grid_cell
+from src.weather_cache import UpstreamError
+
+PLACE = {"display_name": "Alipurduar, West Bengal", "address": {"state_district": "Alipurduar"}}
+
+
+def test_concurrent_lookups_in_one_cell_make_one_call(tmp_path):
+    calls = []
+
+    def fetch(lat, lon):
+        calls.append((lat, lon))
+        time.sleep(0.2)
+        return PLACE
+
+    cache = ReverseGeocodeCache(str(tmp_path / "geocode.sqlite3"), fetch, limiter=TokenBucket(rate=100.0))
+    with ThreadPoolExecutor(20) as pool:
+        results = list(pool.map(lambda i: cache.lookup(26.4901 + i * 0.00001, 89.5201), range(20)))
+    assert calls == [grid_cell(26.4901, 89.5201)[1:]]
+    assert all(r == PLACE for r in results)
+
+
+def test_misses_in_different_cells_are_paced_by_the_limiter(tmp_path):
+    times = []
+
+    def fetch(lat, lon):
+        times.append(time.monotonic())
+        return PLACE
+
+    cache = ReverseGeocodeCache(str(tmp_path / "geocode.sqlite3"), fetch, limiter=TokenBucket(rate=20.0))
+    # 5 distinct cells requested by 40 concurrent callers
+    points = [(26.49 + (i % 5) * 0.01, 89.52) for i in range(40)]
+    start = time.monotonic()
+    with ThreadPoolExecutor(40) as pool:
+        list(pool.map(lambda p: cache.lookup(*p), points))
+    assert len(times) == 5
+    # The k-th upstream call can't start before the k-th limiter slot (late wake-ups are fine)
+    for k, t in enumerate(sorted(times)):
+        assert t - start >= k * 0.05 - 0.005
+
+
+def test_limiter_refuses_waits_beyond_max_wait():
+    bucket = TokenBucket(rate=1.0)
+    assert bucket.acquire(max_wait=0)
+    start = time.monotonic()
+    assert not bucket.acquire(max_wait=0.5)
+    assert time.monotonic() - start < 0.1
+
+
+def test_full_queue_is_reported_as_throttled(tmp_path):
+    bucket = TokenBucket(rate=0.1)
+    bucket.acquire()
+    cache = ReverseGeocodeCache(str(tmp_path / "geocode.sqlite3"), lambda lat, lon: PLACE,
+                                limiter=bucket, max_wait=0.1)
+    with pytest.raises(UpstreamError) as excinfo:
+        cache.lookup(26.49, 89.52)
+    assert excinfo.value.status == 429
+    assert cache.throttled == 1
+
+
+def test_cache_survives_a_restart(tmp_path):
+    path = str(tmp_path / "geocode.sqlite3")
+    ReverseGeocodeCache(path, lambda lat, lon: PLACE).lookup(26.49, 89.52)
+
+    def unreachable(lat, lon):
+        raise AssertionError("should be served from disk")
+
+    cache = ReverseGeocodeCache(path, unreachable)
+    assert cache.lookup(26.49, 89.52) == PLACE
+    assert cache.hits == 1
+
+
+def test_waiters_get_the_leaders_error(tmp_path):
+    def failing(lat, lon):
+        time.sleep(0.2)
+        raise UpstreamError(503, "down")
+
+    cache = ReverseGeocodeCache(str(tmp_path / "geocode.sqlite3"), failing)
+    with ThreadPoolExecutor(20) as pool:
+        futures = [pool.submit(cache.lookup, 26.60, 89.60) for _ in range(20)]
+    assert all(isinstance(f.exception(), UpstreamError) for f in futures)
+    assert cache.errors == 1
+    assert len(cache) == 0
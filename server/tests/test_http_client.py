@@ -0,0 +1,173 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+
+from src.http_client import CircuitBreaker, HostPolicy, OutboundHTTP, UpstreamUnavailable
+
+COOLDOWN = 0.3
+
+
+class Stub:
+    """Local upstream whose status and delay the test controls; counts the requests it gets."""
+
+    def __init__(self):
+        self.status = 200
+        self.delay = 0.0
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits += 1
+                time.sleep(stub.delay)
+                try:
+                    self.send_response(stub.status)
+                    self.send_header("Content-Length", "2")
+                    self.end_headers()
+                    self.wfile.write(b"{}")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/x"
+        self.host = urlsplit(self.url).netloc
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def stub():
+    stub = Stub()
+    yield stub
+    stub.server.shutdown()
+
+
+@pytest.fixture
+def http(stub):
+    return OutboundHTTP(policies={stub.host: HostPolicy(
+        read_timeout=0.3, max_concurrency=4, acquire_timeout=0.05, retries=2,
+        backoff_base=0.01, failure_threshold=3, cooldown=COOLDOWN,
+    )})
+
+
+def open_circuit(http, stub):
+    stub.status = 503
+    for _ in range(3):
+        http.get(stub.url, retries=0)
+    assert http.stats()[stub.host]["state"] == "open"
+
+
+def test_read_timeout_is_not_retried(http, stub):
+    stub.delay = 1.0
+    start = time.monotonic()
+    with pytest.raises(requests.ReadTimeout):
+        http.get(stub.url)
+    assert time.monotonic() - start < 0.8
+    assert stub.hits == 1
+    assert http.stats()[stub.host]["timeouts"] == 1
+
+
+def test_burst_beyond_the_host_limit_fails_fast(http, stub):
+    stub.delay = 0.2
+    futures = [http.submit(http.get, stub.url, retries=0) for _ in range(10)]
+    reasons = []
+    for f in futures:
+        try:
+            f.result()
+        except UpstreamUnavailable as e:
+            reasons.append(e.reason)
+    assert stub.hits == 4
+    assert reasons == ["too many concurrent requests"] * 6
+
+
+def test_retryable_status_is_retried_then_the_circuit_opens(http, stub):
+    stub.status = 503
+    assert http.get(stub.url).status_code == 503
+    assert stub.hits == 3  # one call, two retries
+    for _ in range(2):
+        http.get(stub.url, retries=0)
+    assert http.stats()[stub.host]["state"] == "open"
+    hits = stub.hits
+    with pytest.raises(UpstreamUnavailable) as excinfo:
+        http.get(stub.url)
+    assert excinfo.value.reason == "circuit open"
+    assert stub.hits == hits
+
+
+def test_half_open_lets_one_trial_through(http, stub):
+    open_circuit(http, stub)
+    time.sleep(COOLDOWN + 0.05)
+    assert http.stats()[stub.host]["state"] == "half-open"
+    stub.status, stub.delay = 200, 0.2
+    outcomes = []
+
+    def call():
+        try:
+            outcomes.append(http.get(stub.url, retries=0).status_code)
+        except UpstreamUnavailable as e:
+            outcomes.append(e.reason)
+
+    with ThreadPoolExecutor(4) as pool:
+        for _ in range(4):
+            pool.submit(call)
+    assert sorted(outcomes, key=str) == [200] + ["circuit open"] * 3
+    assert http.stats()[stub.host]["state"] == "closed"
+
+
+def test_failed_trial_reopens_the_circuit(http, stub):
+    open_circuit(http, stub)
+    time.sleep(COOLDOWN + 0.05)
+    http.get(stub.url, retries=0)  # still 503
+    assert http.stats()[stub.host]["state"] == "open"
+
+
+def test_trial_without_a_slot_is_cancelled(http, stub):
+    open_circuit(http, stub)
+    time.sleep(COOLDOWN + 0.05)
+    stub.status = 200
+    state = http._host(stub.host)
+    for _ in range(4):
+        state.slots.acquire()
+    with pytest.raises(UpstreamUnavailable) as excinfo:
+        http.get(stub.url)
+    assert excinfo.value.reason == "too many concurrent requests"
+    for _ in range(4):
+        state.slots.release()
+    # The trial was given back, so the next call may still run it
+    assert http.get(stub.url).status_code == 200
+    assert http.stats()[stub.host]["state"] == "closed"
+
+
+@pytest.mark.parametrize("error", [requests.TooManyRedirects("loop"), requests.exceptions.ChunkedEncodingError("eof")])
+def test_every_failure_is_recorded(http, stub, monkeypatch, error):
+    open_circuit(http, stub)
+    time.sleep(COOLDOWN + 0.05)
+
+    def fail(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(http.session, "request", fail)
+    with pytest.raises(type(error)):
+        http.get(stub.url)
+    # The trial ended as a failure instead of leaving the circuit half-open forever
+    assert http.stats()[stub.host]["state"] == "open"
+    monkeypatch.undo()
+    stub.status = 200
+    time.sleep(COOLDOWN + 0.05)
+    assert http.get(stub.url).status_code == 200
+
+
+def test_breaker_cancel_frees_the_trial():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record(False)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.cancel()
+    assert breaker.allow()
@@ -0,0 +1,59 @@
+import os
+import pickle
+import sys
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from src import index_eval  # noqa: E402
+from src.model_registry import models  # noqa: E402
+
+CHUNKS = [{"text": f"chunk {i}"} for i in range(6)]
+
+
+class Encoder:
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        return np.eye(len(texts), 8, dtype=np.float32)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    with open(tmp_path / "metadata.pkl", "wb") as f:
+        pickle.dump(CHUNKS, f)
+    encoder = Encoder()
+    monkeypatch.setattr(models, "acquire", lambda name: encoder)
+    return tmp_path, encoder
+
+
+def test_store_shipped_without_an_index_is_encoded(store):
+    path, encoder = store
+    vectors = index_eval.corpus_vectors(str(path), "all-MiniLM-L6-v2")
+    assert vectors.shape == (len(CHUNKS), 8) and encoder.calls == 1
+
+
+def test_saved_flat_index_is_reconstructed(store):
+    path, encoder = store
+    saved = np.arange(len(CHUNKS) * 4, dtype=np.float32).reshape(len(CHUNKS), 4)
+    index = faiss.IndexFlatL2(4)
+    index.add(saved)
+    faiss.write_index(index, os.path.join(path, "faiss.index"))
+    assert np.array_equal(index_eval.corpus_vectors(str(path), "all-MiniLM-L6-v2"), saved)
+    assert encoder.calls == 0
+
+
+def test_fallback_rows_are_labelled_with_the_built_index(monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["index_eval", "--synthetic", "150", "--num-queries", "10",
+                                      "--types", "ivf_flat,ivf_pq"])
+    assert index_eval.main() == 0
+    rows = [line.split() for line in capsys.readouterr().out.splitlines()
+            if line.split() and line.split()[0] in index_eval.SWEEPS]
+    # ivf_pq can't be trained on 150 vectors: one flat row, no nprobe sweep
+    assert [r[:2] for r in rows if r[0] == "flat"] == [["flat", "-"]]
+    # nprobe stops at nlist (3 lists for 150 vectors)
+    assert [r[1] for r in rows if r[0] == "ivf_flat"] == ["nprobe=1", "nprobe=3"]
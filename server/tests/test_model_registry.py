@@ -0,0 +1,82 @@
+import threading
+import time
+
+from src.model_registry import ModelRegistry
+
+NAME = "all-MiniLM-L6-v2"
+
+
+class Loader:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, name, device):
+        self.calls += 1
+        time.sleep(self.delay)
+        return object()
+
+
+def test_concurrent_acquires_share_one_load():
+    registry = ModelRegistry(loader=Loader(delay=0.2))
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(registry.acquire(NAME))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert registry.loads == 1 and len({id(m) for m in got}) == 1
+    assert registry.stats()["models"][f"{NAME}@auto"]["refs"] == 5
+
+
+def test_model_is_unloaded_after_the_last_release():
+    loader = Loader()
+    registry = ModelRegistry(loader=loader)
+    first = registry.acquire(NAME)
+    assert registry.acquire(NAME) is first
+    registry.release(NAME)
+    assert registry.stats()["models"][f"{NAME}@auto"]["refs"] == 1
+    registry.release(NAME)
+    assert registry.stats()["models"] == {}
+    assert registry.acquire(NAME) is not first and loader.calls == 2
+
+
+def test_devices_are_separate_models():
+    registry = ModelRegistry(loader=Loader())
+    assert registry.acquire(NAME, "cpu") is not registry.acquire(NAME, "cuda")
+    registry.release(NAME, "cpu")
+    assert list(registry.stats()["models"]) == [f"{NAME}@cuda"]
+
+
+def test_release_waits_for_an_acquire_of_the_same_model():
+    registry = ModelRegistry(loader=Loader())
+    registry.acquire(NAME)
+    key_lock = registry._key_lock(registry._key(NAME))
+    with key_lock:  # an acquire that has found the model but not counted its reference yet
+        releasing = threading.Thread(target=registry.release, args=(NAME,))
+        releasing.start()
+        releasing.join(0.1)
+        assert releasing.is_alive()
+        assert registry.stats()["models"][f"{NAME}@auto"]["refs"] == 1
+    releasing.join(1)
+    assert registry.stats()["models"] == {}
+
+
+def test_references_balance_under_concurrent_use():
+    loader = Loader()
+    registry = ModelRegistry(loader=loader)
+    holder = registry.acquire(NAME)
+
+    def churn():
+        for _ in range(200):
+            registry.acquire(NAME)
+            registry.release(NAME)
+
+    threads = [threading.Thread(target=churn) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # The first reference was held throughout, so the model never left
+    assert loader.calls == 1 and registry.acquire(NAME) is holder
+    assert registry.stats()["models"][f"{NAME}@auto"]["refs"] == 2
@@ -0,0 +1,115 @@
+import os
+
+import mongomock
+import pytest
+
+os.environ.setdefault("DB_BOOTSTRAP", "0")
+server = pytest.importorskip("server")
+
+FPC = "Green Valley FPC"
+KEY = "green valley fpc"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(server.mongo, "db", db)
+    return db
+
+
+@pytest.fixture
+def client(db):
+    return server.app.test_client()
+
+
+def seed_pre_deploy(db, unread=5, read=2):
+    """Requests and notifications written before notification_unread existed."""
+    db.users.insert_one({"_id": "fpc1", "role": "seller", "role_key": "seller", "fpcName": FPC, "fpc_name_key": KEY})
+    for i in range(unread + read):
+        rid = f"r{i}"
+        db.requests.insert_one({"id": rid, "fpc_name": FPC, "fpc_name_key": KEY, "status": "pending",
+                                "crop": "rice", "region": "x", "price": 1})
+        db.notifications.insert_one({"id": f"n{i}", "seq": i + 1, "to": FPC, "to_key": KEY,
+                                     "read": i >= unread, "request_id": rid})
+
+
+def stored_unread(db):
+    return db.notification_unread.find_one({"_id": KEY})["unread"]
+
+
+def actual_unread(db):
+    return db.notifications.count_documents({"to_key": KEY, "read": False})
+
+
+def test_first_new_request_counts_once(db, client):
+    seed_pre_deploy(db)
+    r = client.post("/api/request", json={"fpc_name": FPC, "farmer_name": "A", "farmer_id": "f1",
+                                          "crop": "rice", "region": "x", "price": 10})
+    assert r.status_code == 201
+    assert stored_unread(db) == actual_unread(db) == 6
+
+
+def test_first_mark_read_counts_once(db, client):
+    seed_pre_deploy(db)
+    client.post("/api/reject/r0")
+    assert stored_unread(db) == actual_unread(db) == 4
+
+
+def test_first_delete_counts_once(db, client):
+    seed_pre_deploy(db)
+    client.post("/api/request/delete/r1")
+    assert stored_unread(db) == actual_unread(db) == 4
+
+
+def test_counter_created_without_seed_is_not_double_counted(db):
+    seed_pre_deploy(db)
+    db.notifications.update_many({"request_id": {"$in": ["r0", "r1"]}}, {"$set": {"read": True}})
+    assert server.bump_unread(KEY, -2) == actual_unread(db) == 3
+    assert stored_unread(db) == 3
+
+
+def read_events(response, count, timeout=5.0):
+    """The first `count` notification/unread SSE events of a streamed response."""
+    import time
+
+    events, deadline = [], time.monotonic() + timeout
+    for chunk in response.response:
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if text.startswith("id:") or text.startswith("event:"):
+            fields = dict(line.split(": ", 1) for line in text.strip().split("\n"))
+            events.append(fields)
+        if len(events) >= count or time.monotonic() > deadline:
+            break
+    return events
+
+
+def test_reconnect_replays_the_whole_backlog(db, client, monkeypatch):
+    monkeypatch.setattr(server, "NOTIFICATION_STREAM_POLL", 0.05)
+    db.notifications.insert_many([{"id": f"n{i}", "seq": i, "to": FPC, "to_key": KEY, "read": True}
+                                  for i in range(1, 251)])
+    response = client.get(f"/api/notifications/stream?fpc_name={FPC}", headers={"Last-Event-ID": "10"},
+                          buffered=False)
+    try:
+        events = read_events(response, 241)
+    finally:
+        response.close()
+    ids = [int(e["id"]) for e in events if e.get("event") == "notification"]
+    assert ids == list(range(11, 251))
+
+
+def test_notifications_from_another_worker_reach_open_streams(db, client, monkeypatch):
+    monkeypatch.setattr(server, "NOTIFICATION_STREAM_POLL", 0.05)
+    db.counters.insert_one({"_id": "notifications", "seq": 7})
+    response = client.get(f"/api/notifications/stream?fpc_name={FPC}", buffered=False)
+    try:
+        chunks = iter(response.response)
+        assert "retry" in next(chunks).decode()
+        assert "unread" in next(chunks).decode()
+        # Written by another worker: no publish on this process's hub
+        db.notifications.insert_one({"id": "n8", "seq": 8, "to": FPC, "to_key": KEY, "read": False})
+        server.bump_unread(KEY, 1)
+        events = read_events(response, 2)
+    finally:
+        response.close()
+    assert events[0] == {"id": "8", "event": "notification", "data": events[0]["data"]}
+    assert events[1]["event"] == "unread" and '"unread": 1' in events[1]["data"]
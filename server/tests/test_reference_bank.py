@@ -0,0 +1,88 @@
+import os
+import threading
+import zlib
+
+import numpy as np
+import pytest
+
+from src.reference_bank import ReferenceBank
+
+MODEL = "all-MiniLM-L6-v2"
+PHRASES = ["crop rotation", "soil fertility", "paddy irrigation", "pest control"]
+
+
+class Encoder:
+    """Hashing stand-in for SentenceTransformer.encode; records what it was asked to encode."""
+
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return np.stack([np.random.default_rng(zlib.crc32(t.encode())).standard_normal(16) for t in texts])
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "agri_reference.npz")
+
+
+def test_warm_start_encodes_nothing(path):
+    ReferenceBank(Encoder(), MODEL, path).set_bank("en", PHRASES)
+    encoder = Encoder()
+    bank = ReferenceBank(encoder, MODEL, path)
+    assert bank.set_bank("en", PHRASES) == 0
+    assert encoder.texts == []
+    # A query identical to a reference phrase scores 1.0
+    assert bank.max_similarity(Encoder()([PHRASES[2]])[0], "en") == pytest.approx(1.0, abs=1e-5)
+
+
+def test_only_new_phrases_are_encoded(path):
+    ReferenceBank(Encoder(), MODEL, path).set_bank("en", PHRASES)
+    encoder = Encoder()
+    bank = ReferenceBank(encoder, MODEL, path)
+    bank.set_bank("en", PHRASES + ["drip irrigation"])
+    assert encoder.texts == ["drip irrigation"]
+    assert bank.extend("en", ["mulching"]) == 1
+
+
+def test_model_change_re_encodes_everything(path):
+    ReferenceBank(Encoder(), MODEL, path).set_bank("en", PHRASES)
+    encoder = Encoder()
+    ReferenceBank(encoder, "paraphrase-multilingual-MiniLM-L12-v2", path).set_bank("en", PHRASES)
+    assert sorted(encoder.texts) == sorted(PHRASES)
+    # The file now belongs to the new model, so the old one starts cold again
+    encoder = Encoder()
+    ReferenceBank(encoder, MODEL, path).set_bank("en", PHRASES)
+    assert sorted(encoder.texts) == sorted(PHRASES)
+
+
+def test_banks_not_set_in_this_run_are_kept(path):
+    first = ReferenceBank(Encoder(), MODEL, path)
+    first.set_bank("en", PHRASES)
+    first.set_bank("hi", ["फसल चक्र"])
+    ReferenceBank(Encoder(), MODEL, path).set_bank("en", PHRASES[:2])
+    encoder = Encoder()
+    ReferenceBank(encoder, MODEL, path).set_bank("hi", ["फसल चक्र"])
+    assert encoder.texts == []
+
+
+def test_concurrent_writers_do_not_share_a_temp_file(path):
+    errors = []
+
+    def start_worker(i):
+        try:
+            ReferenceBank(Encoder(), MODEL, path).set_bank("en", PHRASES + [f"phrase {i}"])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=start_worker, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert os.listdir(os.path.dirname(path)) == [os.path.basename(path)]
+    encoder = Encoder()
+    ReferenceBank(encoder, MODEL, path).set_bank("en", PHRASES)
+    assert encoder.texts == []
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from src.scheme_engine.engine import _loop_scores, get_index, recommend_schemes, recommend_schemes_batch
+
+PAIRS = [
+    ("rice", "west bengal"), ("paddy", "assam"), ("wheat", "punjab"),
+    ("fish", "kerala"), ("goat", "rajasthan"), ("tea", "assam"),
+    ("crop insurance", "odisha"), ("milk", "gujarat"), ("pea", "uttarakhand"),
+    ("mango", "puducherry"),
+]
+
+
+@pytest.mark.parametrize("crop,state", PAIRS)
+def test_vectorized_scores_match_the_row_loop(crop, state):
+    index = get_index()
+    fast = index.scorer.score(crop, state)
+    slow = _loop_scores(index, crop, state)
+    assert np.allclose(fast, slow)
+    assert fast.argmax() == slow.argmax()
+
+
+def test_batch_scores_match_single():
+    index = get_index()
+    batch = [PAIRS[i % len(PAIRS)] for i in range(50)]
+    scores = index.scorer.score_batch([c for c, _ in batch], [s for _, s in batch])
+    for (crop, state), row in zip(batch, scores):
+        assert np.allclose(row, index.scorer.score(crop, state))
+
+
+def test_batch_recommendations_match_single():
+    batch = PAIRS[:4]
+    assert recommend_schemes_batch(batch, k=3) == [recommend_schemes(crop, state, k=3)[0] for crop, state in batch]
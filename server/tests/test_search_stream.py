@@ -0,0 +1,104 @@
+import zlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_groq")
+pytest.importorskip("faiss")
+
+from src.answer_cache import SemanticAnswerCache  # noqa: E402
+from src.classification_cache import make_classification_cache  # noqa: E402
+from src.search import RAGSearch  # noqa: E402
+from src.summarizer import ChunkSummarizer, FakeLLM  # noqa: E402
+
+
+class Store:
+    generation = 1
+
+    def query(self, query, top_k=5):
+        return [{"metadata": {"text": f"chunk {i}: paddy needs nitrogen in split doses"}} for i in range(top_k)]
+
+
+class BagOfWords:
+    def encode(self, text, normalize_embeddings=True):
+        v = np.zeros(256, dtype=np.float32)
+        for word in text.replace("?", " ").split():
+            v[zlib.crc32(word.encode()) % 256] += 1
+        return v / np.linalg.norm(v)
+
+
+class BrokenLLM(FakeLLM):
+    def stream(self, messages, token_delay=0.0):
+        yield self.Reply("Apply ")
+        raise RuntimeError("connection reset")
+
+
+@pytest.fixture
+def rag():
+    rag = RAGSearch.__new__(RAGSearch)
+    rag.llm = FakeLLM(median=0.01, slow_every=10**9)
+    rag.summarizer = ChunkSummarizer(rag.llm, mode="single")
+    rag.vectorstore = Store()
+    rag.classifier_model = BagOfWords()
+    rag.answer_cache = SemanticAnswerCache(threshold=0.9)
+    rag.is_agriculture_query = lambda query, chat_context="", q_emb=None: True
+    return rag
+
+
+def test_tokens_add_up_to_the_final_reply(rag):
+    events = list(rag.stream_answer("how much urea for paddy?"))
+    stages = [data["stage"] for event, data in events if event == "status"]
+    assert stages == ["classifying", "retrieving", "summarizing", "answering"]
+    tokens = "".join(data["text"] for event, data in events if event == "token")
+    assert events[-1][0] == "done"
+    assert tokens.strip() == events[-1][1]["reply"]
+
+
+def test_repeated_question_is_answered_from_the_cache(rag):
+    first = rag.search_and_summarize("how much urea for paddy?")
+    calls = rag.llm.calls
+    events = list(rag.stream_answer("How much urea for paddy"))
+    assert events[-1] == ("done", {"reply": first, "cached": True})
+    assert rag.llm.calls == calls
+
+
+def test_broken_stream_is_marked_incomplete_and_not_cached(rag):
+    rag.llm = BrokenLLM()
+    events = list(rag.stream_answer("how much urea for paddy?"))
+    assert events[-1] == ("done", {"reply": "Apply", "incomplete": True})
+    assert rag.answer_cache.stats()["entries"] == 0
+
+
+def test_off_topic_refusal_is_not_cached(rag):
+    rag.is_agriculture_query = lambda query, chat_context="", q_emb=None: False
+    reply = rag.search_and_summarize("what is the capital of France?")
+    assert "agricultural" in reply
+    assert rag.answer_cache.stats()["entries"] == 0
+
+
+class CountingEncoder(BagOfWords):
+    def __init__(self):
+        self.texts = []
+
+    def encode(self, text, normalize_embeddings=True):
+        self.texts.append(text)
+        return super().encode(text, normalize_embeddings)
+
+
+class Bank:
+    def max_similarity(self, query_embedding, bank=None):
+        return 0.5
+
+
+def test_question_without_context_is_encoded_once(rag):
+    del rag.is_agriculture_query  # the real classifier, past its keyword check
+    rag.classifier_model = CountingEncoder()
+    rag.quick_positive_keywords = []
+    rag.class_cache = make_classification_cache("memory")
+    rag.reference_bank = Bank()
+    rag.high_threshold, rag.low_threshold = 0.40, 0.28
+    rag.search_and_summarize("how much urea for paddy?")
+    assert rag.classifier_model.texts == ["how much urea for paddy?"]
+
+    list(rag.stream_answer("and for wheat?", chat_context="how much urea for paddy?"))
+    assert rag.classifier_model.texts[1:] == ["how much urea for paddy? and for wheat?"]
@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.seller_index import (
+    WEIGHT_BM25, WEIGHT_COMMODITY, WEIGHT_DISTRICT, WEIGHT_EXPERIENCE, WEIGHT_RATING, SellerIndex,
+    district_similarity_score, normalize_array, preprocess_text_for_bm25, seller_doc_tokens, seller_from_user_doc,
+)
+
+BM25Okapi = pytest.importorskip("rank_bm25").BM25Okapi
+
+FPC_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "FPC_sample_alipurduar.csv")
+
+
+@pytest.fixture(scope="module")
+def users():
+    fpcs = pd.read_csv(FPC_CSV, encoding="latin-1").fillna("")
+    return [
+        {"_id": f"fpc{i}", "fpcName": r["FPC_Name"], "district": r["District"],
+         "commodities": r["Commodities"], "address": r["Address"]}
+        for i, r in fpcs.iterrows()
+    ]
+
+
+def reference_match(users, query):
+    """/api/recommend scores without a crop filter, with rank_bm25 for the BM25 term."""
+    sellers = [seller_from_user_doc(u) for u in users]
+    tokens = preprocess_text_for_bm25(query)
+    bm25 = BM25Okapi([seller_doc_tokens(s) for s in sellers]).get_scores(tokens)
+    bm25 = bm25 / (bm25.max() if bm25.max() > 0 else 1.0)
+    rating = normalize_array(np.array([s["rating"] for s in sellers]))
+    experience = normalize_array(np.array([s["years_of_experience"] for s in sellers]))
+    district = np.array([district_similarity_score(query, s["district"]) for s in sellers])
+    final = (rating * WEIGHT_RATING + district * WEIGHT_DISTRICT + 0.5 * WEIGHT_COMMODITY +
+             experience * WEIGHT_EXPERIENCE + bm25 * WEIGHT_BM25)
+    return {s["_id"]: round(float(score) * 100, 1) for s, score in zip(sellers, final)}
+
+
+@pytest.mark.parametrize("query", ["paddy alipurduar", "falakata", "vegetables jute", "company ltd"])
+def test_bm25_scores_match_rank_bm25_after_updates(users, query):
+    index = SellerIndex(lambda: users)
+    index.rebuild()
+    index.remove("fpc0")
+    index.upsert(users[0])
+
+    page, total = index.rank("", district_input=query, limit=len(users))
+    assert total == len(users)
+    assert {r["fpc_id"]: r["match_percentage"] for r in page} == reference_match(users, query)
+    scores = [r["match_percentage"] for r in page]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_removed_seller_is_not_returned(users):
+    index = SellerIndex(lambda: users)
+    index.rebuild()
+    index.remove("fpc1")
+    assert "fpc1" not in index._slot_of
+    assert len(index) == len(users) - 1
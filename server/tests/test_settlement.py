@@ -0,0 +1,207 @@
+import re
+import threading
+import time
+
+import pytest
+import requests
+
+web3 = pytest.importorskip("web3")
+pytest.importorskip("eth_tester")
+
+from web3 import EthereumTesterProvider, Web3  # noqa: E402
+
+from src.settlement import CONFIRMED, FAILED, PENDING, SUBMITTED, NonceManager, SettlementQueue  # noqa: E402
+
+ABI = [{
+    "inputs": [
+        {"name": "farmer", "type": "address"}, {"name": "seller", "type": "address"},
+        {"name": "crop", "type": "string"}, {"name": "region", "type": "string"},
+        {"name": "price", "type": "uint256"},
+    ],
+    "name": "createDeal", "outputs": [{"name": "dealId", "type": "bytes32"}],
+    "stateMutability": "nonpayable", "type": "function",
+}]
+
+
+class LockedTesterProvider(EthereumTesterProvider):
+    """eth-tester is not thread-safe; a real node handles this itself."""
+
+    _lock = threading.Lock()
+
+    def make_request(self, method, params):
+        with self._lock:
+            return super().make_request(method, params)
+
+
+def parse_nonce_error(text: str):
+    """(expected, got) from eth-tester's "Invalid transaction nonce: Expected 1, but got 0"."""
+    match = re.search(r"Expected (\d+), but got (\d+)", text)
+    return (int(match[1]), int(match[2])) if match else (None, None)
+
+
+class FlakySendProvider(LockedTesterProvider):
+    """
+    Every third eth_sendRawTransaction raises a read timeout, either after
+    the node took the transaction or before it reached the node. Stale
+    nonces are reported the way geth does ("nonce too low").
+    """
+
+    def __init__(self, tester, timeout_after_send: bool = True):
+        super().__init__(tester)
+        self.timeout_after_send = timeout_after_send
+        self.sends = 0
+
+    def make_request(self, method, params):
+        if method != "eth_sendRawTransaction":
+            return super().make_request(method, params)
+        self.sends += 1
+        timeout = self.sends % 3 == 1
+        if timeout and not self.timeout_after_send:
+            raise requests.exceptions.ReadTimeout("read timed out")
+        try:
+            response = super().make_request(method, params)
+        except Exception as e:
+            expected, got = parse_nonce_error(str(e))
+            if got is not None and got < expected:
+                raise ValueError("nonce too low") from e
+            raise
+        if timeout:
+            raise requests.exceptions.ReadTimeout("read timed out")
+        return response
+
+
+@pytest.fixture
+def chain():
+    provider = LockedTesterProvider()
+    w3 = Web3(provider)
+    deployer = w3.eth.accounts[0]
+
+    def deploy(runtime: bytes) -> str:
+        # Init code that returns `runtime` as the contract code
+        init = bytes([0x60, len(runtime), 0x60, 0x0c, 0x60, 0x00, 0x39, 0x60, len(runtime), 0x60, 0x00, 0xf3])
+        tx = w3.eth.send_transaction({"from": deployer, "data": init + runtime})
+        return w3.eth.get_transaction_receipt(tx)["contractAddress"]
+
+    provider.accepting = deploy(bytes([0x00]))                  # STOP: every call succeeds
+    provider.reverting = deploy(bytes([0x60, 0x00, 0x80, 0xfd]))  # REVERT(0, 0)
+    provider.keys = [k.to_hex() for k in provider.ethereum_tester.backend.account_keys]
+    return provider
+
+
+class Statuses:
+    def __init__(self):
+        self.by_job = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, job_id, fields):
+        with self.lock:
+            self.by_job.setdefault(job_id, []).append(fields)
+
+    def final(self, job_id):
+        with self.lock:
+            history = self.by_job.get(job_id) or [{}]
+        return history[-1].get("status")
+
+    def wait(self, job_ids, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if all(self.final(j) in (CONFIRMED, FAILED) for j in job_ids):
+                return True
+            time.sleep(0.05)
+        return False
+
+
+def test_deals_confirm_with_unique_nonces_and_reverts_fail(chain):
+    w3 = Web3(chain)
+    statuses = Statuses()
+    settle = SettlementQueue(w3, chain.keys[1], chain.accepting, ABI, statuses, poll_interval=0.05)
+    failing = SettlementQueue(w3, chain.keys[2], chain.reverting, ABI, statuses, poll_interval=0.05)
+    jobs = [f"deal-{i}" for i in range(20)]
+    for i, job in enumerate(jobs):
+        settle.enqueue(job, "rice", "Alipurduar", 1000 + i)
+    failing.enqueue("deal-revert", "jute", "Jalpaiguri", 1)
+
+    assert statuses.wait(jobs + ["deal-revert"])
+    assert all(statuses.final(j) == CONFIRMED for j in jobs)
+    assert [s["status"] for s in statuses.by_job["deal-revert"]] == [PENDING, SUBMITTED, FAILED]
+    nonces = [statuses.by_job[j][1]["nonce"] for j in jobs]
+    assert sorted(nonces) == list(range(len(jobs)))
+    assert settle.stats()[CONFIRMED] == len(jobs) and settle.stats()["in_flight"] == 0
+
+
+def test_send_that_timed_out_after_reaching_the_node_is_not_repeated(chain):
+    flaky = FlakySendProvider(chain.ethereum_tester)
+    statuses = Statuses()
+    settle = SettlementQueue(Web3(flaky), chain.keys[3], chain.accepting, ABI, statuses, poll_interval=0.05)
+    jobs = [f"flaky-{i}" for i in range(9)]
+    for i, job in enumerate(jobs):
+        settle.enqueue(job, "rice", "Alipurduar", i)
+
+    assert statuses.wait(jobs)
+    assert all(statuses.final(j) == CONFIRMED for j in jobs)
+    # Each timed-out send was found on the node instead of being sent again
+    assert flaky.sends == len(jobs)
+    assert Web3(chain).eth.get_transaction_count(settle.account.address) == len(jobs)
+
+
+def test_send_that_never_reached_the_node_is_resent_unchanged(chain):
+    flaky = FlakySendProvider(chain.ethereum_tester, timeout_after_send=False)
+    statuses = Statuses()
+    settle = SettlementQueue(Web3(flaky), chain.keys[4], chain.accepting, ABI, statuses, poll_interval=0.05)
+    # One at a time: eth-tester rejects the later nonces a real node would queue
+    for i in range(4):
+        settle.enqueue(f"lost-{i}", "rice", "Alipurduar", i)
+        assert statuses.wait([f"lost-{i}"])
+        assert statuses.final(f"lost-{i}") == CONFIRMED
+
+    assert flaky.sends > 4
+    assert Web3(chain).eth.get_transaction_count(settle.account.address) == 4
+    assert sorted(statuses.by_job[f"lost-{i}"][-2]["nonce"] for i in range(4)) == [0, 1, 2, 3]
+
+
+def test_find_sent_looks_the_transaction_up_after_a_timeout(chain):
+    w3 = Web3(chain)
+    settle = SettlementQueue(w3, chain.keys[7], chain.accepting, ABI, Statuses(), poll_interval=60)
+    timeout = requests.exceptions.ReadTimeout("read timed out")
+    signed = settle._build("rice", "Alipurduar", 1, None, None, nonce=settle.nonces.allocate())
+
+    assert settle._find_sent(signed, timeout) is None
+    w3.eth.send_raw_transaction(signed.raw_transaction)
+    assert settle._find_sent(signed, timeout) == w3.to_hex(signed.hash)
+    assert settle._find_sent(None, timeout) is None
+
+
+def test_stale_nonce_is_resynced(chain):
+    w3 = Web3(chain)
+    flaky = FlakySendProvider(chain.ethereum_tester)
+    flaky.sends = 1  # no timeouts for the first two sends
+    statuses = Statuses()
+    settle = SettlementQueue(Web3(flaky), chain.keys[5], chain.accepting, ABI, statuses, poll_interval=0.05)
+    settle.enqueue("first", "rice", "Alipurduar", 1)
+    assert statuses.wait(["first"])
+    # Another client of the same account takes the next nonce
+    w3.eth.send_transaction({"from": settle.account.address, "to": settle.account.address, "value": 1})
+
+    settle.enqueue("second", "rice", "Alipurduar", 2)
+    assert statuses.wait(["second"])
+    assert statuses.final("second") == CONFIRMED
+    assert statuses.by_job["second"][-2]["nonce"] == 2
+
+
+def test_nonce_manager_reuses_released_and_resyncs_forward(chain):
+    w3 = Web3(chain)
+    address = w3.eth.account.from_key(chain.keys[6]).address
+    nonces = NonceManager(w3, address)
+    assert [nonces.allocate() for _ in range(3)] == [0, 1, 2]
+    nonces.release(1)
+    assert nonces.allocate() == 1
+    assert nonces.allocate() == 3
+
+    nonces.release(0)
+    nonces.release(2)
+    for _ in range(2):
+        w3.eth.send_transaction({"from": address, "to": address, "value": 1})
+    # The chain is at 2: released 0 is gone, released 2 is still usable,
+    # and resync never moves backwards past what was handed out
+    nonces.resync()
+    assert [nonces.allocate() for _ in range(2)] == [2, 4]
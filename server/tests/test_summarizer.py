@@ -0,0 +1,87 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.summarizer import AUTO, MAP, SINGLE, ChunkSummarizer, FakeLLM, estimate_tokens
+
+CHUNKS = [f"Paddy chunk {i}: " + "nitrogen split doses at tillering and panicle initiation. " * 15 for i in range(5)]
+
+
+def test_fake_llm_latency_is_deterministic_per_prompt():
+    a, b = FakeLLM(), FakeLLM()
+    prompts = [f"question {i}" for i in range(50)]
+    assert [a.latency(p) for p in prompts] == [b.latency(p) for p in prompts]
+    assert sum(a.latency(p) == a.slow for p in prompts) < len(prompts)
+
+
+def test_fake_llm_stream_yields_the_reply_word_by_word():
+    llm = FakeLLM(median=0.01)
+    prompt = "how much urea for paddy per acre"
+    words = [chunk.content for chunk in llm.stream([prompt], token_delay=0)]
+    assert len(words) == len(prompt.split(" "))
+    assert "".join(words).strip() == llm.invoke([prompt]).content
+
+
+def test_single_mode_packs_within_budget_without_llm_calls():
+    llm = FakeLLM()
+    summarizer = ChunkSummarizer(llm, mode=SINGLE, token_budget=300)
+    context, mode = summarizer.context("urea for paddy?", CHUNKS)
+    assert mode == SINGLE and llm.calls == 0
+    assert context.startswith("[1] Paddy chunk 0")
+    assert estimate_tokens(context) <= 300 + len(CHUNKS) * 2
+
+
+def test_auto_mode_maps_only_when_chunks_do_not_fit():
+    llm = FakeLLM(median=0.02, slow_every=10**9)
+    assert ChunkSummarizer(llm, mode=AUTO, token_budget=100000).context("q", CHUNKS)[1] == SINGLE
+    assert ChunkSummarizer(llm, mode=AUTO, token_budget=100).context("q", CHUNKS)[1] == MAP
+
+
+def test_map_mode_summarizes_chunks_concurrently():
+    llm = FakeLLM(median=0.2, slow_every=10**9)
+    summarizer = ChunkSummarizer(llm, mode=MAP, workers=5, timeout=5)
+    start = time.perf_counter()
+    context, mode = summarizer.context("urea for paddy?", CHUNKS)
+    elapsed = time.perf_counter() - start
+    assert mode == MAP and llm.calls == len(CHUNKS)
+    assert context.count("Summarize this chunk") == len(CHUNKS)
+    assert elapsed < 0.2 * 1.6 * 2  # concurrent, not ~5 calls back to back
+
+
+def test_summaries_past_the_deadline_are_dropped():
+    llm = FakeLLM(median=0.02, slow=1.0, slow_every=1)  # every call is slow
+    summarizer = ChunkSummarizer(llm, mode=MAP, workers=5, timeout=0.2)
+    start = time.perf_counter()
+    context, mode = summarizer.context("urea for paddy?", CHUNKS)
+    assert time.perf_counter() - start < 0.6
+    # Nothing came back in time: the chunks are packed instead
+    assert mode == SINGLE and context.startswith("[1] Paddy chunk 0")
+
+
+def test_map_mode_is_skipped_while_abandoned_calls_hold_the_pool():
+    llm = FakeLLM(median=0.02, slow=1.0, slow_every=1)
+    summarizer = ChunkSummarizer(llm, mode=MAP, workers=5, timeout=0.1)
+    summarizer.context("first", CHUNKS)
+    calls = llm.calls
+    context, mode = summarizer.context("second", CHUNKS)
+    assert mode == SINGLE and summarizer.saturated == 1
+    assert llm.calls == calls  # nothing queued behind the abandoned calls
+
+    time.sleep(1.2)
+    llm.slow_every = 10**9
+    assert summarizer.context("third", CHUNKS)[1] == MAP
+
+
+def test_concurrent_queries_both_map_with_default_pool():
+    llm = FakeLLM(median=0.2, slow_every=10**9)
+    summarizer = ChunkSummarizer(llm, mode=MAP, workers=8, timeout=5)
+    with ThreadPoolExecutor(2) as pool:
+        results = list(pool.map(lambda q: summarizer.context(q, CHUNKS), ["first", "second"]))
+    assert [mode for _, mode in results] == [MAP, MAP]
+    assert summarizer.saturated == 0 and llm.calls == 2 * len(CHUNKS)
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ChunkSummarizer(FakeLLM(), mode="parallel")
@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.weather_cache import OpenWeatherClient, UpstreamError, WeatherCache, geo_bucket
+
+
+@pytest.fixture
+def stub():
+    """Local OpenWeather stand-in that answers after 200 ms and records each call."""
+    calls = []
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            q = parse_qs(url.query)
+            calls.append((url.path, q["lat"][0], q["lon"][0]))
+            time.sleep(0.2)
+            data = json.dumps({"main": {"temp": 30.0, "humidity": 70}, "weather": [{"main": "Clouds"}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield OpenWeatherClient("test", base_url=f"http://127.0.0.1:{server.server_port}"), calls
+    server.shutdown()
+
+
+def test_concurrent_misses_in_one_bucket_make_one_call(stub):
+    client, calls = stub
+    cache = WeatherCache(client.current, ttl=60, stale_ttl=60)
+    # Same village, points up to ~0.7 km apart
+    points = [(26.4990 + i * 0.0001, 89.5510 - i * 0.0001) for i in range(50)]
+    with ThreadPoolExecutor(50) as pool:
+        results = list(pool.map(lambda p: cache.get(geo_bucket(*p)), points))
+    assert len(calls) == 1
+    assert all(r["main"]["temp"] == 30.0 for r in results)
+    assert cache.misses == 1 and cache.coalesced == 49
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(stub):
+    client, calls = stub
+    cache = WeatherCache(client.current, ttl=0.3, stale_ttl=5)
+    key = geo_bucket(26.5, 89.55)
+    cache.get(key)
+    time.sleep(0.4)
+    start = time.perf_counter()
+    assert cache.get(key)["main"]["temp"] == 30.0
+    assert cache.get(key)["main"]["temp"] == 30.0
+    assert time.perf_counter() - start < 0.1
+    time.sleep(0.4)
+    assert len(calls) == 2 and cache.refreshes == 1 and cache.stale_hits == 2
+
+
+def test_waiters_get_the_leaders_error():
+    def failing(lat, lon):
+        time.sleep(0.2)
+        raise UpstreamError(503, "down")
+
+    cache = WeatherCache(failing, ttl=60, stale_ttl=60)
+    with ThreadPoolExecutor(20) as pool:
+        futures = [pool.submit(cache.get, (26.50, 89.55)) for _ in range(20)]
+    assert all(isinstance(f.exception(), UpstreamError) for f in futures)
+    assert cache.upstream_calls == 1
+
+
+def test_failed_call_is_retried_by_the_next_request():
+    results = iter([UpstreamError(503, "down"), {"main": {"temp": 25.0}}])
+
+    def flaky(lat, lon):
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    cache = WeatherCache(flaky, ttl=60, stale_ttl=60)
+    with pytest.raises(UpstreamError):
+        cache.get((26.50, 89.55))
+    assert cache.get((26.50, 89.55)) == {"main": {"temp": 25.0}}